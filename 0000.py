@@ -1,89 +1,53 @@
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, g, has_request_context, render_template, request, jsonify, send_from_directory, stream_with_context
+import atexit
+import contextvars
+import hmac
+import ipaddress
 import math
-import random
-import requests
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
+import numpy as np
+
+import access_log
+import analysis
+import appliances
+import battery
+import ev_scheduler
+import events
+import forecast
+import history
+import http_cache
+import jobs
+import locations
+import pipeline
+import price_feed
+import profiles
+import ratelimit
+import regions
+import shadow
+import stats
+import tariffs
+import tile_cache
+import tracing
+import vendor_assets
+from analysis import (ANALYSIS, BIDAR_TOWNS, COUNTRY_COORDS, countries, country, estimate_hydro, estimate_solar,
+                      estimate_wind, grid_signals, parse_inputs, simulate_storage)
+
 app = Flask(__name__)
 
 # --- CONFIGURATION & DATA ---
 
-# Carbon Pricing (Simulated)
-CARBON_PRICE_DEFAULT = 50.0 
-
-# Carbon Intensity (gCO2/kWh) - Comprehensive List
-CARBON_INTENSITY = {
-    "US": 424, "IN": 705, "DE": 369, "FR": 57, "BR": 89,
-    "CA": 130, "AU": 680, "JP": 480, "GB": 230, "IT": 300,
-    "MX": 380, "ZA": 850, "KR": 450, "ES": 200, "SE": 15,
-    "CN": 580, "RU": 470, "AR": 360, "EG": 450, "NG": 400,
-    "NO": 8, "IS": 0, "NZ": 120, "CH": 30, "FI": 90,
-    "DK": 150, "NL": 390, "BE": 220, "AT": 140, "PL": 690
-}
-
-# Currency Symbols
-CURRENCY_SYMBOL = {
-    "US": "$", "IN": "₹", "DE": "€", "FR": "€", "BR": "R$",
-    "CA": "$", "AU": "$", "JP": "¥", "GB": "£", "IT": "€",
-    "MX": "$", "ZA": "R", "KR": "₩", "ES": "€", "SE": "kr",
-    "CN": "¥", "RU": "₽", "AR": "$", "EG": "E£", "NG": "₦",
-    "NO": "kr", "IS": "kr", "NZ": "$", "CH": "Fr", "FI": "€",
-    "DK": "kr", "NL": "€", "BE": "€", "AT": "€", "PL": "zł"
-}
+# Carbon Pricing (USD/ton): live feed, falling back to the default until the first sample
+CARBON_PRICES = price_feed.PriceFeed(
+    price_feed.source_from_spec(os.environ.get('ECO_CARBON_PRICE_SOURCE', 'sim'), analysis.CARBON_PRICE_DEFAULT),
+    interval=float(os.environ.get('ECO_CARBON_PRICE_POLL', 60)), default=analysis.CARBON_PRICE_DEFAULT)
+analysis.carbon_price_source = CARBON_PRICES.current
 
-# Electricity Rates (Approximate per kWh in local currency)
-ELECTRICITY_RATE = {
-    "US": 0.14, "IN": 7.0, "DE": 0.36, "FR": 0.19, "BR": 0.80,
-    "CA": 0.13, "AU": 0.35, "JP": 27.0, "GB": 0.34, "IT": 0.28,
-    "MX": 2.0, "ZA": 2.5, "KR": 120, "ES": 0.25, "SE": 2.5,
-    "CN": 0.6, "RU": 5.0, "AR": 50.0, "EG": 1.5, "NG": 50.0,
-    "NO": 1.5, "IS": 18.0, "NZ": 0.30, "CH": 0.25, "FI": 0.17,
-    "DK": 2.5, "NL": 0.30, "BE": 0.30, "AT": 0.25, "PL": 0.70
-}
-
-# Renewable Potential Database
-RENEWABLE_POTENTIAL = {
-    "US": {"solar": "excellent", "wind": "good", "hydro": "moderate"},
-    "IN": {"solar": "excellent", "wind": "moderate", "hydro": "good"},
-    "DE": {"solar": "moderate", "wind": "excellent", "hydro": "low"},
-    "FR": {"solar": "good", "wind": "good", "hydro": "excellent"},
-    "BR": {"solar": "excellent", "wind": "good", "hydro": "excellent"},
-    "CA": {"solar": "moderate", "wind": "excellent", "hydro": "excellent"},
-    "AU": {"solar": "excellent", "wind": "excellent", "hydro": "low"},
-    "JP": {"solar": "good", "wind": "moderate", "hydro": "good"},
-    "GB": {"solar": "low", "wind": "excellent", "hydro": "moderate"},
-    "SE": {"solar": "low", "wind": "good", "hydro": "excellent"}
-}
-
-# Energy Saving Tips Database
-ENERGY_TIPS = {
-    "ac": [
-        "🌡️ Set AC to 24-26°C. Each degree lower increases energy use by 6-8%.",
-        "🪟 Use ceiling fans with AC to feel 4°C cooler at the same temperature.",
-        "🌙 Use programmable thermostats/timers for night cooling."
-    ],
-    "heating": [
-        "🔥 Lower thermostat by 1°C to save 10% on heating bills.",
-        "🏠 Seal windows and doors to prevent 20% heat loss.",
-        "☀️ Open curtains during sunny days for free solar heating."
-    ],
-    "office": [
-        "💻 Use laptop instead of desktop - uses 50-80% less power.",
-        "🔌 Use smart power strips to eliminate phantom loads from peripherals."
-    ],
-    "ev": [
-        "🚗 Charge during off-peak hours (usually 10 PM - 6 AM).",
-        "🔋 Maintain battery between 20-80% for longevity."
-    ],
-    "appliances": [
-        "🧺 Wash clothes in cold water - saves 90% of washing energy.",
-        "❄️ Keep fridge at 3-5°C and freezer at -18°C."
-    ],
-    "lighting": [
-        "💡 Switch to LED bulbs - use 75% less energy, last 25x longer.",
-        "🌅 Use natural daylight and light-colored walls."
-    ]
-}
+# Reference data, grid regions and climatology load on first use; see analysis.py
 
 # India Data
 INDIA_STATES = [
@@ -107,9 +71,6 @@ CITIES_BY_STATE = {
     "Rajasthan": ["Jaipur", "Jodhpur", "Udaipur", "Kota"]
 }
 
-BIDAR_TOWNS = ["Aurad", "Basavakalyan", "Bhalki", "Chitgoppa", "Hulsoor", "Humnabad", 
-               "Kamalnagar", "Old City", "New City", "Gumpa", "Mailoor", "Chidri"]
-
 # Examples
 EXAMPLES = [
     {"name": "Urban Apt (US)", "location": "US", "usage": 12, "habits": "AC in summer, WFH setup", "icon": "🏢"},
@@ -117,23 +78,94 @@ EXAMPLES = [
     {"name": "Eco Student (DE)", "location": "DE", "usage": 6, "habits": "Laptop, LED lights, No AC", "icon": "📚"}
 ]
 
+# Autocomplete index over states > cities > towns; ECO_GAZETTEER adds a full TSV gazetteer
+LOCATIONS = analysis.lazy(lambda: locations.build_default(INDIA_STATES, CITIES_BY_STATE, {("Karnataka", "Bidar"): BIDAR_TOWNS},
+                                                          os.environ.get('ECO_GAZETTEER')))
+
+# Rate limits: "upstream" routes spend the weather API quota, "cpu" routes run the models.
+# Buckets are shared by every worker process through ECO_RATELIMIT_FILE.
+# ECO_TRUST_FORWARDED is the number of reverse proxies in front of the app; clients are
+# keyed by the X-Forwarded-For entry the outermost one appended.
+LIMITS = ratelimit.Limiter(os.environ.get('ECO_RATELIMIT_FILE', 'eco_ratelimit.bin'), {
+    "upstream": ratelimit.Budget("upstream", client_rate=0.5, client_burst=10, global_rate=5, global_burst=50,
+                                 max_inflight=16, latency_target=5.0),
+    "cpu": ratelimit.Budget("cpu", client_rate=5, client_burst=20, global_rate=50, global_burst=100,
+                            max_inflight=32, latency_target=2.0),
+}, trusted_proxies=int(os.environ.get('ECO_TRUST_FORWARDED', '0')))
+
+# Structured access log (JSON lines, written off the request path; empty ECO_ACCESS_LOG disables).
+# High-volume static routes are sampled; errors and slow requests are always logged.
+ACCESS_LOG_SAMPLE = {
+    '/tiles/<int:z>/<int:x>/<tile>': 0.05,
+    '/assets/<fname>': 0.05,
+    '/locations/autocomplete': 0.2,
+}
+ACCESS_LOG = access_log.AccessLog(os.environ.get('ECO_ACCESS_LOG', 'eco_access.log'),
+                                  int(os.environ.get('ECO_ACCESS_LOG_MB', 64)) * 1024 * 1024,
+                                  int(os.environ.get('ECO_ACCESS_LOG_BACKUPS', access_log.BACKUPS)),
+                                  ACCESS_LOG_SAMPLE)
+
+# Request tracing: a sampled share of requests (plus any whose traceparent says sampled) is
+# traced through the analysis stages and outbound calls; see /admin/traces.
+# ECO_TRACE_FILE additionally appends finished traces as JSON lines.
+TRACER = tracing.Tracer(float(os.environ.get('ECO_TRACE_SAMPLE', 0.05)),
+                        int(os.environ.get('ECO_TRACE_RING', tracing.RING_SIZE)),
+                        access_log.AccessLog(os.environ['ECO_TRACE_FILE']) if os.environ.get('ECO_TRACE_FILE') else None)
+
+# Shadow traffic: ECO_SHADOW_ENGINE names a candidate engine (e.g. "000.py:run_analysis", the
+# legacy flat-load model) that re-runs a sampled share of /analyze requests off the request
+# path; per-field differences and latency deltas are reported at /admin/shadow.
+SHADOW = shadow.Shadow(
+    shadow.load_engine(os.environ['ECO_SHADOW_ENGINE']), os.environ['ECO_SHADOW_ENGINE'],
+    float(os.environ.get('ECO_SHADOW_SAMPLE', 0.1)),
+    writer=access_log.AccessLog(os.environ['ECO_SHADOW_LOG']) if os.environ.get('ECO_SHADOW_LOG') else None,
+) if os.environ.get('ECO_SHADOW_ENGINE') else None
+
+# /admin/* routes: token from ECO_ADMIN_TOKEN, or loopback-only when unset
+ADMIN_TOKEN = os.environ.get('ECO_ADMIN_TOKEN', '')
+
+# Front-end assets served locally once vendored (python vendor_assets.py), else from the CDN
+ASSETS = vendor_assets.AssetManifest(os.environ.get('ECO_VENDOR_DIR', vendor_assets.VENDOR_DIR))
+
+# Map tiles proxied through a size-bounded disk cache
+TILES = tile_cache.TileCache(
+    os.environ.get('ECO_TILE_CACHE', 'eco_tiles'),
+    os.environ.get('ECO_TILE_UPSTREAM', tile_cache.DEFAULT_UPSTREAM),
+    int(os.environ.get('ECO_TILE_CACHE_MB', 256)) * 1024 * 1024)
+
+# Hourly forecasts for the load-shifting windows, shared by every request for a location
+FORECASTS = forecast.ForecastCache(
+    os.environ.get('ECO_FORECAST_URL', forecast.DEFAULT_URL),
+    days=int(os.environ.get('ECO_FORECAST_DAYS', forecast.DAYS)),
+    ttl=float(os.environ.get('ECO_FORECAST_TTL', forecast.TTL_SECONDS)))
+
 # --- HELPER FUNCTIONS ---
 
+def note_upstream(seconds: float):
+    # Time spent waiting on outside services, reported in the access log
+    if has_request_context():
+        g.upstream_s = g.get('upstream_s', 0.0) + seconds
+
 def get_current_weather(location: str) -> Optional[dict]:
-    coord_map = {
-        "US": (37.09, -95.71), "IN": (20.59, 78.96), "DE": (51.16, 10.45),
-        "FR": (46.22, 2.21), "BR": (-14.23, -51.92), "CA": (56.13, -106.34),
-        "AU": (-25.27, 133.77), "JP": (36.20, 138.25), "GB": (55.37, -3.43),
-        "IT": (41.87, 12.56)
-    }
-    lat, lon = coord_map.get(location, (0, 0))
+    lat, lon = COUNTRY_COORDS.get(location, (0, 0))
     if lat == 0: return None
+    return get_weather_at(lat, lon)
 
+def get_weather_at(lat: float, lon: float) -> Optional[dict]:
     try:
         params = {"latitude": lat, "longitude": lon, "current": "temperature_2m,weather_code,relative_humidity_2m"}
-        r = requests.get("https://api.open-meteo.com/v1/forecast", params=params, timeout=3)
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("http.open-meteo", lat=lat, lon=lon) as sp:
+                import requests  # loaded on the first outbound call, not at startup
+                r = requests.get("https://api.open-meteo.com/v1/forecast", params=params, headers=tracing.headers(), timeout=3)
+                sp.set(status=r.status_code)
+        finally:
+            note_upstream(time.perf_counter() - t0)
         if r.status_code == 200:
             data = r.json()['current']
+            region, _ = analysis.region_index().nearest(lat, lon)
+            analysis.climate().observe(region.id, data['temperature_2m'])
             desc_map = {0: "Clear Sky", 1: "Mainly Clear", 2: "Partly Cloudy", 3: "Overcast", 45: "Foggy", 61: "Rain", 80: "Showers"}
             return {
                 "temperature": data['temperature_2m'],
@@ -145,668 +177,730 @@ def get_current_weather(location: str) -> Optional[dict]:
         return None
     return None
 
-# --- HTML TEMPLATE ---
-
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-  <meta charset="UTF-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>Eco-Genius | Smart Energy Planning</title>
-  <script src="https://cdn.tailwindcss.com"></script>
-  <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
-  <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
-  <script src="https://unpkg.com/gsap@3.12.5/dist/gsap.min.js"></script>
-  <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/css/all.min.css">
-  <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;800&display=swap');
-    body { font-family: 'Inter', sans-serif; background: #050510; color: #e2e8f0; overflow-x: hidden; }
-    
-    .gradient-bg {
-      position: fixed; top: 0; left: 0; right: 0; bottom: 0;
-      background: linear-gradient(125deg, #0a0f1c 0%, #0f1729 25%, #0a1628 50%, #051119 75%, #0a0f1c 100%);
-      background-size: 400% 400%; animation: gradientShift 20s ease infinite; z-index: -2;
-    }
-    @keyframes gradientShift { 0%, 100% { background-position: 0% 50%; } 50% { background-position: 100% 50%; } }
-    
-    .particles { position: fixed; top: 0; left: 0; width: 100%; height: 100%; pointer-events: none; z-index: -1; }
-    .particle { position: absolute; width: 2px; height: 2px; background: rgba(52, 211, 153, 0.4); border-radius: 50%; animation: float 20s infinite linear; }
-    
-    .glass-card {
-      background: rgba(15, 23, 42, 0.7); backdrop-filter: blur(16px);
-      border: 1px solid rgba(71, 85, 105, 0.4); border-radius: 24px;
-      box-shadow: 0 8px 32px rgba(0, 0, 0, 0.5); transition: all 0.3s ease;
-    }
-    .glass-card:hover { transform: translateY(-5px); border-color: rgba(52, 211, 153, 0.5); }
-
-    .glow-button {
-      background: linear-gradient(135deg, #10b981 0%, #0d9488 100%);
-      border-radius: 12px; font-weight: 600; text-transform: uppercase; letter-spacing: 1px;
-      transition: all 0.3s ease;
-    }
-    .glow-button:hover { transform: scale(1.02); box-shadow: 0 0 20px rgba(52, 211, 153, 0.5); }
-
-    #map { height: 300px; border-radius: 16px; width: 100%; z-index: 0; }
-    select, input, textarea { background: rgba(30, 41, 59, 0.6); border: 1px solid rgba(71, 85, 105, 0.5); color: white; }
-  </style>
-</head>
-<body>
-  <div class="gradient-bg"></div>
-  <div class="particles" id="particles"></div>
-  
-  <div class="container mx-auto px-4 py-8 max-w-6xl relative z-10">
-    
-    <header class="text-center mb-12">
-      <h1 class="text-5xl md:text-6xl font-black mb-4">
-        <span class="bg-clip-text text-transparent bg-gradient-to-r from-emerald-400 via-teal-500 to-cyan-500">
-          Eco-Genius
-        </span>
-      </h1>
-      <p class="text-xl text-slate-300">AI-Powered Energy Planning & Carbon Optimization</p>
-    </header>
-
-    <section class="mb-10">
-      <h2 class="text-2xl font-bold text-white mb-6">Quick Start Templates</h2>
-      <div class="grid grid-cols-1 md:grid-cols-3 gap-6">
-        {% for ex in examples %}
-        <div class="glass-card p-6 cursor-pointer" onclick="loadExample('{{ ex.location }}', {{ ex.usage }}, `{{ ex.habits }}`)">
-          <div class="flex justify-between items-center mb-3">
-            <span class="text-3xl">{{ ex.icon }}</span>
-            <span class="text-xs bg-slate-700 px-2 py-1 rounded text-slate-300">{{ ex.location }}</span>
-          </div>
-          <h3 class="font-bold text-white">{{ ex.name }}</h3>
-          <p class="text-sm text-slate-400 mt-2">{{ ex.habits }}</p>
-        </div>
-        {% endfor %}
-      </div>
-    </section>
-
-    <div class="glass-card p-8 mb-12" id="inputCard">
-      <div class="flex items-center gap-4 mb-8">
-        <div class="w-10 h-10 rounded-full bg-emerald-500 flex items-center justify-center">
-          <i class="fas fa-sliders-h text-white"></i>
-        </div>
-        <h2 class="text-2xl font-bold text-white">Analysis Parameters</h2>
-      </div>
-
-      <div class="grid grid-cols-1 lg:grid-cols-2 gap-8">
-        
-        <div class="space-y-6">
-          
-          <div>
-            <label class="block text-sm font-medium text-emerald-400 mb-2">Location</label>
-            <select id="location" class="w-full p-3 rounded-xl focus:outline-none focus:border-emerald-500" onchange="handleLocationChange()">
-              <option value="US">🇺🇸 United States</option>
-              <option value="IN">🇮🇳 India</option>
-              <option value="DE">🇩🇪 Germany</option>
-              <option value="FR">🇫🇷 France</option>
-              <option value="BR">🇧🇷 Brazil</option>
-              <option value="CA">🇨🇦 Canada</option>
-              <option value="AU">🇦🇺 Australia</option>
-              <option value="JP">🇯🇵 Japan</option>
-              <option value="GB">🇬🇧 United Kingdom</option>
-            </select>
-          </div>
-
-          <div id="india-fields" class="hidden space-y-4 border-l-2 border-emerald-500 pl-4 bg-slate-800/30 p-4 rounded-r-xl">
-            <div>
-              <label class="block text-xs text-slate-400 mb-1">State</label>
-              <select id="state" class="w-full p-2 rounded-lg text-sm" onchange="handleStateChange()">
-                <option value="">Select State</option>
-                {% for state in india_states %}
-                <option value="{{ state }}">{{ state }}</option>
-                {% endfor %}
-              </select>
-            </div>
-            
-            <div id="city-wrapper" class="hidden">
-              <label class="block text-xs text-slate-400 mb-1">City</label>
-              <select id="city" class="w-full p-2 rounded-lg text-sm" onchange="handleCityChange()">
-                <option value="">Select City</option>
-              </select>
-            </div>
-
-            <div id="town-wrapper" class="hidden">
-              <label class="block text-xs text-slate-400 mb-1">Town (Bidar District)</label>
-              <select id="town" class="w-full p-2 rounded-lg text-sm">
-                <option value="">Select Town</option>
-                {% for town in bidar_towns %}
-                <option value="{{ town }}">{{ town }}</option>
-                {% endfor %}
-              </select>
-            </div>
-          </div>
-
-          <div class="grid grid-cols-2 gap-4">
-            <div>
-              <label class="block text-sm font-medium text-emerald-400 mb-2">Daily Usage (Hours)</label>
-              <input type="number" id="daily_hours" value="12" class="w-full p-3 rounded-xl focus:border-emerald-500" placeholder="e.g. 12">
-            </div>
-            <div>
-              <label class="block text-sm font-medium text-emerald-400 mb-2">Est. Load Type</label>
-              <div class="text-xs text-slate-400 mt-2 italic" id="load-preview">Auto-calculated based on habits</div>
-            </div>
-          </div>
-
-          <div>
-            <label class="block text-sm font-medium text-emerald-400 mb-2">Energy Habits</label>
-            <textarea id="habits" class="w-full p-3 rounded-xl h-24 focus:border-emerald-500" 
-                      placeholder="Describe appliances: 'I run AC for 8 hours, have an EV car, work from home on laptop...'"></textarea>
-          </div>
-
-          <button onclick="analyze()" class="glow-button w-full py-4 text-white shadow-lg">
-            Generate Eco-Plan <i class="fas fa-arrow-right ml-2"></i>
-          </button>
-        </div>
-
-        <div class="space-y-6">
-           <label class="block text-sm font-medium text-emerald-400">Regional Context</label>
-           <div id="map"></div>
-           
-           <div class="grid grid-cols-2 gap-4">
-             <div id="weatherDisplay" class="glass-card p-4 hidden">
-               <div class="flex items-center gap-3">
-                 <i class="fas fa-cloud-sun text-yellow-400 text-2xl"></i>
-                 <div>
-                   <p class="text-lg font-bold text-white" id="tempDisplay">--</p>
-                   <p class="text-xs text-slate-400" id="weatherDesc">--</p>
-                 </div>
-               </div>
-             </div>
-             
-             <div class="glass-card p-4">
-               <div class="flex items-center gap-3">
-                 <i class="fas fa-dollar-sign text-green-400 text-2xl"></i>
-                 <div>
-                   <p class="text-lg font-bold text-white" id="carbonPriceDisplay">Loading...</p>
-                   <p class="text-xs text-slate-400">Current Carbon Price</p>
-                 </div>
-               </div>
-             </div>
-           </div>
-        </div>
-      </div>
-    </div>
-
-    <section id="results" class="hidden space-y-8">
-      
-      <div class="glass-card p-8">
-        <div class="flex justify-between items-start border-b border-slate-700 pb-4 mb-6">
-            <h3 class="text-2xl font-bold text-white">Analysis Results</h3>
-            <div id="profile-tags" class="flex gap-2 flex-wrap justify-end"></div>
-        </div>
-        
-        <div class="grid grid-cols-1 md:grid-cols-4 gap-6 text-center">
-          <div class="p-4 bg-slate-800/40 rounded-xl">
-            <p class="text-slate-400 text-xs uppercase tracking-wider">Carbon Footprint</p>
-            <p class="text-3xl font-black text-white mt-2"><span id="res-carbon" class="text-red-400">0</span> kg</p>
-          </div>
-          <div class="p-4 bg-slate-800/40 rounded-xl">
-            <p class="text-slate-400 text-xs uppercase tracking-wider">Trees to Offset</p>
-            <p class="text-3xl font-black text-white mt-2"><span id="res-trees" class="text-emerald-400">0</span> 🌳</p>
-          </div>
-          <div class="p-4 bg-slate-800/40 rounded-xl">
-            <p class="text-slate-400 text-xs uppercase tracking-wider">Potential Savings</p>
-            <p class="text-3xl font-black text-white mt-2"><span id="res-savings" class="text-yellow-400">0</span></p>
-          </div>
-          <div class="p-4 bg-slate-800/40 rounded-xl">
-            <p class="text-slate-400 text-xs uppercase tracking-wider">Payback Period</p>
-            <p class="text-3xl font-black text-white mt-2"><span id="res-payback" class="text-blue-400">0</span> yrs</p>
-          </div>
-        </div>
-        <p class="text-center text-slate-400 mt-4 italic" id="habits-summary"></p>
-      </div>
-
-      <div class="grid grid-cols-1 md:grid-cols-2 gap-8">
-        <div class="glass-card p-6">
-          <h4 class="text-xl font-bold text-emerald-400 mb-4"><i class="fas fa-check-circle mr-2"></i>Tailored Action Plan</h4>
-          <ul id="action-list" class="space-y-3 text-slate-300"></ul>
-        </div>
-        <div class="glass-card p-6">
-          <h4 class="text-xl font-bold text-cyan-400 mb-4"><i class="fas fa-wind mr-2"></i>Renewable Strategy</h4>
-          <ul id="renewable-list" class="space-y-3 text-slate-300"></ul>
-        </div>
-      </div>
-      
-      <div class="glass-card p-6">
-        <h4 class="text-xl font-bold text-yellow-400 mb-4"><i class="fas fa-lightbulb mr-2"></i>Smart Efficiency Tips</h4>
-        <div class="grid grid-cols-1 md:grid-cols-2 gap-4" id="tips-grid"></div>
-      </div>
-
-    </section>
-
-    <section class="mt-12">
-      <h2 class="text-2xl font-bold text-white mb-6">Investment Estimators</h2>
-      <div class="grid grid-cols-1 md:grid-cols-3 gap-6">
-        
-        <div class="glass-card p-6 border-t-4 border-yellow-500">
-          <h3 class="font-bold text-white text-lg mb-4 flex items-center"><i class="fas fa-sun text-yellow-500 mr-2"></i> Solar Calculator</h3>
-          <div class="space-y-3">
-             <input type="number" id="solarRoof" placeholder="Roof Size (sq ft)" value="500" class="w-full p-2 rounded text-sm">
-             <button onclick="calcSolar()" class="w-full py-2 bg-yellow-600/20 text-yellow-400 border border-yellow-500/50 rounded hover:bg-yellow-600/40 transition">Calculate</button>
-             <div id="solar-res" class="hidden mt-3 text-sm text-slate-300">
-                <p>Cost: <b id="solar-cost" class="text-white"></b></p>
-                <p>Savings: <b id="solar-save" class="text-white"></b>/yr</p>
-             </div>
-          </div>
-        </div>
-
-        <div class="glass-card p-6 border-t-4 border-blue-500">
-          <h3 class="font-bold text-white text-lg mb-4 flex items-center"><i class="fas fa-fan text-blue-500 mr-2"></i> Wind Calculator</h3>
-          <div class="space-y-3">
-             <input type="number" id="windSize" placeholder="Turbine Size (kW)" value="5" class="w-full p-2 rounded text-sm">
-             <button onclick="calcWind()" class="w-full py-2 bg-blue-600/20 text-blue-400 border border-blue-500/50 rounded hover:bg-blue-600/40 transition">Calculate</button>
-             <div id="wind-res" class="hidden mt-3 text-sm text-slate-300">
-                <p>Cost: <b id="wind-cost" class="text-white"></b></p>
-                <p>Energy: <b id="wind-kwh" class="text-white"></b> kWh/yr</p>
-             </div>
-          </div>
-        </div>
-
-        <div class="glass-card p-6 border-t-4 border-cyan-500">
-          <h3 class="font-bold text-white text-lg mb-4 flex items-center"><i class="fas fa-water text-cyan-500 mr-2"></i> Hydro Calculator</h3>
-          <div class="space-y-3">
-             <div class="flex gap-2">
-               <input type="number" id="hydroFlow" placeholder="Flow (L/s)" value="20" class="w-full p-2 rounded text-sm">
-               <input type="number" id="hydroHead" placeholder="Head (m)" value="5" class="w-full p-2 rounded text-sm">
-             </div>
-             <button onclick="calcHydro()" class="w-full py-2 bg-cyan-600/20 text-cyan-400 border border-cyan-500/50 rounded hover:bg-cyan-600/40 transition">Calculate</button>
-             <div id="hydro-res" class="hidden mt-3 text-sm text-slate-300">
-                <p>Cost: <b id="hydro-cost" class="text-white"></b></p>
-                <p>Size: <b id="hydro-size" class="text-white"></b> kW</p>
-             </div>
-          </div>
-        </div>
-
-      </div>
-    </section>
-
-  </div>
-
-  <script>
-    // --- PARTICLE EFFECT ---
-    const pContainer = document.getElementById('particles');
-    for(let i=0; i<40; i++){
-      const p = document.createElement('div');
-      p.className = 'particle';
-      p.style.left = Math.random()*100 + '%';
-      p.style.animationDelay = Math.random()*20 + 's';
-      pContainer.appendChild(p);
-    }
-
-    // --- DATA ---
-    const citiesByState = {{ cities_by_state | tojson }};
-
-    // --- MAP LOGIC ---
-    let map;
-    function initMap() {
-      map = L.map('map').setView([20, 0], 1);
-      L.tileLayer('https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png', {
-        attribution: '&copy; OpenStreetMap &copy; CARTO'
-      }).addTo(map);
-
-      // Markers
-      const coords = {
-        "US": [37.09, -95.71], "IN": [20.59, 78.96], "DE": [51.16, 10.45],
-        "FR": [46.22, 2.21], "BR": [-14.23, -51.92], "CA": [56.13, -106.34],
-        "AU": [-25.27, 133.77], "JP": [36.20, 138.25], "GB": [55.37, -3.43]
-      };
-      
-      for(const [code, pos] of Object.entries(coords)){
-        L.circleMarker(pos, { color: '#10b981', radius: 8, fillOpacity: 0.6 })
-          .addTo(map).bindPopup(code)
-          .on('click', () => {
-             document.getElementById('location').value = code;
-             handleLocationChange();
-          });
-      }
-    }
-
-    // --- FORM LOGIC ---
-    function handleLocationChange() {
-      const loc = document.getElementById('location').value;
-      const indiaFields = document.getElementById('india-fields');
-      
-      if(loc === 'IN') {
-        indiaFields.classList.remove('hidden');
-      } else {
-        indiaFields.classList.add('hidden');
-      }
-      
-      fetchWeather(loc);
-      fetchCarbonPrice(loc);
-      
-      const coords = {
-        "US": [37.09, -95.71], "IN": [20.59, 78.96], "DE": [51.16, 10.45],
-        "FR": [46.22, 2.21], "BR": [-14.23, -51.92], "CA": [56.13, -106.34],
-        "AU": [-25.27, 133.77], "JP": [36.20, 138.25], "GB": [55.37, -3.43]
-      };
-      if(coords[loc]) map.flyTo(coords[loc], 4);
-    }
-
-    function handleStateChange() {
-      const state = document.getElementById('state').value;
-      const citySelect = document.getElementById('city');
-      const cityWrapper = document.getElementById('city-wrapper');
-      
-      citySelect.innerHTML = '<option value="">Select City</option>';
-      
-      const list = citiesByState[state];
-      if(list) {
-        cityWrapper.classList.remove('hidden');
-        list.forEach(c => {
-           const opt = document.createElement('option');
-           opt.value = c; opt.innerText = c;
-           citySelect.appendChild(opt);
-        });
-      } else {
-        cityWrapper.classList.add('hidden');
-      }
-    }
-
-    function handleCityChange() {
-      const city = document.getElementById('city').value;
-      const townWrapper = document.getElementById('town-wrapper');
-      if(city === 'Bidar') townWrapper.classList.remove('hidden');
-      else townWrapper.classList.add('hidden');
-    }
-
-    function loadExample(loc, hrs, habits) {
-      document.getElementById('location').value = loc;
-      document.getElementById('daily_hours').value = hrs;
-      document.getElementById('habits').value = habits;
-      handleLocationChange();
-    }
-
-    // --- API CALLS ---
-    async function fetchWeather(loc) {
-      const res = await fetch(`/weather?location=${loc}`);
-      const data = await res.json();
-      if(data && data.temperature) {
-        document.getElementById('weatherDisplay').classList.remove('hidden');
-        document.getElementById('tempDisplay').innerText = `${data.temperature}°C`;
-        document.getElementById('weatherDesc').innerText = data.description;
-      }
-    }
-
-    async function fetchCarbonPrice(loc) {
-      const res = await fetch('/carbon-price');
-      const data = await res.json();
-      const sym = loc === 'IN' ? '₹' : (loc === 'DE' ? '€' : '$'); 
-      const val = loc === 'IN' ? data * 80 : data; 
-      document.getElementById('carbonPriceDisplay').innerText = `${sym}${val.toFixed(2)}/ton`;
-    }
-
-    async function analyze() {
-      const btn = document.querySelector('button[onclick="analyze()"]');
-      const originalText = btn.innerHTML;
-      btn.innerText = "Processing AI Analysis..."; btn.disabled = true;
-
-      const payload = {
-        location: document.getElementById('location').value,
-        daily_hours: document.getElementById('daily_hours').value,
-        habits: document.getElementById('habits').value,
-        state: document.getElementById('state').value,
-        city: document.getElementById('city').value,
-        town: document.getElementById('town').value
-      };
-
-      try {
-        const res = await fetch('/analyze', {
-          method: 'POST', headers: {'Content-Type': 'application/json'},
-          body: JSON.stringify(payload)
-        });
-        const data = await res.json();
-        
-        if(data.error) { alert(data.error); return; }
-
-        document.getElementById('results').classList.remove('hidden');
-        
-        // Populate results
-        document.getElementById('res-carbon').innerText = data.carbon_footprint_kg;
-        document.getElementById('res-trees').innerText = data.trees_needed;
-        document.getElementById('res-savings').innerText = data.annual_savings;
-        document.getElementById('res-payback').innerText = data.payback_period;
-        document.getElementById('habits-summary').innerText = data.habits_summary;
-
-        // Tags
-        const tagsDiv = document.getElementById('profile-tags');
-        tagsDiv.innerHTML = data.profile_tags.map(t => 
-            `<span class="px-2 py-1 bg-emerald-500/20 text-emerald-400 border border-emerald-500/50 rounded text-xs font-bold">${t}</span>`
-        ).join('');
-
-        // Lists
-        document.getElementById('action-list').innerHTML = data.action_plan.map(i => 
-          `<li class="flex items-start gap-2"><i class="fas fa-arrow-right text-emerald-500 mt-1"></i><span>${i}</span></li>`
-        ).join('');
-
-        document.getElementById('renewable-list').innerHTML = data.renewable_recommendations.map(i => 
-          `<li class="flex items-start gap-2"><i class="fas fa-bolt text-yellow-400 mt-1"></i><span>${i}</span></li>`
-        ).join('');
-
-        // Tips Grid
-        document.getElementById('tips-grid').innerHTML = data.efficiency_tips.map(tip => 
-            `<div class="p-3 bg-slate-800/50 rounded-lg text-sm text-slate-300 border-l-2 border-yellow-400">${tip}</div>`
-        ).join('');
-        
-        document.getElementById('results').scrollIntoView({ behavior: 'smooth' });
-
-      } catch(e) {
-        console.error(e);
-        alert("Error during analysis.");
-      } finally {
-        btn.innerHTML = originalText; btn.disabled = false;
-      }
-    }
-
-    // --- ESTIMATOR CALLS ---
-    async function calcSolar() {
-        const payload = { location: document.getElementById('location').value, roof_size_sqft: document.getElementById('solarRoof').value };
-        const res = await fetch('/solar-cost', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(payload) });
-        const data = await res.json();
-        document.getElementById('solar-res').classList.remove('hidden');
-        document.getElementById('solar-cost').innerText = data.total_cost;
-        document.getElementById('solar-save').innerText = data.annual_savings;
-    }
-
-    async function calcWind() {
-        const payload = { location: document.getElementById('location').value, turbine_size_kw: document.getElementById('windSize').value };
-        const res = await fetch('/wind-estimate', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(payload) });
-        const data = await res.json();
-        document.getElementById('wind-res').classList.remove('hidden');
-        document.getElementById('wind-cost').innerText = data.total_cost;
-        document.getElementById('wind-kwh').innerText = data.annual_energy_kwh;
-    }
-
-    async function calcHydro() {
-        const payload = { 
-            location: document.getElementById('location').value, 
-            flow_rate_lps: document.getElementById('hydroFlow').value,
-            head_height_m: document.getElementById('hydroHead').value
-        };
-        const res = await fetch('/hydro-estimate', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(payload) });
-        const data = await res.json();
-        document.getElementById('hydro-res').classList.remove('hidden');
-        document.getElementById('hydro-cost').innerText = data.total_cost;
-        document.getElementById('hydro-size').innerText = data.system_size_kw;
-    }
+SESSIONS = pipeline.SessionStore(ANALYSIS)
+
+# Analysis history (SQLite, written off the request path)
+HISTORY = history.HistoryStore(os.environ.get('ECO_HISTORY_DB', 'eco_history.db'))
+atexit.register(HISTORY.stop)
+
+# Live weather / carbon-price pushes: one shared refresher for every open tab. Each open
+# stream holds a worker thread, so ECO_LIVE_MAX_SUBSCRIBERS is a thread budget.
+LIVE = events.LiveFeed({
+    "weather": get_current_weather,
+    "carbon-price": lambda loc: CARBON_PRICES.current(),
+}, refresh_interval=float(os.environ.get('ECO_LIVE_REFRESH', 60)),
+    max_subscribers=int(os.environ.get('ECO_LIVE_MAX_SUBSCRIBERS', events.MAX_SUBSCRIBERS)))
+
+# Portfolio jobs: analyze()-style results for many sites on a local worker pool
+JOBS = jobs.JobManager(workers=int(os.environ.get('ECO_JOB_WORKERS', 4)))
+
+def analyze_site(site: dict) -> dict:
+    _, _, result = analysis.analyze(site)
+    if site.get('site_id') is not None:
+        result = {"site_id": site['site_id'], **result}
+    return result
+
+# Live dashboard aggregates by country, Indian state and Bidar town
+STATS = analysis.lazy(lambda: stats.StatsBook(("carbon_kg", "monthly_kwh", "annual_savings"),
+                                             snapshot_path=os.environ.get('ECO_STATS_SNAPSHOT', 'eco_stats.json')))
+
+def observe_stats(data: dict, inputs: dict, outputs: dict, result: dict):
+    loc = inputs['location']
+    keys = [("country", loc)]
+    if loc == "IN" and data.get('state') in INDIA_STATES:
+        keys.append(("state", data['state']))
+    if loc == "IN" and inputs['town'] in BIDAR_TOWNS:
+        keys.append(("town", inputs['town']))
+    # Location tags carry no habit information
+    habit_tags = [t for t in result['profile_tags'] if not t.startswith("📍")]
+    STATS().observe(keys, {
+        "carbon_kg": result['carbon_footprint_kg'],
+        "monthly_kwh": outputs['load']['_monthly_kwh'],
+        "annual_savings": outputs['financial']['_potential_savings'],
+    }, habit_tags)
+
+def record_history(data: dict, inputs: dict, outputs: dict, result: dict):
+    HISTORY.record({
+        "country": inputs['location'],
+        "state": data.get('state') or None,
+        "city": data.get('city') or None,
+        "town": inputs['town'] or None,
+        "daily_hours": inputs['daily_hours'],
+        "monthly_kwh": outputs['load']['_monthly_kwh'],
+        "carbon_kg": result['carbon_footprint_kg'],
+        "annual_savings": result['annual_savings'],
+        "habits": inputs['habits'],
+        "tags": result['profile_tags'],
+    })
 
-    window.onload = function() {
-      initMap();
-      fetchWeather('US');
-      fetchCarbonPrice('US');
-    }
-  </script>
-</body>
-</html>
-'''
+def run_analysis(data: dict) -> dict:
+    # Full analysis for one request payload, recorded in history and the live aggregates
+    inputs, outputs, result = analysis.analyze(data)
+    record_history(data, inputs, outputs, result)
+    observe_stats(data, inputs, outputs, result)
+    return result
+
+# Composite dashboard: each part is fn(payload) -> JSON value; I/O-bound parts run on the
+# pool while the CPU-bound ones run on the request thread
+DASHBOARD_IO_PARTS = {
+    "weather": lambda d: get_current_weather(d.get('location', 'US')),
+}
+DASHBOARD_CPU_PARTS = {
+    "carbon_price": lambda d: CARBON_PRICES.current(),
+    "analysis": run_analysis,
+    "solar": estimate_solar,
+    "wind": estimate_wind,
+    "hydro": estimate_hydro,
+}
+DASHBOARD_FIELDS = tuple(DASHBOARD_IO_PARTS) + tuple(DASHBOARD_CPU_PARTS)
+DASHBOARD_IO_TIMEOUT = 4.0
+DASHBOARD_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dashboard-io")
+
+def build_dashboard(d: dict, fields) -> tuple:
+    # (data, errors): a failing part is reported under errors and does not fail the others
+    data, errors = {}, {}
+    # Each part runs in a copy of the request context, so its spans and upstream time land on this request
+    pending = {f: DASHBOARD_POOL.submit(contextvars.copy_context().run, DASHBOARD_IO_PARTS[f], d)
+               for f in fields if f in DASHBOARD_IO_PARTS}
+    for f in fields:
+        if f in DASHBOARD_CPU_PARTS:
+            try:
+                data[f] = DASHBOARD_CPU_PARTS[f](d)
+            except (TypeError, ValueError) as e:
+                errors[f] = str(e)
+            except Exception as e:  # e.g. a wrongly typed input deep in a model
+                errors[f] = f"{f} failed: {type(e).__name__}: {e}"
+    for f, fut in pending.items():
+        try:
+            value = fut.result(timeout=DASHBOARD_IO_TIMEOUT)
+        except Exception:
+            value = None
+        if value is None:
+            errors[f] = f"{f} unavailable"
+        else:
+            data[f] = value
+    return data, errors
 
 # --- BACKEND ROUTES ---
 
+@app.before_request
+def pin_reference_data():
+    # One reference-data snapshot per request, so a reload mid-request never mixes versions
+    g.ref_token = analysis.pin()
+
+@app.teardown_request
+def unpin_reference_data(exc):
+    token = g.pop('ref_token', None)
+    if token is not None:
+        analysis.unpin(token)
+
+@app.before_request
+def access_start():
+    g.access_t0 = time.perf_counter()
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.trace = TRACER.start(f"{request.method} {rule}", request.headers.get('traceparent'), path=request.path)
+
+@app.before_request
+def require_admin():
+    # /admin/* needs ECO_ADMIN_TOKEN (X-Admin-Token or Bearer); without one configured only
+    # loopback clients get in. A loopback peer that forwarded for someone else is not local
+    # unless ECO_TRUST_FORWARDED says how to find the real client.
+    if not request.path.startswith('/admin/'):
+        return None
+    if ADMIN_TOKEN:
+        auth = request.headers.get('Authorization', '')
+        given = request.headers.get('X-Admin-Token') or (auth[7:] if auth.startswith('Bearer ') else '')
+        if hmac.compare_digest(given.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+            return None
+        return jsonify({"error": "Admin token required"}), 403
+    try:
+        local = ipaddress.ip_address(LIMITS.client()).is_loopback
+    except ValueError:
+        local = False
+    if local and (LIMITS.trusted_proxies or 'X-Forwarded-For' not in request.headers):
+        return None
+    return jsonify({"error": "Admin routes are loopback-only; set ECO_ADMIN_TOKEN for remote access"}), 403
+
+@app.after_request
+def access_record(resp):
+    seconds = time.perf_counter() - g.get('access_t0', time.perf_counter())
+    trace = g.get('trace', tracing.NOOP)
+    if trace.trace_id:
+        trace.set(status=resp.status_code)
+        trace.end(f"HTTP {resp.status_code}" if resp.status_code >= 500 else None)
+        resp.headers['X-Trace-Id'] = trace.trace_id
+    route = request.url_rule.rule if request.url_rule else None
+    rate = ACCESS_LOG.keep(route, resp.status_code, seconds)
+    if rate:
+        body = request.get_json(silent=True) if request.is_json else None
+        location = request.args.get('location') or (body.get('location') if isinstance(body, dict) else None)
+        cache = resp.headers.get('X-Tile-Cache') or ("revalidated" if resp.status_code == 304 else None)
+        ACCESS_LOG.record({
+            "ts": round(time.time(), 3), "method": request.method, "route": route, "path": request.path,
+            "status": resp.status_code, "latency_ms": round(seconds * 1000, 2), "location": location,
+            "cache": cache, "upstream_ms": round(g.get('upstream_s', 0.0) * 1000, 2),
+            "client": LIMITS.client(), "bytes": resp.content_length, "sample": rate, "trace_id": trace.trace_id,
+        })
+    return resp
+
+@app.teardown_request
+def trace_teardown(exc):
+    # Requests that never reached after_request still export their trace
+    g.get('trace', tracing.NOOP).end(f"{type(exc).__name__}: {exc}" if exc else None)
+
 @app.route('/')
 def home():
-    return render_template_string(HTML_TEMPLATE, 
-                                india_states=INDIA_STATES, 
-                                cities_by_state=CITIES_BY_STATE, 
-                                bidar_towns=BIDAR_TOWNS,
-                                examples=EXAMPLES)
+    return render_template('index.html', examples=EXAMPLES, asset=ASSETS.url)
+
+@app.route('/assets/<fname>')
+def vendored_asset(fname):
+    # Content-hashed files never change: cache forever, prefer the pre-compressed copy
+    found = ASSETS.path(fname, request.headers.get('Accept-Encoding', ''))
+    if found is None:
+        return jsonify({"error": "Unknown asset"}), 404
+    name, encoding = found
+    resp = send_from_directory(ASSETS.directory, name, mimetype=mimetypes.guess_type(fname)[0] or 'application/octet-stream')
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers['Cache-Control'] = vendor_assets.IMMUTABLE
+    resp.headers['Vary'] = 'Accept-Encoding'
+    return resp
+
+@app.route('/tiles/<int:z>/<int:x>/<tile>')
+def tile_route(z, x, tile):
+    stem, ext = os.path.splitext(tile)
+    retina = stem.endswith('@2x')
+    stem = stem[:-3] if retina else stem
+    try:
+        if ext != '.png' or not stem.isdigit():
+            raise ValueError("bad tile name")
+        t0 = time.perf_counter()
+        with tracing.span("tiles.get") as sp:
+            body, state = TILES.get(z, x, int(stem), retina)
+            sp.set(cache=state)
+        if state == "MISS":
+            note_upstream(time.perf_counter() - t0)
+    except ValueError:
+        return jsonify({"error": "Unknown tile"}), 404
+    except tile_cache.TileError as e:
+        return jsonify({"error": str(e)}), 502
+    return Response(body, mimetype='image/png', headers={"Cache-Control": "public, max-age=86400", "X-Tile-Cache": state})
+
+@app.route('/locations/autocomplete')
+@http_cache.cached(max_age=3600, stale_while_revalidate=86400)
+def autocomplete():
+    q = request.args.get('q', '')
+    kind = request.args.get('kind') or None
+    if kind is not None and kind not in locations.KINDS:
+        return jsonify({"error": f"Unknown kind '{kind}'"}), 400
+    try:
+        k = max(1, min(int(request.args.get('k', 10)), locations.TOP_CACHE_K))
+    except ValueError:
+        return jsonify({"error": "Invalid k"}), 400
+
+    parent = None
+    if request.args.get('parent'):
+        parent_kinds = [locations.PARENT_KIND[kind]] if kind in locations.PARENT_KIND else ["state", "city"]
+        parent = next((i for i in (LOCATIONS().lookup(request.args['parent'], pk) for pk in parent_kinds) if i is not None), None)
+        if parent is None:
+            return jsonify({"results": []})
+    elif kind == "state":
+        parent = -1  # states are the roots of the hierarchy
+
+    index = LOCATIONS()
+    return jsonify({"results": [index.describe(i) for i in index.search(q, k, kind, parent)]})
 
 @app.route('/weather')
+@LIMITS.limit('upstream')
+@http_cache.cached(max_age=300, stale_while_revalidate=600)
 def weather_route():
-    loc = request.args.get('location', 'US')
-    return jsonify(get_current_weather(loc) or {})
+    if 'lat' in request.args and 'lon' in request.args:
+        try:
+            region, _ = analysis.region_index().nearest(float(request.args['lat']), float(request.args['lon']))
+        except ValueError:
+            return jsonify({"error": "Invalid coordinates"}), 400
+        weather = get_weather_at(region.lat, region.lon)
+    else:
+        loc = request.args.get('location', 'US')
+        if COUNTRY_COORDS.get(loc, (0, 0))[0] == 0:
+            return jsonify({"error": f"Unknown location '{loc}'"}), 400
+        weather = get_current_weather(loc)
+    if weather is None:
+        # Not cached: http_cache only marks 200 responses cacheable
+        return jsonify({"error": "Weather service unavailable"}), 502
+    return jsonify(weather)
+
+@app.route('/forecast/windows')
+@LIMITS.limit('upstream')
+@http_cache.cached(max_age=600)
+def forecast_windows():
+    # Best times in the coming days to pre-cool, run the laundry or charge the EV
+    kinds = request.args.get('kind', ','.join(forecast.KINDS)).split(',')
+    unknown = [k for k in kinds if k not in forecast.KINDS]
+    if unknown:
+        return jsonify({"error": f"Unknown kind '{unknown[0]}'; expected one of {', '.join(forecast.KINDS)}"}), 400
+    try:
+        hours = int(request.args['hours']) if 'hours' in request.args else None
+        count = int(request.args.get('count', 3))
+        forecast.check_window(hours, count)
+        if 'lat' in request.args and 'lon' in request.args:
+            lat, lon = float(request.args['lat']), float(request.args['lon'])
+            forecast.ForecastCache.key(lat, lon)
+        else:
+            loc = request.args.get('location', 'US')
+            if loc not in COUNTRY_COORDS:
+                return jsonify({"error": f"Unknown location '{loc}'"}), 400
+            lat, lon = COUNTRY_COORDS[loc]
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameters: {e}"}), 400
+    t0 = time.perf_counter()
+    try:
+        with tracing.span("forecast.get", lat=lat, lon=lon) as sp:
+            fc, state = FORECASTS.get(lat, lon)
+            sp.set(cache=state)
+    except forecast.ForecastError as e:
+        note_upstream(time.perf_counter() - t0)
+        return jsonify({"error": str(e)}), 502
+    if state != "HIT":
+        note_upstream(time.perf_counter() - t0)
+    return jsonify({"point": [fc.lat, fc.lon], "fetched_at": round(fc.fetched), "forecast_hours": fc.hours,
+                    "cache": state, "windows": {k: forecast.best_windows(fc, k, hours, count) for k in kinds}})
+
+def describe_region(region: regions.Region, dist_km: float) -> dict:
+    return {
+        "region": region.id,
+        "name": region.name,
+        "country": region.country,
+        "distance_km": round(float(dist_km), 1),
+        "carbon_intensity": region.carbon_intensity if region.carbon_intensity is not None else country(region.country).carbon_intensity,
+        "tariff": country(region.country).tariff.name,
+        "weather_point": [region.lat, region.lon]
+    }
+
+@app.route('/regions/nearest', methods=['GET', 'POST'])
+@http_cache.cached(max_age=86400)
+def nearest_region():
+    try:
+        if request.method == 'GET':
+            region, dist = analysis.region_index().nearest(float(request.args['lat']), float(request.args['lon']))
+            return jsonify(describe_region(region, dist))
+        # Batch: {"points": [[lat, lon], ...]} for bulk geocoded inputs
+        pts = np.asarray((request.json or {}).get('points', []), dtype=float).reshape(-1, 2)
+        if not len(pts):
+            return jsonify({"results": []})
+        idx, dist = analysis.region_index().nearest_batch(pts[:, 0], pts[:, 1])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Invalid coordinates"}), 400
+    return jsonify({"results": [describe_region(analysis.region_index().regions[i], d) for i, d in zip(idx.tolist(), dist.tolist())]})
+
+def carbon_price_updated() -> Optional[float]:
+    latest = CARBON_PRICES.ring.latest()
+    return latest[0] if latest else None
 
 @app.route('/carbon-price')
+@http_cache.cached(max_age=30, stale_while_revalidate=30, last_modified=carbon_price_updated)
 def price_route():
-    return jsonify(CARBON_PRICE_DEFAULT)
+    return jsonify(CARBON_PRICES.current())
+
+@app.route('/carbon-price/history')
+@http_cache.cached(max_age=30, stale_while_revalidate=30, last_modified=carbon_price_updated)
+def price_history_route():
+    # Downsampled min/max/avg buckets; defaults to the last 24 hours in 15-minute buckets
+    try:
+        until = float(request.args.get('until', time.time()))
+        since = float(request.args.get('since', until - 86400))
+        buckets = int(request.args.get('buckets', 96))
+    except ValueError:
+        return jsonify({"error": "Invalid since/until/buckets"}), 400
+    if since >= until or not 1 <= buckets <= price_feed.MAX_BUCKETS:
+        return jsonify({"error": f"Need since < until and 1..{price_feed.MAX_BUCKETS} buckets"}), 400
+    CARBON_PRICES.current()  # make sure the poller is running
+    return jsonify({"since": since, "until": until, "bucket_seconds": (until - since) / buckets,
+                    "current": CARBON_PRICES.current(), "buckets": CARBON_PRICES.history(since, until, buckets)})
+
+@app.route('/events')
+def events_route():
+    loc = request.args.get('location', 'US')
+    if loc not in COUNTRY_COORDS:
+        return jsonify({"error": "Unknown location"}), 400
+    try:
+        sub = LIVE.subscribe(loc)
+    except OverflowError as e:
+        return jsonify({"error": str(e)}), 503
+    return Response(stream_with_context(LIVE.stream(sub)), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/analyze', methods=['POST'])
+@LIMITS.limit('cpu')
 def analyze():
-    data = request.json
-    loc = data.get('location', 'US')
-    habits = data.get('habits', '').lower()
-    
+    data = request.json or {}
+    t0 = time.perf_counter()
     try:
-        daily_hours = float(data.get('daily_hours', 0))
-    except:
-        return jsonify({"error": "Invalid hours"}), 400
-
-    # 1. Advanced Load Calculation based on Habits
-    # Base load assumption (kW)
-    avg_load_kw = 0.5 
-    
-    profile_tags = [f"📍 {loc}"]
-    
-    # Keyword detection scoring
-    if any(x in habits for x in ['ac', 'cooling', 'air con']):
-        avg_load_kw += 1.5
-        profile_tags.append("❄️ Heavy Cooling")
-    if any(x in habits for x in ['heat', 'heater', 'winter']):
-        avg_load_kw += 1.5
-        profile_tags.append("🔥 Electric Heating")
-    if any(x in habits for x in ['ev', 'tesla', 'car', 'vehicle']):
-        avg_load_kw += 2.0
-        profile_tags.append("🚗 EV Owner")
-    if any(x in habits for x in ['office', 'wfh', 'computer', 'laptop']):
-        avg_load_kw += 0.2
-        profile_tags.append("💻 Remote Worker")
-    
-    # Calculate Monthly Consumption
-    monthly_kwh = daily_hours * 30 * avg_load_kw
-    
-    if monthly_kwh > 800: profile_tags.append("⚡ High Consumer")
-    else: profile_tags.append("🌱 Efficient Consumer")
-
-    # 2. Carbon Math
-    ci = CARBON_INTENSITY.get(loc, 450)
-    carbon_kg = round((monthly_kwh * ci) / 1000, 2)
-    trees = round(carbon_kg * 12 / 21)
-    
-    currency = CURRENCY_SYMBOL.get(loc, '$')
-    rate = ELECTRICITY_RATE.get(loc, 0.15)
-    
-    # 3. Financials
-    annual_cost = monthly_kwh * 12 * rate
-    potential_savings = annual_cost * 0.30 # Target 30% reduction
-    
-    # 4. Generate Specific Tips & Action Plan
-    tips = []
-    action_plan = []
-    
-    # General Start
-    action_plan.append("Day 1: Install a smart energy monitor to track peak usage.")
-
-    if "ac" in habits or "cool" in habits:
-        tips.extend(random.sample(ENERGY_TIPS['ac'], 2))
-        action_plan.append("Day 5: Service AC filters and set thermostat to 24°C.")
-    
-    if "heat" in habits:
-        tips.extend(random.sample(ENERGY_TIPS['heating'], 2))
-        action_plan.append("Day 7: Seal window drafts to prevent heat loss.")
-        
-    if "ev" in habits:
-        tips.extend(random.sample(ENERGY_TIPS['ev'], 2))
-        action_plan.append("Day 10: Schedule EV charging for off-peak hours (10PM+).")
-    
-    if "office" in habits or "laptop" in habits:
-        tips.extend(random.sample(ENERGY_TIPS['office'], 2))
-        
-    # Fill remaining tips
-    while len(tips) < 4:
-        tips.append(random.choice(ENERGY_TIPS['appliances'] + ENERGY_TIPS['lighting']))
-    
-    tips = list(set(tips))[:4] # Dedupe and limit
-
-    # 5. Renewable Logic (Location Specific)
-    renewables = []
-    pot = RENEWABLE_POTENTIAL.get(loc, {"solar": "moderate", "wind": "low"})
-    
-    if pot['solar'] == 'excellent':
-        renewables.append("☀️ Rooftop Solar: High potential. 5kW system can offset 90% usage.")
-    elif pot['solar'] == 'good':
-        renewables.append("☀️ Solar: Good ROI. Consider a 3-4kW system.")
-    
-    if pot['wind'] == 'excellent':
-        renewables.append("💨 Micro-Wind: Feasible if you have open land.")
-    
-    if monthly_kwh > 600:
-        renewables.append("🔋 Battery Storage: Essential for your high usage.")
-    
-    # Specific Bidar/India Logic
-    town = data.get('town', '')
-    if loc == "IN":
-        action_plan.append("Day 15: Check 'PM Surya Ghar' scheme eligibility.")
-        if town in BIDAR_TOWNS:
-             renewables.insert(0, f"☀️ Bidar Specific: Excellent solar irradiance (5.2 kWh/m²). Priority investment.")
-             profile_tags.append(f"📍 {town}")
-
-    # Finalize Action Plan
-    if len(action_plan) < 4:
-        action_plan.append("Day 20: Switch all remaining bulbs to LED.")
-        action_plan.append("Day 30: Review monthly bill for savings.")
-
-    summary = f"Based on your {daily_hours} hours of daily activity and detected habits, we estimate a load of {avg_load_kw}kW, resulting in approx {int(monthly_kwh)} kWh/month."
+        result = run_analysis(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if SHADOW is not None:
+        SHADOW.observe(data, result, time.perf_counter() - t0)
+    return jsonify(result)
+
+@app.route('/dashboard', methods=['POST'])
+@LIMITS.limit('cpu', 'upstream')
+def dashboard():
+    # One payload in, the selected parts out: {"fields": ["analysis", "solar", ...], ...inputs}
+    d = request.json or {}
+    fields = d.get('fields') or list(DASHBOARD_FIELDS)
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    unknown = [f for f in fields if f not in DASHBOARD_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown fields {unknown}; choose from {list(DASHBOARD_FIELDS)}"}), 400
+    data, errors = build_dashboard(d, list(dict.fromkeys(fields)))
+    if data:
+        status = 200
+    else:
+        # Nothing succeeded: an upstream problem when only I/O parts failed, bad input otherwise
+        status = 502 if all(f in DASHBOARD_IO_PARTS for f in errors) else 400
+    return jsonify({"data": data, "errors": errors}), status
+
+@app.route('/jobs/portfolio', methods=['POST'])
+@LIMITS.limit('cpu')
+def submit_portfolio():
+    d = request.json or {}
+    sites = d.get('sites')
+    if not isinstance(sites, list) or not all(isinstance(x, dict) for x in sites):
+        return jsonify({"error": "'sites' must be a list of site objects"}), 400
+    if len(sites) > jobs.MAX_ITEMS:
+        return jsonify({"error": f"At most {jobs.MAX_ITEMS} sites per job"}), 413
+    try:
+        chunk_size = int(d['chunk_size']) if d.get('chunk_size') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "'chunk_size' must be an integer"}), 400
+    try:
+        job = JOBS.submit(sites, analyze_site, chunk_size)
+    except OverflowError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({**job.progress(), "status_url": f"/jobs/{job.id}", "download_url": f"/jobs/{job.id}/download"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    out = job.progress()
+    if 'offset' in request.args or 'limit' in request.args:
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        except ValueError:
+            return jsonify({"error": "Invalid offset/limit"}), 400
+        out["results"] = job.partial(offset, limit)
+    return jsonify(out)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = JOBS.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.progress())
+
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.finished is None:
+        return jsonify({"error": "Job still running", **job.progress()}), 409
+    return Response(stream_with_context(job.stream()), mimetype='application/x-ndjson',
+                    headers={"Content-Disposition": f"attachment; filename=portfolio-{job.id}.ndjson"})
+
+@app.route('/stats')
+def stats_route():
+    dimension = request.args.get('dimension', 'country')
+    key = request.args.get('key')
+    if key is None:
+        return jsonify({"dimension": dimension, "keys": STATS().keys(dimension)})
+    summary = STATS().get(dimension, key)
+    if summary is None:
+        return jsonify({"error": f"No data for {dimension} '{key}'"}), 404
+    return jsonify(summary)
+
+@app.route('/admin/limits')
+def limits_route():
+    return jsonify(LIMITS.status())
+
+@app.route('/admin/access-log')
+def access_log_route():
+    return jsonify(ACCESS_LOG.status())
+
+@app.route('/admin/forecast')
+def forecast_status_route():
+    return jsonify(FORECASTS.status())
+
+@app.route('/admin/shadow')
+def shadow_route():
+    if SHADOW is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **SHADOW.report()})
+
+@app.route('/admin/traces')
+def traces_route():
+    try:
+        limit = int(request.args.get('limit', 50))
+        min_ms = float(request.args.get('min_ms', 0))
+    except ValueError:
+        return jsonify({"error": "Invalid limit or min_ms"}), 400
+    return jsonify({"status": TRACER.status(), "traces": TRACER.recent(limit, min_ms, request.args.get('name'))})
+
+@app.route('/admin/traces/<trace_id>')
+def trace_route(trace_id):
+    trace = TRACER.get(trace_id)
+    if trace is None:
+        return jsonify({"error": "Unknown trace"}), 404
+    return jsonify(trace)
+
+@app.route('/history')
+def history_route():
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        until = float(request.args['until']) if 'until' in request.args else None
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        bucket = max(int(request.args.get('bucket', 86400)), 1)
+    except ValueError:
+        return jsonify({"error": "Invalid time range"}), 400
+    country = request.args.get('country')
+    if request.args.get('view') == 'trends':
+        return jsonify(HISTORY.trends(country, since, until, bucket))
+    return jsonify(HISTORY.query(country, since, until, limit))
+
+# What-if sessions: the UI sends only the fields it changed and gets back only the
+# result fields that changed.
+@app.route('/analyze/session', methods=['POST'])
+@LIMITS.limit('cpu')
+def create_session():
+    try:
+        inputs = parse_inputs(request.json or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    sid, result = SESSIONS.create(inputs)
+    return jsonify({"session_id": sid, "result": result})
+
+@app.route('/analyze/session/<sid>', methods=['PATCH'])
+@LIMITS.limit('cpu')
+def update_session(sid):
+    try:
+        changes = parse_inputs(request.json or {}, partial=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    res = SESSIONS.update(sid, changes)
+    if res is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    changed, recomputed = res
+    return jsonify({"session_id": sid, "changed": changed, "recomputed": recomputed})
+
+@app.route('/analyze/session/<sid>', methods=['DELETE'])
+def delete_session(sid):
+    if not SESSIONS.drop(sid):
+        return jsonify({"error": "Unknown or expired session"}), 404
+    return jsonify({"deleted": sid})
+
+@app.route('/load-profile', methods=['POST'])
+@LIMITS.limit('cpu')
+def load_profile():
+    # Appliance-level load for a batch of households: {"location", "households": [{"habits", "daily_hours", "location"?}, ...]}
+    d = request.json or {}
+    homes = d.get('households') or [d]
+    try:
+        habits = [str(h.get('habits') or '') for h in homes]
+        hours = [float(h.get('daily_hours', 0)) for h in homes]
+        locs = [h.get('location') or d.get('location', 'US') for h in homes]
+        if not all(isinstance(loc, str) for loc in locs):
+            raise TypeError("location must be a country code")
+        reg = countries()
+        ci = reg.column('carbon_intensity')[reg.indices(locs)]
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"error": "Each household needs habits, numeric daily_hours and a country code location"}), 400
+    load = appliances.households(habits, hours, ci[:, None] * profiles.GRID_INTENSITY_SHAPE)
+    return jsonify({"appliances": list(appliances.NAMES), "results": [{
+        "daily_kwh": round(load['daily_kwh'][i], 3),
+        "monthly_kwh": round(load['monthly_kwh'][i], 1),
+        "peak_kw": round(load['peak_kw'][i], 3),
+        "carbon_kg_day": round(load['carbon_kg_day'][i], 3),
+        "hourly_kwh": np.round(load['hourly_kwh'][i], 3).tolist(),
+        "by_appliance_kwh": np.round(load['by_appliance_kwh'][i], 3).tolist(),
+    } for i in range(len(homes))]})
+
+@app.route('/battery-sizing', methods=['POST'])
+@LIMITS.limit('cpu')
+def battery_sizing():
+    d = request.json or {}
+    loc = d.get('location', 'US')
+    try:
+        if 'monthly_kwh' in d:
+            monthly_kwh = float(d['monthly_kwh'])
+        else:
+            monthly_kwh = float(d.get('daily_hours', 12)) * 30 * float(d.get('avg_load_kw', 0.5))
+        pv_kw = float(d['pv_kw']) if d.get('pv_kw') is not None else None
+        if len(d.get('capacities_kwh', ())) > battery.MAX_CAPACITIES:
+            raise ValueError(f"at most {battery.MAX_CAPACITIES} capacities_kwh")
+        if max(len(d.get('load_kw') or ()), len(d.get('generation_kw') or ())) > battery.MAX_SERIES_LENGTH:
+            raise ValueError(f"load_kw and generation_kw are limited to {battery.MAX_SERIES_LENGTH} values")
+        capacities = [float(c) for c in d.get('capacities_kwh', battery.DEFAULT_CAPACITIES_KWH)]
+        if not capacities or not all(0 <= c < float('inf') for c in capacities):
+            raise ValueError("capacities_kwh must be a non-empty list of capacities >= 0")
+        opts = {
+            "efficiency": float(d.get('efficiency', battery.DEFAULT_EFFICIENCY)),
+            "dod": float(d.get('depth_of_discharge', battery.DEFAULT_DOD)),
+            "power_kw": float(d['power_kw']) if d.get('power_kw') is not None else None,
+        }
+        if d.get('load_kw') and d.get('generation_kw'):
+            # Caller-supplied hourly series (e.g. from a smart meter export)
+            result = battery.simulate(d['load_kw'], d['generation_kw'], capacities,
+                                      intensity=country(loc).carbon_intensity, **opts)
+        else:
+            pv_kw, result = simulate_storage(loc, monthly_kwh, pv_kw, capacities, **opts)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid battery parameters: {e}"}), 400
 
     return jsonify({
-        "carbon_footprint_kg": carbon_kg,
-        "trees_needed": trees,
-        "annual_savings": f"{currency}{potential_savings:,.0f}",
-        "payback_period": "3-5" if "solar" in str(renewables).lower() else "1-2",
-        "action_plan": action_plan,
-        "renewable_recommendations": renewables,
-        "efficiency_tips": tips,
-        "profile_tags": profile_tags,
-        "habits_summary": summary
+        "pv_kw": round(pv_kw, 2) if pv_kw is not None else None,
+        "recommended_kwh": battery.recommend_capacity(result),
+        "candidates": battery.to_rows(result)
+    })
+
+@app.route('/ev-schedule', methods=['POST'])
+@LIMITS.limit('cpu')
+def ev_schedule():
+    d = request.json or {}
+    loc = d.get('location', 'US')
+    objective = d.get('objective', 'carbon')
+    if objective not in ev_scheduler.OBJECTIVE_WEIGHTS:
+        return jsonify({"error": f"Unknown objective '{objective}'"}), 400
+
+    # Batch mode: fleet operators send many vehicles sharing one set of grid signals
+    vehicles = d.get('vehicles') or [d]
+    try:
+        ci, rate = grid_signals(loc, d.get('intensity'), d.get('tariff'))
+        score = ev_scheduler.blend(ci, rate, ev_scheduler.OBJECTIVE_WEIGHTS[objective])
+        plan = ev_scheduler.schedule_batch(
+            score,
+            [float(v.get('energy_kwh', 10)) for v in vehicles],
+            [float(v.get('charger_kw', 7.4)) for v in vehicles],
+            [int(v.get('plug_in', 18)) for v in vehicles],
+            [int(v.get('plug_out', 7)) for v in vehicles],
+            contiguous=bool(d.get('contiguous', False)),
+        )
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({"error": f"Invalid schedule parameters: {e}"}), 400
+
+    totals = ev_scheduler.summarize(plan['kwh'], ci, rate)
+    curr = country(loc).currency
+    schedules = [{
+        "slots": ev_scheduler.to_slots(plan['kwh'][i]),
+        "carbon_kg": round(float(totals['carbon_kg'][i]), 3),
+        "cost": f"{curr}{totals['cost'][i]:,.2f}",
+        "shortfall_kwh": round(float(plan['shortfall_kwh'][i]), 3)
+    } for i in range(len(vehicles))]
+
+    if 'vehicles' not in d:
+        return jsonify(schedules[0])
+    return jsonify({
+        "schedules": schedules,
+        "fleet_carbon_kg": round(float(totals['carbon_kg'].sum()), 3),
+        "fleet_cost": f"{curr}{totals['cost'].sum():,.2f}"
+    })
+
+@app.route('/bill', methods=['POST'])
+@LIMITS.limit('cpu')
+def bill_route():
+    d = request.json or {}
+    loc = d.get('location', 'US')
+    try:
+        tariff = tariffs.Tariff("custom", d['tariff']) if d.get('tariff') else country(loc).tariff
+        minutes = int(d.get('interval_minutes', 60))
+        if d.get('kwh'):
+            kwh = d['kwh']
+        else:
+            kwh = profiles.hourly_load_year(float(d.get('monthly_kwh', 300)))
+            minutes = 60
+        b = tariffs.bill(tariff, kwh, minutes)
+    except (TypeError, ValueError, KeyError, IndexError) as e:
+        return jsonify({"error": f"Invalid billing parameters: {e}"}), 400
+
+    curr = country(loc).currency
+    return jsonify({
+        "tariff": tariff.name,
+        "months": [{
+            "month": int(b['month'][i]) + 1,
+            "kwh": round(float(b['kwh'][i]), 2),
+            "energy": round(float(b['energy'][i]), 2),
+            "demand": round(float(b['demand'][i]), 2),
+            "fixed": round(float(b['fixed'][i]), 2),
+            "total": round(float(b['total'][i]), 2)
+        } for i in range(len(b['total']))],
+        "total": f"{curr}{b['total'].sum():,.2f}"
     })
 
 # Estimator Routes
-@app.route('/solar-cost', methods=['POST'])
+# Estimators are deterministic: POST a JSON body, or GET a canonical query string that
+# shared caches can store (non-canonical queries redirect to the canonical URL)
+def estimator_response(estimate, params: tuple):
+    if request.method == 'GET':
+        canonical = http_cache.canonical_redirect(params)
+        if canonical is not None:
+            return canonical
+        d = request.args.to_dict()
+    else:
+        d = request.json or {}
+    try:
+        return jsonify(estimate(d))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+def posts_roof() -> bool:
+    # Roof polygons run the panel packer; the sqft estimate is cheap
+    d = request.get_json(silent=True) if request.method == 'POST' else None
+    return isinstance(d, dict) and d.get('roof') is not None
+
+@app.route('/solar-cost', methods=['GET', 'POST'])
+@LIMITS.limit('cpu', when=posts_roof)
+@http_cache.cached(max_age=86400)
 def solar_cost():
-    d = request.json
-    loc = d.get('location','US')
-    curr = CURRENCY_SYMBOL.get(loc, '$')
-    cost = 1000 if loc == 'IN' else 3000
-    total = float(d.get('roof_size_sqft',500)) * 0.015 * cost 
-    return jsonify({"total_cost": f"{curr}{total:,.0f}", "annual_savings": f"{curr}{total*0.15:,.0f}"})
-
-@app.route('/wind-estimate', methods=['POST'])
+    # POST may send a roof polygon (plus obstacles) instead of roof_size_sqft
+    return estimator_response(estimate_solar, ('location', 'roof_size_sqft'))
+
+MAX_ROOF_BATCH = 500
+
+@app.route('/solar-cost/batch', methods=['POST'])
+@LIMITS.limit('cpu')
+def solar_cost_batch():
+    # {"roofs": [{roof, obstacles, ...}, ...], ...shared fields}: one result or error per roof,
+    # layouts only when include_layout is set
+    d = request.json or {}
+    roofs = d.get('roofs')
+    if not isinstance(roofs, list) or not all(isinstance(x, dict) for x in roofs):
+        return jsonify({"error": "'roofs' must be a list of roof objects"}), 400
+    if len(roofs) > MAX_ROOF_BATCH:
+        return jsonify({"error": f"At most {MAX_ROOF_BATCH} roofs per request"}), 400
+    shared = {'include_layout': False, **{k: v for k, v in d.items() if k != 'roofs'}}
+    results = []
+    for roof in roofs:
+        try:
+            results.append(estimate_solar({**shared, **roof}))
+        except (TypeError, ValueError) as e:
+            results.append({"error": str(e)})
+    return jsonify({"results": results})
+
+@app.route('/wind-estimate', methods=['GET', 'POST'])
+@http_cache.cached(max_age=86400)
 def wind_estimate():
-    d = request.json
-    loc = d.get('location','US')
-    curr = CURRENCY_SYMBOL.get(loc, '$')
-    cost = 1200 if loc == 'IN' else 3500
-    kw = float(d.get('turbine_size_kw',5))
-    return jsonify({"total_cost": f"{curr}{kw*cost:,.0f}", "annual_energy_kwh": f"{kw*24*365*0.25:,.0f}"})
-
-@app.route('/hydro-estimate', methods=['POST'])
+    return estimator_response(estimate_wind, ('location', 'turbine_size_kw'))
+
+@app.route('/hydro-estimate', methods=['GET', 'POST'])
+@http_cache.cached(max_age=86400)
 def hydro_estimate():
-    d = request.json
-    loc = d.get('location','US')
-    curr = CURRENCY_SYMBOL.get(loc, '$')
-    kw = 9.81 * (float(d.get('flow_rate_lps',20))/1000) * float(d.get('head_height_m',5)) * 0.8
-    cost_per_kw = 1500 if loc == 'IN' else 4000
-    return jsonify({"system_size_kw": f"{kw:.2f}", "total_cost": f"{curr}{max(2000, kw*cost_per_kw):,.0f}"})
+    return estimator_response(estimate_hydro, ('location', 'flow_rate_lps', 'head_height_m'))
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
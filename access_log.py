@@ -0,0 +1,128 @@
+# Structured JSON access log written off the request path.
+#
+# record() makes the sampling decision and hands the entry to a bounded queue; that is all
+# a request pays for. A daemon writer drains the queue in batches, serialises one JSON
+# object per line, flushes once per batch and rotates the file by size
+# (access.log -> access.log.1 -> ... -> access.log.<backups>). High-volume routes (tiles,
+# assets, autocomplete) can be sampled down; errors and slow requests are always kept, and
+# every kept entry carries the rate it was sampled at so counts can be scaled back up.
+# When the queue is full entries are dropped and counted rather than blocking.
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional
+
+MAX_BYTES = 64 * 1024 * 1024
+BACKUPS = 5
+QUEUE_SIZE = 10000
+BATCH = 512
+FLUSH_SECONDS = 1.0
+SLOW_SECONDS = 1.0
+
+_STOP = object()
+
+
+class AccessLog:
+    def __init__(self, path: Optional[str], max_bytes: int = MAX_BYTES, backups: int = BACKUPS,
+                 sample: Optional[dict] = None, slow_seconds: float = SLOW_SECONDS, queue_size: int = QUEUE_SIZE):
+        self.path = path or None  # None disables logging
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample = dict(sample or {})  # route rule -> fraction of entries kept
+        self.slow_seconds = slow_seconds
+        self.written = self.dropped = self.sampled_out = self.rotations = 0
+        self.last_error = None
+        self._queue = queue.Queue(queue_size)
+        self._writer = None
+        self._start_lock = threading.Lock()
+
+    def keep(self, route: str, status: int, seconds: float) -> float:
+        # Rate the entry is kept at, or 0.0 when sampled out
+        rate = self.sample.get(route, 1.0)
+        if rate >= 1.0 or status >= 400 or seconds >= self.slow_seconds:
+            return 1.0
+        if random.random() < rate:
+            return rate
+        self.sampled_out += 1
+        return 0.0
+
+    def record(self, entry: dict):
+        if self.path is None:
+            return
+        if self._writer is None:
+            self._start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._run, name="access-log", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        f = None
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(batch) < BATCH:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = any(e is _STOP for e in batch)
+            lines = "".join(json.dumps(e, separators=(",", ":"), default=str) + "\n" for e in batch if e is not _STOP)
+            try:
+                if f is None:
+                    f = open(self.path, "a", encoding="utf-8")
+                f.write(lines)
+                f.flush()
+                self.written += len(batch) - stop
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    f = None
+                    self._rotate()
+                self.last_error = None
+            except OSError as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.dropped += len(batch) - stop
+                if f is not None:
+                    f.close()
+                    f = None
+            if stop:
+                if f is not None:
+                    f.close()
+                return
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def close(self, timeout: float = 5.0):
+        # Flush what is queued and stop the writer
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        writer.join(timeout)
+
+    def status(self) -> dict:
+        return {"path": self.path, "queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "sampled_out": self.sampled_out, "rotations": self.rotations, "last_error": self.last_error}
@@ -0,0 +1,367 @@
+# Analysis core: the household model behind /analyze, the estimators and the storage and
+# scheduling helpers, with no web framework or HTTP client involved. Batch jobs and CLIs
+# import this module directly; 0000.py serves it.
+#
+# Startup stays cheap: the reference data, grid-region index and climatology are built on
+# first use (lazy()), not at import. The web app pins one reference-data snapshot per
+# request with pin()/unpin() so a reload mid-request never mixes versions.
+import atexit
+import contextvars
+import os
+import random
+import threading
+from functools import wraps
+from typing import Callable, Optional
+
+import numpy as np
+
+import appliances
+import battery
+import degree_days
+import ev_scheduler
+import pipeline
+import profiles
+import refdata
+import regions
+import registry
+import roof_layout
+import tariffs
+import tracing
+
+CARBON_PRICE_DEFAULT = 50.0
+# Where parse_inputs() gets the carbon price when the payload has none (the app points it at the live feed)
+carbon_price_source: Callable[[], float] = lambda: CARBON_PRICE_DEFAULT
+
+# --- CONFIGURATION & DATA ---
+
+def lazy(build: Callable[[], object]) -> Callable[[], object]:
+    # Zero-argument singleton built on first call; concurrent first calls build it once
+    value, lock = [], threading.Lock()
+
+    @wraps(build)
+    def get():
+        if not value:
+            with lock:
+                if not value:
+                    value.append(build())
+        return value[0]
+    return get
+
+# Reference data (carbon intensity, currencies, rates, tariffs, renewable potential, tips)
+# lives in data/reference.json and is hot-reloaded; see refdata.py
+@lazy
+def refdata_store() -> refdata.RefData:
+    # Every candidate snapshot compiles its registry before it is swapped in
+    store = refdata.RefData(os.environ.get('ECO_REFDATA', refdata.DEFAULT_PATH),
+                            float(os.environ.get('ECO_REFDATA_POLL', refdata.POLL_SECONDS)),
+                            prepare=lambda snap: snap.derived('registry', _build_registry))
+    store.watch()
+    return store
+
+_pinned = contextvars.ContextVar("eco_ref", default=None)
+
+def pin() -> contextvars.Token:
+    return _pinned.set(refdata_store().current)
+
+def unpin(token: contextvars.Token):
+    try:
+        _pinned.reset(token)
+    except ValueError:  # popped from another context
+        _pinned.set(None)
+
+def ref() -> refdata.Snapshot:
+    # The pinned snapshot inside a request, else the current one
+    snap = _pinned.get()
+    return snap if snap is not None else refdata_store().current
+
+# Bidar towns with town-specific advice
+BIDAR_TOWNS = ["Aurad", "Basavakalyan", "Bhalki", "Chitgoppa", "Hulsoor", "Humnabad", 
+               "Kamalnagar", "Old City", "New City", "Gumpa", "Mailoor", "Chidri"]
+
+# Country centroids (lat, lon)
+COUNTRY_COORDS = {
+    "US": (37.09, -95.71), "IN": (20.59, 78.96), "DE": (51.16, 10.45),
+    "FR": (46.22, 2.21), "BR": (-14.23, -51.92), "CA": (56.13, -106.34),
+    "AU": (-25.27, 133.77), "JP": (36.20, 138.25), "GB": (55.37, -3.43),
+    "IT": (41.87, 12.56), "MX": (23.63, -102.55), "ZA": (-30.56, 22.94),
+    "KR": (35.91, 127.77), "ES": (40.46, -3.75), "SE": (60.13, 18.64),
+    "CN": (35.86, 104.20), "RU": (61.52, 105.32), "AR": (-38.42, -63.62),
+    "EG": (26.82, 30.80), "NG": (9.08, 8.68), "NO": (60.47, 8.47),
+    "IS": (64.96, -19.02), "NZ": (-40.90, 174.89), "CH": (46.82, 8.23),
+    "FI": (61.92, 25.75), "DK": (56.26, 9.50), "NL": (52.13, 5.29),
+    "BE": (50.50, 4.47), "AT": (47.52, 14.55), "PL": (51.92, 19.15)
+}
+
+def countries() -> registry.Registry:
+    # Country records (defaults applied, tariffs compiled), built once per reference-data snapshot
+    return ref().derived('registry', _build_registry)
+
+def _build_registry(snap: refdata.Snapshot) -> registry.Registry:
+    return registry.build(snap, COUNTRY_COORDS)
+
+def country(loc: str) -> registry.CountryRecord:
+    return countries().get(loc)
+
+# Grid regions for coordinate lookups: country centroids, or a CSV of regional centroids
+@lazy
+def region_index() -> regions.RegionIndex:
+    return regions.RegionIndex(
+        regions.load_csv(os.environ['ECO_REGIONS']) if os.environ.get('ECO_REGIONS')
+        else regions.from_countries(COUNTRY_COORDS, {}))  # intensity from the live reference data
+
+# Daily-temperature climatology per grid region (memory-mapped, built on first use)
+@lazy
+def climate() -> degree_days.Climatology:
+    clim = degree_days.Climatology(os.environ.get('ECO_CLIMATE_DIR', 'eco_climate'), region_index().regions)
+    atexit.register(clim.flush)
+    return clim
+
+# --- STORAGE & SCHEDULING ---
+
+def simulate_storage(loc: str, monthly_kwh: float, pv_kw: Optional[float] = None,
+                     capacities=battery.DEFAULT_CAPACITIES_KWH, **opts) -> tuple:
+    lat = COUNTRY_COORDS.get(loc, (20.0, 0.0))[0]
+    load = profiles.hourly_load_year(monthly_kwh)
+    if pv_kw is None:
+        # Size the array to cover annual usage, capped at a typical rooftop
+        pv_kw = min(10.0, monthly_kwh * 12 / profiles.annual_yield_per_kw(lat))
+    gen = profiles.hourly_solar_year(pv_kw, lat)
+    result = battery.simulate(load, gen, capacities, intensity=country(loc).carbon_intensity, **opts)
+    return pv_kw, result
+
+def grid_signals(loc: str, intensity=None, tariff=None) -> tuple:
+    # 48h hourly carbon intensity (gCO2/kWh) and tariff (local currency/kWh) for scheduling
+    ci = ev_scheduler.horizon(intensity, 0) if intensity else profiles.hourly_intensity(country(loc).carbon_intensity, ev_scheduler.HORIZON)
+    rate = ev_scheduler.horizon(tariff if tariff else country(loc).tariff.hourly_marginal(), 0)
+    return ci, rate
+
+# --- ANALYSIS STAGES ---
+
+# Estimators: pure functions of the request payload, shared by their routes and /dashboard
+
+def estimate_solar(d: dict) -> dict:
+    loc = d.get('location','US')
+    curr = country(loc).currency
+    cost = 1000 if loc == 'IN' else 3000
+    if d.get('roof') is None:
+        total = float(d.get('roof_size_sqft',500)) * 0.015 * cost 
+        return {"total_cost": f"{curr}{total:,.0f}", "annual_savings": f"{curr}{total*0.15:,.0f}"}
+    # Capacity from the panels that actually fit on the roof polygon
+    fit = roof_layout.layout(d['roof'], d.get('obstacles') or (),
+                             setback=d.get('setback'), clearance=d.get('clearance'),
+                             units=d.get('units', 'm'))
+    total = fit.kw * cost
+    return {"total_cost": f"{curr}{total:,.0f}", "annual_savings": f"{curr}{total*0.15:,.0f}",
+            **fit.as_dict(include_layout=bool(d.get('include_layout', True)))}
+
+def estimate_wind(d: dict) -> dict:
+    loc = d.get('location','US')
+    curr = country(loc).currency
+    cost = 1200 if loc == 'IN' else 3500
+    kw = float(d.get('turbine_size_kw',5))
+    return {"total_cost": f"{curr}{kw*cost:,.0f}", "annual_energy_kwh": f"{kw*24*365*0.25:,.0f}"}
+
+def estimate_hydro(d: dict) -> dict:
+    loc = d.get('location','US')
+    curr = country(loc).currency
+    kw = 9.81 * (float(d.get('flow_rate_lps',20))/1000) * float(d.get('head_height_m',5)) * 0.8
+    cost_per_kw = 1500 if loc == 'IN' else 4000
+    return {"system_size_kw": f"{kw:.2f}", "total_cost": f"{curr}{max(2000, kw*cost_per_kw):,.0f}"}
+
+def parse_inputs(data: dict, partial: bool = False) -> dict:
+    # Normalised analysis inputs; with partial=True only the fields present are returned
+    inputs = {}
+    if data.get('lat') is not None and data.get('lon') is not None and not data.get('location'):
+        # Raw coordinates resolve to the nearest grid region's country
+        try:
+            region, _ = region_index().nearest(float(data['lat']), float(data['lon']))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid coordinates")
+        inputs['location'] = region.country
+    elif not partial or 'location' in data:
+        inputs['location'] = data.get('location', 'US')
+    if not partial or 'habits' in data:
+        inputs['habits'] = (data.get('habits') or '').lower()
+    if not partial or 'daily_hours' in data:
+        try:
+            inputs['daily_hours'] = float(data.get('daily_hours', 0))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid hours")
+    if not partial or 'town' in data:
+        inputs['town'] = data.get('town') or ''
+    if 'carbon_price' in data:
+        try:
+            inputs['carbon_price'] = float(data['carbon_price'])
+        except (TypeError, ValueError):
+            raise ValueError("Invalid carbon price")
+    elif not partial:
+        inputs['carbon_price'] = carbon_price_source()
+    return inputs
+
+# Habit flags shown as profile tags, keyed to the catalog appliance that implies them
+HABIT_APPLIANCES = {"cooling": "air_conditioner", "heating": "space_heater", "ev": "ev_charger", "office": "computer"}
+
+def climate_load(loc: str, counts: np.ndarray, daily_hours: float) -> Optional[dict]:
+    # Degree-day heating/cooling kWh per month for the detected HVAC appliances,
+    # conditioned during the active hours; None when the location has no climatology
+    if loc not in COUNTRY_COORDS:
+        return None
+    region, _ = region_index().nearest(*COUNTRY_COORDS[loc])
+    daily = climate().daily(region.id)
+    if daily is None:
+        return None
+    kw = dict(zip(appliances.NAMES, counts * appliances.DRAW_KW))
+    return degree_days.hvac_monthly_kwh(daily, kw['space_heater'], kw['air_conditioner'], min(max(daily_hours, 0), 24) / 24)
+
+def load_stage(inp, up):
+    # 1. Appliance-level load: catalog appliances detected from habits. Lighting, plugs and
+    # office gear run over the active hours; heating and cooling follow local degree days.
+    with tracing.span("keywords"):
+        counts = appliances.detect(inp['habits'])
+    hours = appliances.daily_hours_matrix(counts, inp['daily_hours'])
+    hvac = climate_load(inp['location'], counts, inp['daily_hours'])
+    if hvac is not None:
+        for name, key in (("space_heater", "heating_kwh"), ("air_conditioner", "cooling_kwh")):
+            a = appliances.NAMES.index(name)
+            hours[0, a] = min(hvac[key].sum() / 365 / appliances.DRAW_KW[a], 24.0)
+    load = appliances.evaluate(counts, appliances.usage(hours))
+    hourly = load['hourly_kwh'][0]
+    flags = {flag: bool(counts[appliances.NAMES.index(name)]) for flag, name in HABIT_APPLIANCES.items()}
+    monthly_kwh = float(load['monthly_kwh'][0])
+    peak_kw = float(load['peak_kw'][0])
+    summary = f"Based on your {inp['daily_hours']} hours of daily activity and detected habits, we estimate a peak demand of {peak_kw:.1f}kW, resulting in approx {int(monthly_kwh)} kWh/month."
+    out = {"_monthly_kwh": monthly_kwh, "_hourly_kwh": tuple(hourly.tolist()), "_flags": flags,
+           "peak_demand_kw": round(peak_kw, 2), "habits_summary": summary}
+    if hvac is not None:
+        out["degree_days"] = {k: np.round(v, 1).tolist() for k, v in hvac.items()}
+    return out
+
+def profile_stage(inp, up):
+    load = up['load']
+    profile_tags = [f"📍 {inp['location']}"]
+    if load['_flags']['cooling']: profile_tags.append("❄️ Heavy Cooling")
+    if load['_flags']['heating']: profile_tags.append("🔥 Electric Heating")
+    if load['_flags']['ev']: profile_tags.append("🚗 EV Owner")
+    if load['_flags']['office']: profile_tags.append("💻 Remote Worker")
+
+    if load['_monthly_kwh'] > 800: profile_tags.append("⚡ High Consumer")
+    else: profile_tags.append("🌱 Efficient Consumer")
+
+    if inp['location'] == "IN" and inp['town'] in BIDAR_TOWNS:
+        profile_tags.append(f"📍 {inp['town']}")
+    return {"profile_tags": profile_tags}
+
+def household_year(load: dict) -> np.ndarray:
+    # 8760-hour load repeating the household's own daily shape
+    hourly = np.asarray(load['_hourly_kwh'])
+    if hourly.sum() <= 0:
+        return profiles.hourly_load_year(0.0)
+    return profiles.hourly_load_year(load['_monthly_kwh'], hourly / hourly.sum())
+
+def carbon_stage(inp, up):
+    # 2. Carbon Math
+    ci = country(inp['location']).carbon_intensity
+    # Hourly load against the diurnal grid-intensity curve
+    carbon_kg = round(30 * float(np.dot(up['load']['_hourly_kwh'], profiles.hourly_intensity(ci))) / 1000, 2)
+    trees = round(carbon_kg * 12 / 21)
+    return {"carbon_footprint_kg": carbon_kg, "trees_needed": trees}
+
+def carbon_value_stage(inp, up):
+    # Avoided CO2 (the 30% reduction target) priced at the current carbon price
+    avoided_kg = up['carbon']['carbon_footprint_kg'] * 12 * 0.30
+    value = avoided_kg / 1000 * inp['carbon_price']
+    return {"avoided_co2_kg": round(avoided_kg, 1), "carbon_price": inp['carbon_price'], "avoided_co2_value": f"${value:,.2f}"}
+
+def financial_stage(inp, up):
+    # 3. Financials (hourly load billed against the local tariff)
+    loc = inp['location']
+    currency = country(loc).currency
+    annual_cost = tariffs.bill(country(loc).tariff, household_year(up['load']))['total'].sum()
+    potential_savings = annual_cost * 0.30 # Target 30% reduction
+    return {"_potential_savings": float(potential_savings), "annual_savings": f"{currency}{potential_savings:,.0f}"}
+
+def tips_stage(inp, up):
+    # 4a. Specific Tips
+    habits = inp['habits']
+    energy_tips = ref().energy_tips
+    tips = []
+    if "ac" in habits or "cool" in habits:
+        tips.extend(random.sample(energy_tips['ac'], 2))
+    if "heat" in habits:
+        tips.extend(random.sample(energy_tips['heating'], 2))
+    if "ev" in habits:
+        tips.extend(random.sample(energy_tips['ev'], 2))
+    if "office" in habits or "laptop" in habits:
+        tips.extend(random.sample(energy_tips['office'], 2))
+
+    # Fill remaining tips
+    while len(tips) < 4:
+        tips.append(random.choice(energy_tips['appliances'] + energy_tips['lighting']))
+
+    return {"efficiency_tips": list(set(tips))[:4]} # Dedupe and limit
+
+def renewables_stage(inp, up):
+    # 5. Renewable Logic (Location Specific)
+    loc = inp['location']
+    monthly_kwh = up['load']['_monthly_kwh']
+    renewables = list(country(loc).renewables)  # base solar/wind advice, precomputed per country
+
+    if monthly_kwh > 600:
+        with tracing.span("battery.simulate"):
+            pv_kw, sim = simulate_storage(loc, monthly_kwh, capacities=[0, 2.5, 5, 7.5, 10, 13.5, 15, 20])
+        best = battery.recommend_capacity(sim)
+        i = list(sim['capacity_kwh']).index(best)
+        renewables.append(f"🔋 Battery Storage: Essential for your high usage. A {best:g} kWh battery with {pv_kw:.1f} kW solar "
+                          f"lifts self-consumption to {sim['self_consumption'][i]:.0%} and avoids {sim['co2_avoided_kg'][i]:,.0f} kg CO2/yr.")
+
+    # Specific Bidar/India Logic
+    if loc == "IN" and inp['town'] in BIDAR_TOWNS:
+        renewables.insert(0, f"☀️ Bidar Specific: Excellent solar irradiance (5.2 kWh/m²). Priority investment.")
+
+    return {
+        "renewable_recommendations": renewables,
+        "payback_period": "3-5" if "solar" in str(renewables).lower() else "1-2"
+    }
+
+def plan_stage(inp, up):
+    # 4b. Action Plan
+    habits = inp['habits']
+    loc = inp['location']
+    # General Start
+    action_plan = ["Day 1: Install a smart energy monitor to track peak usage."]
+
+    if "ac" in habits or "cool" in habits:
+        action_plan.append("Day 5: Service AC filters and set thermostat to 24°C.")
+    if "heat" in habits:
+        action_plan.append("Day 7: Seal window drafts to prevent heat loss.")
+    if "ev" in habits:
+        # Typical commuter: 10 kWh/night on a 7.4 kW wallbox, plugged in 6PM-7AM
+        ci, rate = grid_signals(loc)
+        plan = ev_scheduler.schedule_batch(ci, 10, 7.4, 18, 7, contiguous=True)
+        first = ev_scheduler.to_slots(plan['kwh'][0])[0]['hour']
+        action_plan.append(f"Day 10: Schedule EV charging to start at {first:02d}:00 (lowest-carbon window).")
+    if loc == "IN":
+        action_plan.append("Day 15: Check 'PM Surya Ghar' scheme eligibility.")
+
+    # Finalize Action Plan
+    if len(action_plan) < 4:
+        action_plan.append("Day 20: Switch all remaining bulbs to LED.")
+        action_plan.append("Day 30: Review monthly bill for savings.")
+    return {"action_plan": action_plan}
+
+ANALYSIS = pipeline.Pipeline([
+    pipeline.Stage("load", ['location', 'habits', 'daily_hours'], [], load_stage),
+    pipeline.Stage("carbon", ['location'], ['load'], carbon_stage),
+    pipeline.Stage("carbon_value", ['carbon_price'], ['carbon'], carbon_value_stage),
+    pipeline.Stage("financial", ['location'], ['load'], financial_stage),
+    pipeline.Stage("tips", ['habits'], [], tips_stage),
+    pipeline.Stage("renewables", ['location', 'town'], ['load'], renewables_stage),
+    pipeline.Stage("plan", ['location', 'habits'], [], plan_stage),
+    pipeline.Stage("profile", ['location', 'town'], ['load'], profile_stage),
+])
+
+def analyze(data: dict) -> tuple:
+    # (inputs, stage outputs, public result) for one payload
+    inputs = parse_inputs(data)
+    outputs, _ = ANALYSIS.run(inputs)
+    return inputs, outputs, ANALYSIS.result(outputs)
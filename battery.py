@@ -0,0 +1,105 @@
+# Battery dispatch simulator: self-consumption dispatch over a year of hourly data,
+# evaluated for many candidate capacities at once.
+#
+# Each hour maps the state of charge through f(s) = clip(s + x, lo, hi), where x is the
+# (efficiency-adjusted) PV surplus or deficit. Clamped shifts compose into clamped shifts,
+# so the whole year is solved with a log2(T)-pass prefix scan over (capacity, hour)
+# arrays instead of a Python loop per hour.
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+DEFAULT_CAPACITIES_KWH = np.arange(0.0, 20.5, 0.5)
+DEFAULT_EFFICIENCY = 0.90  # round trip
+DEFAULT_DOD = 0.90  # usable fraction of nameplate
+# The scan works on (capacity, hour) arrays, so both dimensions are capped per request
+MAX_CAPACITIES = 100
+MAX_SERIES_LENGTH = 2 * 8784  # a leap year at half-hourly resolution
+
+
+def _scan_bounds(x: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> tuple:
+    # Inclusive prefix composition of clip(s + x_t, lo, hi); returns (A, L, H) such that
+    # soc_t = clip(s0 + A_t, L_t, H_t).
+    n = x.shape[0]
+    a = x.copy()
+    l = np.broadcast_to(lo[:, None], (lo.shape[0], n)).copy()
+    h = np.broadcast_to(hi[:, None], (hi.shape[0], n)).copy()
+    d = 1
+    while d < n:
+        # later segment (t) applied after earlier segment (t - d)
+        a2 = a[d:]
+        l2, h2 = l[:, d:], h[:, d:]
+        new_l = np.clip(l[:, :-d] + a2, l2, h2)
+        new_h = np.clip(h[:, :-d] + a2, l2, h2)
+        a[d:] = a[:-d] + a2
+        l[:, d:] = new_l
+        h[:, d:] = new_h
+        d *= 2
+    return a, l, h
+
+
+def simulate(load: np.ndarray, generation: np.ndarray,
+             capacities: Union[Sequence[float], np.ndarray] = DEFAULT_CAPACITIES_KWH,
+             efficiency: float = DEFAULT_EFFICIENCY, dod: float = DEFAULT_DOD,
+             power_kw: Optional[float] = None,
+             intensity: Union[float, np.ndarray] = 450.0) -> dict:
+    load = np.asarray(load, dtype=float)
+    generation = np.asarray(generation, dtype=float)
+    caps = np.atleast_1d(np.asarray(capacities, dtype=float))
+    if load.shape != generation.shape or load.ndim != 1:
+        raise ValueError("load and generation must be 1-D arrays of equal length")
+    if not (0 < efficiency <= 1) or not (0 < dod <= 1):
+        raise ValueError("efficiency and depth of discharge must be in (0, 1]")
+
+    leg = np.sqrt(efficiency)  # split round-trip losses between charge and discharge
+    net = generation - load
+    surplus = np.clip(net, 0, None)
+    deficit = np.clip(-net, 0, None)
+    if power_kw is not None:
+        charge_in, discharge_out = np.minimum(surplus, power_kw), np.minimum(deficit, power_kw)
+    else:
+        charge_in, discharge_out = surplus, deficit
+    x = charge_in * leg - discharge_out / leg
+
+    lo = caps * (1 - dod)
+    hi = caps
+    a, l, h = _scan_bounds(x, lo, hi)
+    soc = np.clip(lo[:, None] + a, l, h)  # start the year empty (at the DoD floor)
+
+    delta = np.diff(soc, axis=1, prepend=lo[:, None])
+    stored = np.clip(delta, 0, None)
+    delivered = np.clip(-delta, 0, None) * leg
+
+    ci = np.broadcast_to(np.asarray(intensity, dtype=float), load.shape)
+    total_gen = generation.sum()
+    direct = np.minimum(load, generation).sum()
+    charged_from_pv = stored.sum(axis=1) / leg
+    grid_import = deficit.sum() - delivered.sum(axis=1)
+    grid_export = surplus.sum() - charged_from_pv
+
+    return {
+        "capacity_kwh": caps,
+        "self_consumption": (direct + charged_from_pv) / total_gen if total_gen > 0 else np.zeros_like(caps),
+        "self_sufficiency": 1 - grid_import / load.sum() if load.sum() > 0 else np.zeros_like(caps),
+        "grid_import_kwh": grid_import,
+        "grid_export_kwh": grid_export,
+        "co2_avoided_kg": delivered @ ci / 1000,
+        "cycles": delivered.sum(axis=1) / np.where(caps > 0, caps * dod, 1),
+    }
+
+
+def recommend_capacity(result: dict, share: float = 0.9) -> Optional[float]:
+    # Smallest capacity reaching `share` of the best achievable import reduction (the knee)
+    imports = result["grid_import_kwh"]
+    if not len(imports):
+        return None
+    gain = imports[0] - imports
+    if gain.max() <= 0:
+        return float(result["capacity_kwh"][0])
+    idx = int(np.argmax(gain >= share * gain.max()))
+    return float(result["capacity_kwh"][idx])
+
+
+def to_rows(result: dict) -> list:
+    keys = list(result.keys())
+    return [{k: round(float(result[k][i]), 4) for k in keys} for i in range(len(result["capacity_kwh"]))]
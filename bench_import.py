@@ -0,0 +1,75 @@
+# Import-time budget for the entry points.
+#
+#   python bench_import.py [--runs N] [--scale X]
+#
+# imports each target in a fresh interpreter N times (best run counts, so a busy machine
+# does not fail the check) and exits 1 when one goes over its budget or pulls in a module
+# that must stay lazy: the analysis core loads without Flask or the HTTP client, and the
+# apps leave `requests` to the first outbound call. --scale multiplies every budget
+# (e.g. for slow CI machines). Side-effect files go to a temporary directory.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# target -> (budget in ms, modules that must not be imported)
+BUDGETS = {
+    "analysis": (200, ("flask", "werkzeug", "jinja2", "requests")),
+    "0000.py": (450, ("requests",)),
+    "000.py": (250, ("requests",)),
+}
+
+CHILD = """
+import importlib, importlib.util, json, sys, time
+target = sys.argv[1]
+t0 = time.perf_counter()
+if target.endswith(".py"):
+    spec = importlib.util.spec_from_file_location("bench_target", target)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+else:
+    importlib.import_module(target)
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({"ms": ms, "modules": sorted(m.split(".")[0] for m in sys.modules)}))
+"""
+
+
+def measure(target: str, runs: int, env: dict) -> tuple:
+    # (best import time in ms, top-level modules loaded)
+    best, modules = None, set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", CHILD, target], cwd=BASE_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        best = result["ms"] if best is None else min(best, result["ms"])
+        modules.update(result["modules"])
+    return best, modules
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=BASE_DIR,
+                   ECO_RATELIMIT_FILE=os.path.join(tmp, "ratelimit.bin"), ECO_ACCESS_LOG="",
+                   ECO_HISTORY_DB=os.path.join(tmp, "history.db"), ECO_CLIMATE_DIR=os.path.join(tmp, "climate"),
+                   ECO_STATS_SNAPSHOT=os.path.join(tmp, "stats.json"), ECO_TILE_CACHE=os.path.join(tmp, "tiles"))
+        for target, (budget, forbidden) in BUDGETS.items():
+            ms, modules = measure(target, args.runs, env)
+            limit = budget * args.scale
+            leaked = [m for m in forbidden if m in modules]
+            ok = ms <= limit and not leaked
+            failed |= not ok
+            note = f"  loaded {', '.join(leaked)}" if leaked else ""
+            print(f"{'ok  ' if ok else 'FAIL'} {target:10} {ms:7.1f} ms  (budget {limit:.0f} ms){note}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# Degree-day heating and cooling model over a local daily-temperature climatology.
+#
+# The climatology is one float32 row of 365 daily mean temperatures per region, stored as
+# climatology.npy (+ climatology.json with the region ids) and opened with np.load(...,
+# mmap_mode="r+"): every request shares the same pages, and nothing is read until first
+# use. Rows missing from the cache are synthesized from latitude (annual sinusoid) and
+# written once. observe() collects measured temperatures per region in memory and folds
+# each completed day's mean into that day's value once; climatology.seen.npy records the
+# last folded day per row, so with several workers only the first to finish a day counts.
+# Writes to the shared files happen under an fcntl lock on climatology.lock.
+import json
+import math
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # single-process deployments only; threads still use the in-process lock
+    fcntl = None
+
+DAYS = 365
+HDD_BASE_C = 18.0
+CDD_BASE_C = 22.0
+HEAT_LOSS_KW_PER_K = 0.15   # whole-home UA for a typical dwelling
+HEATING_EFFICIENCY = 1.0    # resistive heat
+COOLING_COP = 3.0
+OBSERVE_WEIGHT = 0.1
+
+MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+MONTH_STARTS = np.concatenate([[0], np.cumsum(MONTH_DAYS)[:-1]])
+
+
+def synthetic_year(lat: float) -> np.ndarray:
+    # Annual mean cools away from the tropics, seasonal swing grows with latitude,
+    # warmest around day 200 in the north and day 17 in the south
+    mean = 28.0 - 0.45 * max(abs(lat) - 10.0, 0.0)
+    amp = 1.0 + 0.2 * abs(lat)
+    peak = 200 if lat >= 0 else 17
+    day = np.arange(DAYS)
+    return (mean + amp * np.cos(2 * np.pi * (day - peak) / DAYS)).astype(np.float32)
+
+
+def _day_stamp(when: Optional[float]) -> int:
+    t = time.gmtime(when)
+    return t.tm_year * 1000 + t.tm_yday
+
+
+def _save(path: str, arr: np.ndarray):
+    # Unique temp name per process and thread, then an atomic rename
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+class Climatology:
+    def __init__(self, directory: str, regions: Iterable):
+        # regions: objects with .id and .lat (see regions.Region)
+        self.directory = directory
+        self._lats = {r.id: r.lat for r in regions}
+        self._rows = None
+        self._data = None
+        self._seen = None
+        self._pending = {}  # region -> [day stamp, sum of readings, count]
+        self._lock = threading.Lock()
+        self._lockfile = None
+
+    @property
+    def _paths(self) -> tuple:
+        return (os.path.join(self.directory, "climatology.npy"), os.path.join(self.directory, "climatology.json"),
+                os.path.join(self.directory, "climatology.seen.npy"))
+
+    def _lock_file(self):
+        if self._lockfile:
+            fcntl.flock(self._lockfile, fcntl.LOCK_EX)
+
+    def _unlock_file(self):
+        if self._lockfile:
+            fcntl.flock(self._lockfile, fcntl.LOCK_UN)
+
+    def _load(self):
+        with self._lock:
+            if self._data is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            if fcntl:
+                self._lockfile = open(os.path.join(self.directory, "climatology.lock"), "a+b")
+            self._lock_file()
+            try:
+                npy, idx, seen_npy = self._paths
+                ids, data, seen = [], None, None
+                try:
+                    with open(idx, encoding="utf-8") as f:
+                        ids = json.load(f)["regions"]
+                    data = np.load(npy, mmap_mode="r+")
+                    if data.shape != (len(ids), DAYS):
+                        ids, data = [], None
+                    else:
+                        seen = np.load(seen_npy, mmap_mode="r+")
+                        if seen.shape != (len(ids),):
+                            seen = None
+                except (OSError, ValueError, KeyError):
+                    if data is None:
+                        ids = []
+                missing = [r for r in self._lats if r not in set(ids)]
+                if missing or data is None or seen is None:
+                    ids, data, seen = self._extend(ids, data, seen, missing)
+            finally:
+                self._unlock_file()
+            self._rows = {r: i for i, r in enumerate(ids)}
+            self._seen = seen
+            self._data = data
+
+    def _extend(self, ids: list, data, seen, missing: list) -> tuple:
+        # Append synthesized rows for new regions and rewrite the cache atomically;
+        # called with the file lock held
+        npy, idx, seen_npy = self._paths
+        rows = [np.asarray(data)] if data is not None and len(ids) else []
+        rows.append(np.array([synthetic_year(self._lats[r]) for r in missing], dtype=np.float32).reshape(-1, DAYS))
+        old = np.asarray(seen) if seen is not None else np.zeros(len(ids), dtype=np.int32)
+        ids = list(ids) + missing
+        _save(npy, np.concatenate(rows))
+        _save(seen_npy, np.concatenate([old, np.zeros(len(missing), dtype=np.int32)]))
+        tmp = f"{idx}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"regions": ids, "updated": time.time()}, f)
+        os.replace(tmp, idx)
+        return ids, np.load(npy, mmap_mode="r+"), np.load(seen_npy, mmap_mode="r+")
+
+    def daily(self, region: str) -> Optional[np.ndarray]:
+        if self._data is None:
+            self._load()
+        row = self._rows.get(region)
+        return None if row is None else self._data[row]
+
+    def observe(self, region: str, temp_c: float, when: Optional[float] = None):
+        # Collect a measured temperature; the previous day's mean is folded in once the
+        # region's readings move on to a new day
+        if self._data is None:
+            self._load()
+        if region not in self._rows or temp_c is None or not math.isfinite(temp_c):
+            return
+        stamp, done = _day_stamp(when), None
+        with self._lock:
+            pending = self._pending.get(region)
+            if pending is not None and stamp < pending[0]:
+                return
+            if pending is None or stamp > pending[0]:
+                done, pending = pending, [stamp, 0.0, 0]
+                self._pending[region] = pending
+            pending[1] += temp_c
+            pending[2] += 1
+        if done is not None:
+            self._fold(region, *done)
+
+    def _fold(self, region: str, stamp: int, total: float, count: int):
+        row = self._rows[region]
+        day = min(stamp % 1000 - 1, DAYS - 1)
+        with self._lock:
+            self._lock_file()
+            try:
+                if self._seen[row] >= stamp:
+                    return
+                self._data[row, day] += OBSERVE_WEIGHT * (total / count - self._data[row, day])
+                self._seen[row] = stamp
+            finally:
+                self._unlock_file()
+
+    def flush(self):
+        # Fold days that have ended; today's partial readings are dropped
+        if self._data is None:
+            return
+        today = _day_stamp(None)
+        with self._lock:
+            done = [(r, p) for r, p in self._pending.items() if p[0] < today]
+            for r, _ in done:
+                del self._pending[r]
+        for r, p in done:
+            self._fold(r, *p)
+        self._data.flush()
+        self._seen.flush()
+
+
+def monthly_degree_days(daily: np.ndarray, hdd_base: float = HDD_BASE_C, cdd_base: float = CDD_BASE_C) -> tuple:
+    daily = np.asarray(daily, dtype=float)
+    hdd = np.add.reduceat(np.maximum(hdd_base - daily, 0.0), MONTH_STARTS)
+    cdd = np.add.reduceat(np.maximum(daily - cdd_base, 0.0), MONTH_STARTS)
+    return hdd, cdd
+
+
+def hvac_monthly_kwh(daily: np.ndarray, heating_kw: float = 0.0, cooling_kw: float = 0.0,
+                     occupancy: float = 1.0, ua_kw_per_k: float = HEAT_LOSS_KW_PER_K) -> dict:
+    # Heating/cooling kWh per month; each day's demand is capped by the equipment's
+    # rated power running around the clock. occupancy scales for conditioned hours.
+    daily = np.asarray(daily, dtype=float)
+    heat = np.minimum(ua_kw_per_k * np.maximum(HDD_BASE_C - daily, 0.0) * 24 / HEATING_EFFICIENCY, heating_kw * 24)
+    cool = np.minimum(ua_kw_per_k * np.maximum(daily - CDD_BASE_C, 0.0) * 24 / COOLING_COP, cooling_kw * 24)
+    hdd, cdd = monthly_degree_days(daily)
+    return {
+        "hdd": hdd,
+        "cdd": cdd,
+        "heating_kwh": np.add.reduceat(heat, MONTH_STARTS) * occupancy,
+        "cooling_kwh": np.add.reduceat(cool, MONTH_STARTS) * occupancy,
+    }
@@ -0,0 +1,76 @@
+# Carbon/cost-aware EV charging scheduler over a 48-hour horizon starting at local midnight.
+#
+# Every vehicle is scheduled in one vectorized pass: flexible charging gives each hour
+# in the plug-in window a rank by score and fills the cheapest ranks first; contiguous
+# charging scores every start hour with a prefix-sum sliding window.
+import numpy as np
+
+HORIZON = 48
+OBJECTIVE_WEIGHTS = {"carbon": 1.0, "cost": 0.0, "balanced": 0.5}
+
+
+def horizon(values, fill: float) -> np.ndarray:
+    # Extend a 24h (or partial) hourly series to the 48h horizon by repeating the day
+    arr = np.asarray(values if values is not None and len(values) else [fill], dtype=float)
+    return np.resize(arr, HORIZON)
+
+
+def blend(intensity: np.ndarray, tariff: np.ndarray, carbon_weight: float) -> np.ndarray:
+    # Normalise both signals to their mean so the weight is unit-free
+    ci = intensity / intensity.mean() if intensity.mean() > 0 else intensity
+    tf = tariff / tariff.mean() if tariff.mean() > 0 else tariff
+    return carbon_weight * ci + (1 - carbon_weight) * tf
+
+
+def _windows(plug_in, plug_out) -> tuple:
+    start = np.asarray(plug_in, dtype=int) % 24
+    end = np.asarray(plug_out, dtype=int) % 24
+    end = np.where(end <= start, end + 24, end)  # overnight sessions roll into day two
+    return start, end
+
+
+def schedule_batch(score: np.ndarray, energy_kwh, power_kw, plug_in, plug_out,
+                   contiguous: bool = False) -> dict:
+    energy = np.atleast_1d(np.asarray(energy_kwh, dtype=float))
+    power = np.atleast_1d(np.asarray(power_kw, dtype=float))
+    if np.any(power <= 0) or np.any(energy < 0):
+        raise ValueError("charger power must be positive and energy non-negative")
+    start, end = _windows(np.atleast_1d(plug_in), np.atleast_1d(plug_out))
+    energy, power, start, end = np.broadcast_arrays(energy, power, start, end)
+
+    hours = np.arange(HORIZON)
+    in_window = (hours >= start[:, None]) & (hours < end[:, None])
+    need = np.minimum(energy / power, end - start)  # charging hours, last one may be partial
+
+    if contiguous:
+        whole = np.floor(need).astype(int)
+        frac = need - whole
+        span = np.ceil(need).astype(int)
+        cs = np.concatenate(([0.0], np.cumsum(score)))
+        padded = np.append(score, 0.0)
+        tail = np.minimum(hours + whole[:, None], HORIZON)
+        cost = cs[tail] - cs[hours] + frac[:, None] * padded[tail]
+        feasible = (hours >= start[:, None]) & (hours + span[:, None] <= end[:, None])
+        first = np.argmin(np.where(feasible, cost, np.inf), axis=1)
+        offset = hours - first[:, None]
+        alloc = np.where(offset >= 0, np.clip(need[:, None] - offset, 0, 1), 0.0)
+    else:
+        masked = np.where(in_window, score, np.inf)
+        rank = np.argsort(np.argsort(masked, axis=1, kind="stable"), axis=1)
+        alloc = np.where(in_window, np.clip(need[:, None] - rank, 0, 1), 0.0)
+
+    kwh = alloc * power[:, None]
+    return {"kwh": kwh, "shortfall_kwh": np.maximum(energy - kwh.sum(axis=1), 0)}
+
+
+def summarize(kwh: np.ndarray, intensity: np.ndarray, tariff: np.ndarray) -> dict:
+    return {
+        "carbon_kg": kwh @ intensity / 1000,
+        "cost": kwh @ tariff,
+    }
+
+
+def to_slots(row: np.ndarray) -> list:
+    # [{"hour": clock hour, "day": 0 | 1, "kwh": ...}] for hours with charging
+    idx = np.flatnonzero(row > 1e-9)
+    return [{"hour": int(h % 24), "day": int(h // 24), "kwh": round(float(row[h]), 3)} for h in idx]
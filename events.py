@@ -0,0 +1,154 @@
+# Server-sent events for live per-location values (weather, carbon price).
+#
+# One refresher thread polls the upstream sources for the locations that currently have
+# subscribers and publishes only values that changed. Each subscriber holds at most one
+# pending value per event name: a newer value replaces an undelivered older one, so a
+# slow client costs a small dict, never a growing buffer. Idle connections wait on their
+# own Event and wake only for a change or a heartbeat.
+#
+# Limitation: under Flask's threaded server (or sync WSGI workers) every open stream still
+# pins one worker thread for its lifetime, so max_subscribers is a thread budget and kept
+# low. Cheap idle connections at larger scale need an async/gevent worker in front of
+# stream(); the fan-out here does not change for that.
+import json
+import threading
+import time
+from typing import Iterator, Optional
+
+HEARTBEAT_SECONDS = 15.0
+REFRESH_SECONDS = 60.0
+RETRY_MS = 5000
+MAX_SUBSCRIBERS = 200  # one thread per open stream; see above
+
+
+class Subscriber:
+    __slots__ = ("topic", "pending", "wake", "closed")
+
+    def __init__(self, topic: str):
+        self.topic = topic
+        self.pending = {}
+        self.wake = threading.Event()
+        self.closed = False
+
+    def offer(self, event: str, data, seq: int):
+        self.pending[event] = (seq, data)  # conflate: keep only the newest per event
+        self.wake.set()
+
+    def drain(self) -> list:
+        self.wake.clear()
+        items, self.pending = self.pending, {}
+        return sorted((seq, event, data) for event, (seq, data) in items.items())
+
+
+def format_event(event: str, data, seq: int) -> str:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class LiveFeed:
+    def __init__(self, sources: dict, refresh_interval: float = REFRESH_SECONDS,
+                 heartbeat: float = HEARTBEAT_SECONDS, max_subscribers: int = MAX_SUBSCRIBERS):
+        # sources: event name -> fn(topic) returning the current value (None = unavailable)
+        self.sources = sources
+        self.refresh_interval = refresh_interval
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.upstream_calls = 0
+        self._topics = {}   # topic -> set of subscribers
+        self._latest = {}   # (topic, event) -> (seq, data)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._fresh = set()  # topics that gained their first subscriber since the last refresh
+        self._kick = threading.Event()
+        self._refresher = None
+
+    def subscriber_count(self) -> int:
+        return sum(len(s) for s in self._topics.values())
+
+    def subscribe(self, topic: str) -> Subscriber:
+        sub = Subscriber(topic)
+        with self._lock:
+            if self.subscriber_count() >= self.max_subscribers:
+                raise OverflowError("too many live subscribers")
+            subs = self._topics.setdefault(topic, set())
+            fresh = not subs
+            if fresh:
+                self._fresh.add(topic)
+            subs.add(sub)
+            for event in self.sources:
+                cached = self._latest.get((topic, event))
+                if cached is not None:
+                    sub.offer(event, cached[1], cached[0])
+        if fresh:
+            self._kick.set()  # first subscriber for this topic: refresh it now
+        if self._refresher is None:
+            self._start()
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        sub.closed = True
+        with self._lock:
+            subs = self._topics.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[sub.topic]
+
+    def publish(self, topic: str, event: str, data):
+        with self._lock:
+            cached = self._latest.get((topic, event))
+            if cached is not None and cached[1] == data:
+                return False
+            self._seq += 1
+            self._latest[(topic, event)] = (self._seq, data)
+            for sub in self._topics.get(topic, ()):
+                sub.offer(event, data, self._seq)
+        return True
+
+    def stream(self, sub: Subscriber) -> Iterator[str]:
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while not sub.closed:
+                if sub.wake.wait(self.heartbeat):
+                    with self._lock:
+                        items = sub.drain()
+                    for seq, event, data in items:
+                        yield format_event(event, data, seq)
+                else:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    # --- refresher ---
+
+    def _start(self):
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="live-refresher", daemon=True)
+        self._refresher.start()
+
+    def refresh(self, topics: Optional[list] = None):
+        for topic in topics if topics is not None else list(self._topics):
+            for event, fn in self.sources.items():
+                self.upstream_calls += 1
+                try:
+                    value = fn(topic)
+                except Exception:
+                    value = None
+                if value is not None:
+                    self.publish(topic, event, value)
+
+    def _refresh_loop(self):
+        last = {}
+        while True:
+            self._kick.wait(self.refresh_interval)
+            self._kick.clear()
+            now = time.monotonic()
+            with self._lock:
+                fresh, self._fresh = self._fresh, set()
+                due = [t for t in self._topics if t in fresh or now - last.get(t, -1e18) >= self.refresh_interval]
+            self.refresh(due)
+            for t in due:
+                last[t] = now
+            for t in [t for t in last if t not in self._topics]:
+                del last[t]
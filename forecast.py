@@ -0,0 +1,310 @@
+# Multi-day hourly weather forecasts and load-shifting windows.
+#
+# ForecastCache fetches hourly temperature, cloud cover and wind for the next few days
+# from an open-meteo compatible API and keeps each location as one small float32 array
+# (variables x hours) plus the timestamp of its first hour. Locations are keyed on a
+# 0.1 degree grid, so nearby requests share an entry; entries live for `ttl` seconds in a
+# bounded LRU, concurrent misses for the same location share one upstream fetch, and when
+# a refresh fails a recently expired entry is served as STALE instead of failing.
+#
+# best_windows() turns a forecast into the best non-overlapping windows for one kind of
+# load: every hour gets a score, window averages come from a prefix sum and the highest
+# ones are taken greedily.
+#   ac_precool  cool the house ahead of a hot spell, while it is still cooler outside
+#               and solar output is up
+#   laundry     warm, clear, breezy daylight hours (solar power and line drying)
+#   ev          hours with the most solar and wind on the grid
+#
+#   python forecast.py serve [port]
+#
+# runs a local stand-in serving synthetic forecasts to point ECO_FORECAST_URL at in tests.
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+import tracing
+
+DEFAULT_URL = "https://api.open-meteo.com/v1/forecast"
+VARIABLES = ("temperature_2m", "cloud_cover", "wind_speed_10m")
+DAYS = 3
+MAX_DAYS = 16
+TTL_SECONDS = 1800
+STALE_SECONDS = 6 * 3600
+MAX_ENTRIES = 2048
+GRID = 0.1  # degrees
+
+KINDS = ("ac_precool", "laundry", "ev")
+DURATIONS = {"ac_precool": 2, "laundry": 2, "ev": 4}  # default window length in hours
+MAX_WINDOWS = 10
+COMFORT_C = 24.0
+LOOKAHEAD = 4     # hours of upcoming heat a pre-cooling hour is judged against
+RATED_WIND = 12.0  # m/s, where a typical turbine reaches full output
+
+
+class ForecastError(Exception):
+    pass
+
+
+class Forecast:
+    __slots__ = ("lat", "lon", "start", "utc_offset", "values", "fetched")
+
+    def __init__(self, lat: float, lon: float, start: int, utc_offset: int, values: np.ndarray, fetched: float):
+        self.lat = lat
+        self.lon = lon
+        self.start = start            # unix time of the first hour
+        self.utc_offset = utc_offset  # seconds, for local hours of day
+        self.values = values          # float32, one row per VARIABLES entry
+        self.fetched = fetched
+
+    @property
+    def hours(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def temperature(self) -> np.ndarray:
+        return self.values[0]
+
+    @property
+    def cloud(self) -> np.ndarray:
+        return self.values[1]
+
+    @property
+    def wind(self) -> np.ndarray:
+        return self.values[2]
+
+    def local_hours(self) -> np.ndarray:
+        return ((self.start + self.utc_offset) // 3600 + np.arange(self.hours)) % 24
+
+    def isoformat(self, ts: int) -> str:
+        return datetime.fromtimestamp(ts, timezone(timedelta(seconds=self.utc_offset))).isoformat(timespec="minutes")
+
+
+def parse(payload: dict, lat: float, lon: float, fetched: float) -> Forecast:
+    # Forecast from an open-meteo response requested with timeformat=unixtime
+    try:
+        hourly = payload["hourly"]
+        times = np.asarray(hourly["time"], dtype=np.int64)
+        values = np.array([hourly[v] for v in VARIABLES], dtype=np.float32)
+        offset = int(payload.get("utc_offset_seconds", 0))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ForecastError(f"malformed forecast response: {e}")
+    if times.ndim != 1 or not len(times) or values.shape != (len(VARIABLES), len(times)):
+        raise ForecastError("malformed forecast response: no hourly series")
+    if np.any(np.diff(times) != 3600):
+        raise ForecastError("malformed forecast response: hours are not contiguous")
+    # Fill gaps (null values) by interpolating between the neighbouring hours
+    idx = np.arange(len(times))
+    for row in values:
+        missing = np.isnan(row)
+        if missing.all():
+            raise ForecastError("malformed forecast response: variable has no values")
+        if missing.any():
+            row[missing] = np.interp(idx[missing], idx[~missing], row[~missing])
+    return Forecast(lat, lon, int(times[0]), offset, values, fetched)
+
+
+class ForecastCache:
+    def __init__(self, url: str = DEFAULT_URL, days: int = DAYS, ttl: float = TTL_SECONDS,
+                 stale_seconds: float = STALE_SECONDS, max_entries: int = MAX_ENTRIES, timeout: float = 5.0):
+        if not 1 <= days <= MAX_DAYS:
+            raise ValueError(f"forecast days must be 1..{MAX_DAYS}")
+        self.url = url
+        self.days = days
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = self.misses = self.stale = self.errors = self.evictions = 0
+        self._entries = OrderedDict()  # (lat, lon) on the grid -> Forecast, least recently used first
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._session = None  # created with the first upstream fetch
+
+    @staticmethod
+    def key(lat: float, lon: float) -> tuple:
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("coordinates out of range")
+        return round(round(lat / GRID) * GRID, 4), round(round(lon / GRID) * GRID, 4)
+
+    def get(self, lat: float, lon: float) -> tuple:
+        # (Forecast, "HIT" | "MISS" | "STALE")
+        key = self.key(lat, lon)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.fetched < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, "HIT"
+            waiter = self._inflight.get(key)
+            owner = waiter is None
+            if owner:
+                waiter = self._inflight[key] = threading.Event()
+        if not owner:
+            waiter.wait(self.timeout * 2)
+            with self._lock:
+                fresh = self._entries.get(key)
+            if fresh is not None and time.time() - fresh.fetched < self.ttl:
+                return fresh, "HIT"
+            return self._stale(entry)
+        try:
+            fc = self._fetch(*key)
+            with self._lock:
+                self._entries[key] = fc
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            return fc, "MISS"
+        except ForecastError:
+            self.errors += 1
+            return self._stale(entry)
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _stale(self, entry: Optional[Forecast]) -> tuple:
+        # Serve an expired entry for a while when the upstream cannot refresh it
+        if entry is None or time.time() - entry.fetched >= self.ttl + self.stale_seconds:
+            raise ForecastError("forecast upstream unavailable")
+        self.stale += 1
+        return entry, "STALE"
+
+    def _fetch(self, lat: float, lon: float) -> Forecast:
+        import requests
+        self.misses += 1
+        if self._session is None:
+            self._session = requests.Session()
+        params = {"latitude": lat, "longitude": lon, "hourly": ",".join(VARIABLES), "forecast_days": self.days,
+                  "timezone": "auto", "timeformat": "unixtime", "wind_speed_unit": "ms"}
+        try:
+            r = self._session.get(self.url, params=params, headers=tracing.headers(), timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ForecastError(f"forecast upstream unreachable: {e}")
+        if r.status_code != 200:
+            raise ForecastError(f"forecast upstream returned {r.status_code}")
+        try:
+            payload = r.json()
+        except ValueError:
+            raise ForecastError("forecast upstream returned invalid JSON")
+        return parse(payload, lat, lon, time.time())
+
+    def status(self) -> dict:
+        return {"url": self.url, "days": self.days, "ttl": self.ttl, "locations": len(self._entries),
+                "hits": self.hits, "misses": self.misses, "stale": self.stale, "errors": self.errors,
+                "evictions": self.evictions}
+
+
+def _sun(fc: Forecast) -> np.ndarray:
+    # Rough solar output 0..1: a daylight bell from 06:00 to 18:00 local, dimmed by cloud
+    daylight = np.clip(np.sin(np.pi * (fc.local_hours() - 6) / 12), 0, None)
+    return daylight * (1 - np.clip(fc.cloud, 0, 100) / 100 * 0.75)
+
+
+def hourly_scores(fc: Forecast, kind: str) -> np.ndarray:
+    # Suitability of each hour for the load, higher is better; 0 means not worth it
+    sun = _sun(fc)
+    windy = np.clip(fc.wind / RATED_WIND, 0, 1)
+    if kind == "ev":
+        return 0.6 * sun + 0.4 * windy
+    if kind == "laundry":
+        warm = np.clip((fc.temperature - 10) / 20, 0, 1)
+        return (sun > 0) * (0.5 * sun + 0.3 * warm + 0.2 * windy)
+    if kind == "ac_precool":
+        temp = fc.temperature
+        padded = np.concatenate([temp[1:], np.full(LOOKAHEAD, temp[-1], dtype=temp.dtype)])
+        ahead = np.lib.stride_tricks.sliding_window_view(padded, LOOKAHEAD).max(axis=1)
+        heat = np.clip((ahead - COMFORT_C) / 8, 0, 1)   # how hot it is about to get
+        cooler = np.clip((ahead - temp) / 6, 0, 1)      # how much cooler it is now
+        return heat * (0.6 * cooler + 0.4 * sun)
+    raise ValueError(f"unknown window kind '{kind}'")
+
+
+def check_window(hours: Optional[int], count: int):
+    if (hours is not None and not 1 <= hours <= 24) or not 1 <= count <= MAX_WINDOWS:
+        raise ValueError(f"hours must be 1..24 and count 1..{MAX_WINDOWS}")
+
+
+def best_windows(fc: Forecast, kind: str, hours: Optional[int] = None, count: int = 3,
+                 now: Optional[float] = None) -> list:
+    # Up to `count` non-overlapping windows of `hours` starting from the current hour, best first
+    check_window(hours, count)
+    score = hourly_scores(fc, kind)
+    hours = DURATIONS[kind] if hours is None else hours
+    first = max(0, int((time.time() if now is None else now) - fc.start) // 3600)
+    if first + hours > fc.hours:
+        return []
+    sums = np.concatenate([[0.0], np.cumsum(score, dtype=np.float64)])
+    mean = (sums[hours:] - sums[:-hours]) / hours
+    mean[:first] = -np.inf
+    taken = np.zeros(fc.hours, dtype=bool)
+    out = []
+    for i in np.argsort(-mean, kind="stable").tolist():
+        if mean[i] <= 0 or len(out) >= count:
+            break
+        if taken[i:i + hours].any():
+            continue
+        taken[i:i + hours] = True
+        span = slice(i, i + hours)
+        start = fc.start + i * 3600
+        out.append({
+            "start": fc.isoformat(start), "end": fc.isoformat(start + hours * 3600), "start_ts": start, "hours": hours,
+            "score": round(float(mean[i]), 3),
+            "temperature_c": round(float(fc.temperature[span].mean()), 1),
+            "cloud_cover_pct": round(float(fc.cloud[span].mean()), 1),
+            "wind_ms": round(float(fc.wind[span].mean()), 1),
+        })
+    return out
+
+
+def synthetic(lat: float, lon: float, days: int = DAYS, now: Optional[float] = None) -> dict:
+    # Deterministic open-meteo style payload: a diurnal temperature cycle that drifts from
+    # day to day, passing cloud banks and a slowly turning wind, starting at local midnight
+    offset = int(round(lon / 15)) * 3600
+    now = time.time() if now is None else now
+    start = int((now + offset) // 86400 * 86400 - offset)
+    h = np.arange(days * 24)
+    local = (h + (start + offset) // 3600) % 24
+    seed = math.sin(lat * 12.9898 + lon * 78.233) * 43758.5453
+    phase = seed - math.floor(seed)
+    base = 30 - abs(lat) * 0.4 + 3 * np.sin(2 * np.pi * (h / 24 / 5 + phase))
+    temp = base + 6 * np.sin(2 * np.pi * (local - 9) / 24)
+    cloud = np.clip(50 + 50 * np.sin(2 * np.pi * (h / 17 + phase)), 0, 100)
+    wind = 2 + 6 * (0.5 + 0.5 * np.sin(2 * np.pi * (h / 31 + 2 * phase)))
+    return {"latitude": lat, "longitude": lon, "utc_offset_seconds": offset,
+            "hourly": {"time": (start + h * 3600).tolist(), "temperature_2m": np.round(temp, 1).tolist(),
+                       "cloud_cover": np.round(cloud).tolist(), "wind_speed_10m": np.round(wind, 1).tolist()}}
+
+
+if __name__ == "__main__":
+    # Local forecast stand-in: python forecast.py serve [port]
+    import json
+    import sys
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlsplit
+
+    if len(sys.argv) < 2 or sys.argv[1] != "serve":
+        sys.exit("usage: python forecast.py serve [port]")
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8087
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # /v1/forecast?latitude=..&longitude=..&forecast_days=..
+            q = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+            try:
+                body = json.dumps(synthetic(float(q["latitude"]), float(q["longitude"]),
+                                            min(int(q.get("forecast_days", DAYS)), MAX_DAYS))).encode()
+            except (KeyError, ValueError):
+                self.send_error(400)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
@@ -0,0 +1,186 @@
+# Analysis history store: SQLite in WAL mode fed by a background batch writer.
+#
+# The request path only enqueues into a bounded in-memory queue. A single writer thread
+# drains it in batches (one transaction per batch). When the queue is full, record()
+# waits up to `block_timeout` and then drops the entry, so a slow disk pushes back on
+# writers instead of growing memory without bound.
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    country TEXT NOT NULL,
+    state TEXT,
+    city TEXT,
+    town TEXT,
+    daily_hours REAL,
+    monthly_kwh REAL,
+    carbon_kg REAL,
+    annual_savings TEXT,
+    habits TEXT,
+    tags TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_country_ts ON analyses (country, ts);
+CREATE INDEX IF NOT EXISTS idx_analyses_ts ON analyses (ts);
+"""
+
+COLUMNS = ("ts", "country", "state", "city", "town", "daily_hours", "monthly_kwh",
+           "carbon_kg", "annual_savings", "habits", "tags")
+INSERT = f"INSERT INTO analyses ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+REAL_COLUMNS = {"ts", "daily_hours", "monthly_kwh", "carbon_kg"}
+
+
+def _column_value(column: str, value):
+    # Request values are arbitrary JSON; bind only what SQLite takes for the column
+    if value is None or value == "":
+        return None
+    if column == "tags":
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if column in REAL_COLUMNS:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return value if isinstance(value, str) else str(value)
+
+
+class HistoryStore:
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, block_timeout: float = 0.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._writer = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # --- write path ---
+
+    def record(self, entry: dict) -> bool:
+        if self._writer is None:
+            self.start()
+        row = (entry.get("ts", time.time()),) + tuple(_column_value(c, entry.get(c)) for c in COLUMNS[1:])
+        try:
+            if self.block_timeout > 0:
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def start(self):
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            conn = self._connect()
+            conn.executescript(SCHEMA)
+            conn.close()
+            self._stop.clear()
+            self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout: float = 5.0):
+        # Flushes whatever is queued before returning
+        if self._writer is None:
+            return
+        self._stop.set()
+        self._writer.join(timeout)
+        self._writer = None
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stop.is_set():
+                    break
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(INSERT, batch)
+                self.written += len(batch)
+            except sqlite3.Error:
+                # Retry row by row so one bad row does not cost the whole batch
+                for row in batch:
+                    try:
+                        with conn:
+                            conn.execute(INSERT, row)
+                        self.written += 1
+                    except sqlite3.Error:
+                        self.dropped += 1
+        conn.close()
+
+    # --- read path ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._writer is None:
+                self.start()  # make sure the schema exists
+            conn = self._local.conn = self._connect()
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _where(country: Optional[str], since: Optional[float], until: Optional[float]) -> tuple:
+        clauses, args = [], []
+        if country:
+            clauses.append("country = ?")
+            args.append(country)
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, country: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: int = 100) -> list:
+        where, args = self._where(country, since, until)
+        rows = self._reader().execute(
+            f"SELECT * FROM analyses{where} ORDER BY ts DESC LIMIT ?", args + [limit]).fetchall()
+        out = []
+        for r in rows:
+            d = dict(r)
+            d["tags"] = json.loads(d["tags"]) if d["tags"] else []
+            out.append(d)
+        return out
+
+    def trends(self, country: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None, bucket_seconds: int = 86400) -> list:
+        where, args = self._where(country, since, until)
+        rows = self._reader().execute(
+            f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, COUNT(*) AS analyses, "
+            f"AVG(carbon_kg) AS avg_carbon_kg, AVG(monthly_kwh) AS avg_monthly_kwh "
+            f"FROM analyses{where} GROUP BY bucket ORDER BY bucket",
+            [bucket_seconds, bucket_seconds] + args).fetchall()
+        return [dict(r) for r in rows]
+
+    def status(self) -> dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
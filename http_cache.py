@@ -0,0 +1,64 @@
+# HTTP caching policy for read-only GET routes.
+#
+# @cached(max_age, stale_while_revalidate, last_modified) adds Cache-Control, a strong ETag
+# (hash of the body) and optionally Last-Modified to successful GET/HEAD responses, and
+# answers If-None-Match / If-Modified-Since with 304 through Werkzeug's make_conditional.
+# canonical_redirect() sends GETs with non-canonical query strings (unknown keys, unsorted
+# keys, "500.0" vs "500") to one canonical URL so shared caches hold one entry per input.
+import hashlib
+import math
+from functools import wraps
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlencode
+
+from flask import make_response, redirect, request
+
+
+def cache_control(max_age: int, stale_while_revalidate: int = 0, public: bool = True) -> str:
+    parts = ["public" if public else "private", f"max-age={max_age}"]
+    if stale_while_revalidate:
+        parts.append(f"stale-while-revalidate={stale_while_revalidate}")
+    return ", ".join(parts)
+
+
+def cached(max_age: int, stale_while_revalidate: int = 0, public: bool = True,
+           last_modified: Optional[Callable[[], Optional[float]]] = None):
+    header = cache_control(max_age, stale_while_revalidate, public)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if request.method not in ("GET", "HEAD") or response.status_code != 200 or response.direct_passthrough:
+                return response
+            response.headers["Cache-Control"] = header
+            response.set_etag(hashlib.blake2b(response.get_data(), digest_size=12).hexdigest())
+            if last_modified is not None:
+                ts = last_modified()
+                if ts is not None:
+                    response.last_modified = ts
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def _canonical_value(v: str) -> str:
+    try:
+        f = float(v)
+    except ValueError:
+        return v.strip()
+    if not math.isfinite(f):
+        return v.strip()
+    return str(int(f)) if f.is_integer() and abs(f) < 1e15 else repr(f)
+
+
+def canonical_query(args, params: Iterable[str]) -> str:
+    return urlencode(sorted((k, _canonical_value(args[k])) for k in params if args.get(k, "").strip()))
+
+
+def canonical_redirect(params: Iterable[str]):
+    # Redirect response when the query string is not canonical, else None
+    query = canonical_query(request.args, params)
+    if request.query_string.decode("latin-1") == query:
+        return None
+    return redirect(f"{request.path}?{query}" if query else request.path, code=301)
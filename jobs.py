@@ -0,0 +1,127 @@
+# Background jobs for large batch analyses (e.g. a building portfolio of thousands of sites).
+#
+# A job's items are split into chunks that run on a shared local worker pool. Progress and
+# finished items are readable while the job runs, a cancel flag stops chunks that have not
+# started (and the rest of a running chunk), and completed results stream out as NDJSON.
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+MAX_CHUNK_SIZE = 1000
+MAX_ITEMS = 50000  # per job, so one submission cannot hold the shared pool indefinitely
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+
+
+class Job:
+    __slots__ = ("id", "total", "done", "failed", "status", "results", "created", "finished",
+                 "cancelled", "_pending", "_lock")
+
+    def __init__(self, total: int, chunks: int):
+        self.id = secrets.token_urlsafe(12)
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.status = QUEUED
+        self.results = [None] * total
+        self.created = time.time()
+        self.finished = None
+        self.cancelled = threading.Event()
+        self._pending = chunks
+        self._lock = threading.Lock()
+
+    def progress(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "progress": round(self.done / self.total, 4) if self.total else 1.0,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+    def partial(self, offset: int = 0, limit: int = 100) -> list:
+        # Finished items in [offset, offset + limit); unfinished slots are skipped
+        return [{"index": i, **r} for i, r in enumerate(self.results[offset:offset + limit], offset) if r is not None]
+
+    def stream(self) -> Iterator[str]:
+        for i, r in enumerate(self.results):
+            if r is not None:
+                yield json.dumps({"index": i, **r}, ensure_ascii=False) + "\n"
+
+
+class JobManager:
+    def __init__(self, workers: int = 4, chunk_size: int = 100, max_jobs: int = 100, ttl: float = 3600):
+        self.chunk_size = chunk_size
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._workers = workers
+        self._pool = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="job-worker")
+        return self._pool
+
+    def submit(self, items: list, fn: Callable[[dict], dict], chunk_size: Optional[int] = None) -> Job:
+        if len(items) > MAX_ITEMS:
+            raise ValueError(f"at most {MAX_ITEMS} items per job")
+        size = min(max(1, int(chunk_size or self.chunk_size)), MAX_CHUNK_SIZE)
+        chunks = [(start, items[start:start + size]) for start in range(0, len(items), size)]
+        job = Job(len(items), len(chunks))
+        with self._lock:
+            self._expire()
+            if len(self._jobs) >= self.max_jobs:
+                raise OverflowError("too many jobs retained; try again later")
+            self._jobs[job.id] = job
+        if not chunks:
+            job.status, job.finished = DONE, time.time()
+        pool = self._executor()
+        for start, chunk in chunks:
+            pool.submit(self._run_chunk, job, start, chunk, fn)
+        return job
+
+    def _run_chunk(self, job: Job, start: int, chunk: list, fn: Callable):
+        if job.status == QUEUED:
+            job.status = RUNNING
+        for offset, item in enumerate(chunk):
+            if job.cancelled.is_set():
+                break
+            try:
+                job.results[start + offset] = {"result": fn(item)}
+                failed = 0
+            except Exception as e:
+                job.results[start + offset] = {"error": str(e)}
+                failed = 1
+            with job._lock:
+                job.done += 1
+                job.failed += failed
+        with job._lock:
+            job._pending -= 1
+            if job._pending == 0:
+                job.status = CANCELLED if job.cancelled.is_set() else (FAILED if job.failed == job.total else DONE)
+                job.finished = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.status in (QUEUED, RUNNING):
+            job.cancelled.set()
+        return job
+
+    def _expire(self):
+        now = time.time()
+        for jid in [j.id for j in self._jobs.values() if j.finished and now - j.finished > self.ttl]:
+            del self._jobs[jid]
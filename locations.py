@@ -0,0 +1,199 @@
+# Prefix-search index over a state > city > town gazetteer for autocomplete.
+#
+# Entries live in parallel compact arrays: names and normalised names are each one joined
+# string sliced by an offset array, so an entry costs a few dozen bytes rather than a
+# handful of Python objects. Search keys (the full name plus every later word, so "del"
+# finds "New Delhi") are suffixes of the normalised names and are stored as one sorted
+# array of positions into that string, so a prefix is a bisect range. Small ranges are
+# scanned for the top-k by weight; top lists for broad prefixes are computed once on first
+# use and cached, keeping every lookup sub-millisecond.
+import csv
+import heapq
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+KINDS = ("state", "city", "town")
+PARENT_KIND = {"city": "state", "town": "city"}
+SCAN_LIMIT = 256  # wider prefix ranges use the cached top list
+TOP_CACHE_K = 50
+
+
+def normalize(s: str) -> str:
+    if not s.isascii():
+        s = unicodedata.normalize("NFKD", s)
+        s = "".join(c for c in s if not unicodedata.combining(c))
+    return " ".join(s.casefold().split())
+
+
+class LocationIndex:
+    def __init__(self):
+        self.kinds = array('b')
+        self.parents = array('i')
+        self.weights = array('f')
+        self._names, self._name_off, self._name_parts = "", array('I', [0]), []
+        self._norms, self._norm_off, self._norm_parts = "", array('I', [0]), []
+        self._key_pos = array('I')  # sorted search keys as start positions in _norms
+        self._key_ids = array('i')
+        self._order = array('i')   # rank by weight, then name; set by build()
+        self._children = {}
+        self._by_name = {}  # (kind, normalised name, parent) -> id while adding; dropped by build()
+        self._top = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def name(self, i: int) -> str:
+        built = len(self._name_off) - 1
+        return self._names[self._name_off[i]:self._name_off[i + 1]] if i < built else self._name_parts[i - built]
+
+    def _norm(self, i: int) -> str:
+        built = len(self._norm_off) - 1
+        return self._norms[self._norm_off[i]:self._norm_off[i + 1]] if i < built else self._norm_parts[i - built]
+
+    def _key(self, j: int) -> str:
+        return self._norms[self._key_pos[j]:self._norm_off[self._key_ids[j] + 1]]
+
+    def add(self, name: str, kind: str, parent: int = -1, weight: float = 0.0) -> int:
+        if self._by_name is None:
+            # Adding after build(): recreate the duplicate check from the stored entries
+            self._by_name = {(KINDS[k], self._norm(i), p): i for i, (k, p) in enumerate(zip(self.kinds, self.parents))}
+        key = (kind, normalize(name), parent)
+        if key in self._by_name:
+            return self._by_name[key]
+        i = len(self.kinds)
+        self.kinds.append(KINDS.index(kind))
+        self.parents.append(parent)
+        self.weights.append(weight)
+        self._name_parts.append(name)
+        self._norm_parts.append(key[1])
+        self._by_name[key] = i
+        return i
+
+    def build(self) -> "LocationIndex":
+        # Fold entries added since the last build into the joined strings
+        for parts, blob, off in ((self._name_parts, "_names", self._name_off), (self._norm_parts, "_norms", self._norm_off)):
+            end = off[-1]
+            for part in parts:
+                end += len(part)
+                off.append(end)
+            setattr(self, blob, getattr(self, blob) + "".join(parts))
+            parts.clear()
+        self._by_name = None
+
+        norms, off = self._norms, self._norm_off
+        pos, ids = array('I'), array('i')
+        for i in range(len(self.kinds)):
+            start, end = off[i], off[i + 1]
+            pos.append(start)
+            ids.append(i)
+            j = norms.find(" ", start, end)
+            while j >= 0:
+                pos.append(j + 1)
+                ids.append(i)
+                j = norms.find(" ", j + 1, end)
+        order = sorted(range(len(pos)), key=lambda k: norms[pos[k]:off[ids[k] + 1]])
+        self._key_pos = array('I', (pos[k] for k in order))
+        self._key_ids = array('i', (ids[k] for k in order))
+
+        # Position of every entry in (weight desc, name) order, so ranking compares ints
+        self._order = array('i', bytes(4 * len(self.kinds)))
+        for r, i in enumerate(sorted(range(len(self.kinds)), key=lambda i: (-self.weights[i], self.name(i)))):
+            self._order[i] = r
+        children = {}
+        for i, p in enumerate(self.parents):
+            children.setdefault(p, []).append(i)
+        self._children = {p: array('i', sorted(ids, key=self._order.__getitem__)) for p, ids in children.items()}
+        self._top = {}
+        return self
+
+    def _range(self, p: str) -> tuple:
+        keys = range(len(self._key_ids))
+        lo = bisect_left(keys, p, key=self._key)
+        return lo, bisect_left(keys, p + "\uffff", lo, key=self._key)
+
+    def lookup(self, name: str, kind: str) -> Optional[int]:
+        # First entry of that kind with exactly this name, under any parent
+        p = normalize(name)
+        keys = range(len(self._key_ids))
+        lo = bisect_left(keys, p, key=self._key)
+        hi = bisect_right(keys, p, lo, key=self._key)
+        code = KINDS.index(kind)
+        matches = [i for j, i in zip(range(lo, hi), self._key_ids[lo:hi])
+                   if self.kinds[i] == code and self._key_pos[j] == self._norm_off[i]]
+        return min(matches) if matches else None
+
+    def path(self, i: int) -> list:
+        out = []
+        while i >= 0:
+            out.append(self.name(i))
+            i = self.parents[i]
+        return out
+
+    def describe(self, i: int) -> dict:
+        return {"name": self.name(i), "kind": KINDS[self.kinds[i]], "path": ", ".join(self.path(i))}
+
+    def search(self, prefix: str, k: int = 10, kind: Optional[str] = None, parent: Optional[int] = None) -> list:
+        p = normalize(prefix)
+        kind_code = KINDS.index(kind) if kind else None
+
+        lo, hi = self._range(p)
+
+        if parent is not None:
+            children = self._children.get(parent, ())
+            if p and hi - lo < len(children):
+                # Prefix range is narrower than the child list: filter it by parent instead
+                ids = (i for i in self._key_ids[lo:hi] if self.parents[i] == parent)
+                return self._top_k(ids, k, kind_code)
+            # Children are pre-sorted by weight, so the first k matches are the top k
+            out = []
+            for i in children:
+                if (kind_code is None or self.kinds[i] == kind_code) and (not p or (" " + p) in (" " + self._norm(i))):
+                    out.append(i)
+                    if len(out) == k:
+                        break
+            return out
+
+        if hi - lo <= SCAN_LIMIT or k > TOP_CACHE_K:
+            return self._top_k(self._key_ids[lo:hi], k, kind_code)
+        cache_key = (p, kind_code)
+        top = self._top.get(cache_key)
+        if top is None:
+            top = self._top[cache_key] = tuple(self._top_k(self._key_ids[lo:hi], TOP_CACHE_K, kind_code))
+        return list(top[:k])
+
+    def _top_k(self, ids: Iterable[int], k: int, kind_code: Optional[int]) -> list:
+        cand = {i for i in ids if kind_code is None or self.kinds[i] == kind_code}
+        return heapq.nsmallest(k, cand, key=self._order.__getitem__)
+
+
+def build_default(states: Iterable[str], cities_by_state: dict, towns_by_city: dict,
+                  gazetteer_path: Optional[str] = None) -> LocationIndex:
+    idx = LocationIndex()
+    for s in states:
+        idx.add(s, "state", weight=1.0)
+    for state, cities in cities_by_state.items():
+        sid = idx.add(state, "state", weight=1.0)
+        for n, city in enumerate(cities):
+            idx.add(city, "city", sid, weight=float(len(cities) - n))  # listed in prominence order
+    for (state, city), towns in towns_by_city.items():
+        cid = idx.add(city, "city", idx.add(state, "state", weight=1.0))
+        for town in towns:
+            idx.add(town, "town", cid)
+    if gazetteer_path:
+        load_gazetteer(idx, gazetteer_path)
+    return idx.build()
+
+
+def load_gazetteer(idx: LocationIndex, path: str):
+    # Tab-separated rows with a header: state, city, town (may be empty), population
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            pop = float(row.get("population") or 0)
+            sid = idx.add(row["state"], "state", weight=1.0)
+            if not row.get("city"):
+                continue
+            cid = idx.add(row["city"], "city", sid, weight=0.0 if row.get("town") else pop)
+            if row.get("town"):
+                idx.add(row["town"], "town", cid, weight=pop)
@@ -0,0 +1,119 @@
+# Staged analysis with dependency tracking, plus server-side what-if sessions.
+#
+# A stage declares the input fields and upstream stages it reads. On a what-if update only
+# stages whose inputs changed, or whose upstream output actually changed, are recomputed.
+# Stage outputs are dicts; keys starting with "_" are intermediates shared between stages,
+# everything else is merged into the public result.
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+import tracing
+
+
+class Stage:
+    __slots__ = ("name", "inputs", "deps", "fn")
+
+    def __init__(self, name: str, inputs: Iterable[str], deps: Iterable[str], fn: Callable):
+        self.name = name
+        self.inputs = frozenset(inputs)
+        self.deps = tuple(deps)
+        self.fn = fn  # fn(inputs: dict, upstream: {stage name: output}) -> dict
+
+
+class Pipeline:
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages = list(stages)  # declared in dependency order
+        seen = set()
+        for st in self.stages:
+            missing = [d for d in st.deps if d not in seen]
+            if missing:
+                raise ValueError(f"stage '{st.name}' depends on undeclared {missing}")
+            seen.add(st.name)
+
+    def run(self, inputs: dict, outputs: Optional[dict] = None, changed: Optional[set] = None) -> tuple:
+        # Returns (outputs, recomputed stage names). With no previous outputs everything runs.
+        outputs = dict(outputs or {})
+        full = changed is None
+        dirty_stages = set()
+        ran = []
+        for st in self.stages:
+            stale = full or st.name not in outputs or bool(st.inputs & changed) or any(d in dirty_stages for d in st.deps)
+            if not stale:
+                continue
+            upstream = {d: outputs[d] for d in st.deps}
+            with tracing.span(f"stage.{st.name}"):
+                out = st.fn(inputs, upstream)
+            ran.append(st.name)
+            # Downstream stages only go stale when this output actually changed
+            if full or out != outputs.get(st.name):
+                dirty_stages.add(st.name)
+            outputs[st.name] = out
+        return outputs, ran
+
+    def result(self, outputs: dict) -> dict:
+        res = {}
+        for st in self.stages:
+            res.update({k: v for k, v in outputs[st.name].items() if not k.startswith('_')})
+        return res
+
+
+class Session:
+    __slots__ = ("inputs", "outputs", "touched", "lock")
+
+    def __init__(self, inputs: dict, outputs: dict):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class SessionStore:
+    def __init__(self, pipeline: Pipeline, ttl: float = 1800, max_sessions: int = 10000):
+        self.pipeline = pipeline
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, inputs: dict) -> tuple:
+        outputs, _ = self.pipeline.run(inputs)
+        sid = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[sid] = Session(inputs, outputs)
+            self._evict()
+        return sid, self.pipeline.result(outputs)
+
+    def update(self, sid: str, changes: dict) -> Optional[tuple]:
+        # Returns (changed result fields, recomputed stages), or None for unknown/expired ids
+        with self._lock:
+            sess = self._sessions.get(sid)
+            if sess is None or time.monotonic() - sess.touched > self.ttl:
+                self._sessions.pop(sid, None)
+                return None
+            self._sessions.move_to_end(sid)
+        with sess.lock:
+            changed = {k for k, v in changes.items() if sess.inputs.get(k) != v}
+            before = self.pipeline.result(sess.outputs)
+            inputs = {**sess.inputs, **changes}
+            outputs, recomputed = self.pipeline.run(inputs, sess.outputs, changed)
+            after = self.pipeline.result(outputs)
+            sess.inputs, sess.outputs = inputs, outputs
+            sess.touched = time.monotonic()
+        diff = {k: v for k, v in after.items() if before.get(k) != v}
+        return diff, recomputed
+
+    def drop(self, sid: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(sid, None) is not None
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            sid, sess = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - sess.touched > self.ttl:
+                self._sessions.popitem(last=False)
+            else:
+                break
@@ -0,0 +1,217 @@
+# Carbon-price feed: pluggable sources, a background poller and a fixed-size history.
+#
+# Samples go into a ring of two preallocated float64 arrays (timestamp, price). The ring
+# is chronological in at most two contiguous segments, so a time window is a pair of
+# searchsorted calls per segment and min/max/avg buckets are ufunc.reduceat over views;
+# the history is never copied or rotated.
+#
+# Sources (ECO_CARBON_PRICE_SOURCE):
+#   sim[:base]            mean-reverting simulated series (default)
+#   file:/path/price.txt  a number or {"price": x}, re-read when the file changes
+#   http://host:port/...  a JSON number or {"price": x}; `python price_feed.py serve`
+#                         runs a local stand-in that serves the simulated series
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+HISTORY_SIZE = 10080      # one week of one-minute samples
+POLL_SECONDS = 60.0
+MAX_BUCKETS = 1000
+
+
+def _parse_price(payload) -> float:
+    if isinstance(payload, dict):
+        payload = payload.get("price")
+    price = float(payload)
+    if not math.isfinite(price) or price < 0:
+        raise ValueError(f"invalid carbon price {payload!r}")
+    return price
+
+
+class SimulatedSource:
+    # Ornstein-Uhlenbeck walk around `base`: volatility per sqrt(hour), reverting over a day
+    def __init__(self, base: float = 50.0, volatility: float = 1.5, reversion: float = 1 / 24, seed: Optional[int] = None):
+        self.base = base
+        self.volatility = volatility
+        self.reversion = reversion
+        self._rng = random.Random(seed)
+        self._value = base
+        self._last = None
+
+    def fetch(self) -> float:
+        now = time.time()
+        dt = 0.0 if self._last is None else min((now - self._last) / 3600, 24.0)
+        self._last = now
+        if dt > 0:
+            self._value += self.reversion * (self.base - self._value) * dt + self.volatility * math.sqrt(dt) * self._rng.gauss(0, 1)
+            self._value = max(self._value, 0.0)
+        return round(self._value, 2)
+
+
+class FileSource:
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self._value = None
+
+    def fetch(self) -> float:
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            with open(self.path, encoding="utf-8") as f:
+                text = f.read().strip()
+            self._value = _parse_price(json.loads(text))
+            self._mtime = mtime
+        return self._value
+
+
+class HttpSource:
+    def __init__(self, url: str, timeout: float = 3.0):
+        self.url = url
+        self.timeout = timeout
+        self._session = None
+
+    def fetch(self) -> float:
+        if self._session is None:
+            import requests  # only HTTP sources need the client
+            self._session = requests.Session()
+        r = self._session.get(self.url, timeout=self.timeout)
+        r.raise_for_status()
+        return _parse_price(r.json())
+
+
+def source_from_spec(spec: str, default: float = 50.0):
+    if spec.startswith(("http://", "https://")):
+        return HttpSource(spec)
+    if spec.startswith("file:"):
+        return FileSource(spec[5:])
+    if spec == "sim" or spec.startswith("sim:"):
+        return SimulatedSource(float(spec[4:]) if spec.startswith("sim:") else default)
+    raise ValueError(f"unknown carbon price source '{spec}'")
+
+
+class PriceRing:
+    def __init__(self, size: int = HISTORY_SIZE):
+        self.size = size
+        self.ts = np.zeros(size)
+        self.values = np.zeros(size)
+        self.head = 0   # next write position
+        self.count = 0
+
+    def append(self, ts: float, value: float):
+        self.ts[self.head] = ts
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def latest(self) -> Optional[tuple]:
+        if not self.count:
+            return None
+        i = (self.head - 1) % self.size
+        return float(self.ts[i]), float(self.values[i])
+
+    def segments(self) -> list:
+        # Chronological (ts, values) views covering the stored samples
+        if self.count < self.size:
+            return [(self.ts[:self.count], self.values[:self.count])]
+        return [(self.ts[self.head:], self.values[self.head:]), (self.ts[:self.head], self.values[:self.head])]
+
+    def downsample(self, since: float, until: float, buckets: int) -> dict:
+        edges = np.linspace(since, until, buckets + 1)
+        mins = np.full(buckets, np.inf)
+        maxs = np.full(buckets, -np.inf)
+        sums = np.zeros(buckets)
+        counts = np.zeros(buckets, dtype=np.int64)
+        for ts, vals in self.segments():
+            idx = np.searchsorted(ts, edges)
+            idx[-1] = np.searchsorted(ts, until, side="right")  # the last bucket is closed
+            n = np.diff(idx)
+            hit = n > 0
+            if not hit.any():
+                continue
+            lo, hi = idx[0], idx[-1]
+            starts = idx[:-1][hit] - lo
+            window = vals[lo:hi]
+            mins[hit] = np.minimum(mins[hit], np.minimum.reduceat(window, starts))
+            maxs[hit] = np.maximum(maxs[hit], np.maximum.reduceat(window, starts))
+            sums[hit] += np.add.reduceat(window, starts)
+            counts[hit] += n[hit]
+        hit = counts > 0
+        return {
+            "start": edges[:-1][hit], "min": mins[hit], "max": maxs[hit],
+            "avg": sums[hit] / counts[hit], "samples": counts[hit],
+        }
+
+
+class PriceFeed:
+    def __init__(self, source, interval: float = POLL_SECONDS, size: int = HISTORY_SIZE, default: float = 50.0):
+        self.source = source
+        self.interval = interval
+        self.default = default
+        self.errors = 0
+        self.ring = PriceRing(size)
+        self._lock = threading.Lock()
+        self._poller = None
+
+    def poll(self) -> Optional[float]:
+        try:
+            price = self.source.fetch()
+        except Exception:
+            self.errors += 1
+            return None
+        with self._lock:
+            self.ring.append(time.time(), price)
+        return price
+
+    def current(self) -> float:
+        if self._poller is None:
+            self.start()
+        latest = self.ring.latest()
+        return latest[1] if latest else self.default
+
+    def history(self, since: float, until: float, buckets: int) -> list:
+        with self._lock:
+            d = self.ring.downsample(since, until, buckets)
+        return [{"t": round(t, 3), "min": round(lo, 4), "max": round(hi, 4), "avg": round(avg, 4), "samples": int(n)}
+                for t, lo, hi, avg, n in zip(d["start"].tolist(), d["min"].tolist(), d["max"].tolist(),
+                                             d["avg"].tolist(), d["samples"].tolist())]
+
+    def start(self):
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._poller = threading.Thread(target=self._poll_loop, name="carbon-price-poller", daemon=True)
+        self.poll()  # first sample before anyone reads the current price
+        self._poller.start()
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.poll()
+
+
+if __name__ == "__main__":
+    # Local stand-in for an HTTP price API: python price_feed.py serve [port] [base]
+    import sys
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    if len(sys.argv) < 2 or sys.argv[1] != "serve":
+        sys.exit("usage: python price_feed.py serve [port] [base]")
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8085
+    sim = SimulatedSource(float(sys.argv[3]) if len(sys.argv) > 3 else 50.0)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({"price": sim.fetch(), "ts": time.time()}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
@@ -0,0 +1,50 @@
+# Hourly profile synthesis shared by the simulators (8760-hour years, kWh per hour)
+import numpy as np
+
+HOURS_PER_YEAR = 8760
+
+# Typical residential demand shape (fraction of daily kWh per hour), morning + evening peaks
+RESIDENTIAL_LOAD_SHAPE = np.array([
+    0.025, 0.022, 0.020, 0.020, 0.022, 0.030, 0.042, 0.050,
+    0.048, 0.040, 0.036, 0.035, 0.036, 0.035, 0.036, 0.040,
+    0.047, 0.058, 0.068, 0.072, 0.068, 0.058, 0.045, 0.032
+])
+RESIDENTIAL_LOAD_SHAPE = RESIDENTIAL_LOAD_SHAPE / RESIDENTIAL_LOAD_SHAPE.sum()
+
+# Average sky clearness applied on top of the clear-sky model
+CLOUD_DERATE = 0.75
+# Fraction of nameplate reaching the AC side at full sun (inverter, soiling, temperature)
+SYSTEM_DERATE = 0.8
+
+
+def hourly_load_year(monthly_kwh: float, shape: np.ndarray = RESIDENTIAL_LOAD_SHAPE) -> np.ndarray:
+    daily_kwh = monthly_kwh / 30.0
+    return np.tile(shape * daily_kwh, 365)
+
+
+def hourly_solar_year(pv_kw: float, lat: float) -> np.ndarray:
+    # Clear-sky elevation model: declination by day of year, hour angle by solar time
+    day = np.repeat(np.arange(365), 24)
+    hour = np.tile(np.arange(24) + 0.5, 365)
+    decl = np.radians(23.44) * np.sin(2 * np.pi * (284 + day + 1) / 365)
+    phi = np.radians(lat)
+    hour_angle = np.radians(15.0 * (hour - 12.0))
+    sin_elev = np.sin(phi) * np.sin(decl) + np.cos(phi) * np.cos(decl) * np.cos(hour_angle)
+    return pv_kw * SYSTEM_DERATE * CLOUD_DERATE * np.clip(sin_elev, 0, None)
+
+
+def annual_yield_per_kw(lat: float) -> float:
+    return float(hourly_solar_year(1.0, lat).sum())
+
+# Diurnal grid carbon-intensity multipliers (mean 1.0): evening peakers, overnight baseload
+GRID_INTENSITY_SHAPE = np.array([
+    0.92, 0.90, 0.88, 0.88, 0.89, 0.93, 1.00, 1.06,
+    1.05, 1.00, 0.96, 0.94, 0.93, 0.94, 0.96, 1.00,
+    1.06, 1.12, 1.16, 1.15, 1.10, 1.04, 0.98, 0.94
+])
+GRID_INTENSITY_SHAPE = GRID_INTENSITY_SHAPE / GRID_INTENSITY_SHAPE.mean()
+
+
+def hourly_intensity(ci: float, hours: int = 24) -> np.ndarray:
+    # gCO2/kWh for each hour starting at local midnight
+    return np.resize(GRID_INTENSITY_SHAPE * ci, hours)
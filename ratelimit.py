@@ -0,0 +1,203 @@
+# Token-bucket rate limiting and admission control, shared across worker processes.
+#
+# Buckets live in a small memory-mapped file: a fixed table of (tokens, last_refill)
+# slots. Per-client buckets are addressed by a stable hash of "budget:client" (colliding
+# clients share a bucket, which only ever makes the limit stricter); each budget's global
+# bucket has its own reserved slot ahead of the hashed range, so no client shares it.
+# Slots are grouped into stripes; a take() holds one stripe's thread lock plus an fcntl
+# byte-range lock on it, so processes and threads contend only when they hit the same
+# stripe.
+#
+# Each budget has a per-client bucket (429 when empty) and a global bucket (503 when
+# empty). A request takes from every budget it names or from none: tokens already taken
+# are given back when a later bucket or budget rejects. Admission control is per process: when in-flight requests for a budget reach
+# max_inflight, or its latency EWMA is over target while the queue is building, requests
+# are shed with 503 before doing any work. Every rejection carries Retry-After.
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import jsonify, request
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking; buckets are still shared through the map
+    fcntl = None
+
+SLOTS = 8192
+RESERVED = 64  # fixed slots for global buckets, one per budget
+STRIPES = 64
+SLOT = struct.Struct("<dd")  # tokens, last refill (unix time)
+
+
+class Budget:
+    __slots__ = ("name", "client_rate", "client_burst", "global_rate", "global_burst",
+                 "max_inflight", "latency_target", "inflight", "ewma", "_lock")
+
+    def __init__(self, name: str, client_rate: float, client_burst: float, global_rate: float, global_burst: float,
+                 max_inflight: int = 32, latency_target: float = 2.0):
+        self.name = name
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.max_inflight = max_inflight
+        self.latency_target = latency_target
+        self.inflight = 0
+        self.ewma = 0.0
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        with self._lock:
+            if self.inflight >= self.max_inflight:
+                return False
+            # Over the latency target: shed once a queue builds, but keep letting a few
+            # requests through so the EWMA can recover
+            if self.ewma > self.latency_target and self.inflight >= max(1, self.max_inflight // 4):
+                return False
+            self.inflight += 1
+            return True
+
+    def done(self, seconds: Optional[float] = None):
+        with self._lock:
+            self.inflight -= 1
+            if seconds is not None:
+                self.ewma += 0.2 * (seconds - self.ewma)
+
+
+class BucketTable:
+    def __init__(self, path: str, slots: int = SLOTS, reserved: int = RESERVED, stripes: int = STRIPES):
+        # Slots [0, reserved) are addressed by index, the rest by key hash
+        self.slots = slots
+        self.reserved = reserved
+        self.stripes = stripes
+        size = (reserved + slots) * SLOT.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._lockfile = open(path, "rb+") if fcntl else None
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def slot(self, key: str) -> int:
+        return self.reserved + zlib.crc32(key.encode("utf-8")) % self.slots
+
+    def take(self, i: int, rate: float, burst: float, cost: float = 1.0) -> float:
+        # 0.0 when the tokens were taken, else seconds until they would be available.
+        # A negative cost returns tokens taken earlier (still capped at burst).
+        stripe = i % self.stripes
+        off = i * SLOT.size
+        with self._locks[stripe]:
+            if self._lockfile:
+                fcntl.lockf(self._lockfile, fcntl.LOCK_EX, 1, stripe)
+            try:
+                tokens, last = SLOT.unpack_from(self._map, off)
+                now = time.time()
+                tokens = min(burst, tokens + max(now - last, 0.0) * rate)
+                if tokens >= cost:
+                    SLOT.pack_into(self._map, off, min(burst, tokens - cost), now)
+                    return 0.0
+                SLOT.pack_into(self._map, off, tokens, now)
+                return (cost - tokens) / rate if rate > 0 else math.inf
+            finally:
+                if self._lockfile:
+                    fcntl.lockf(self._lockfile, fcntl.LOCK_UN, 1, stripe)
+
+
+def _reject(status: int, message: str, retry_after: float):
+    resp = jsonify({"error": message})
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(max(1, math.ceil(min(retry_after, 3600))))
+    return resp
+
+
+class Limiter:
+    def __init__(self, path: str, budgets: dict, trusted_proxies: int = 0):
+        # trusted_proxies: how many proxies in front of the app append to X-Forwarded-For
+        # (as werkzeug's ProxyFix x_for); 0 ignores the header
+        self.table = BucketTable(path)
+        if len(budgets) > self.table.reserved:
+            raise ValueError(f"At most {self.table.reserved} budgets")
+        self.budgets = budgets
+        # Sorted so every worker maps a budget to the same reserved slot
+        self._global_slot = {n: i for i, n in enumerate(sorted(budgets))}
+        self.trusted_proxies = trusted_proxies
+        self.rejected = {}
+
+    def client(self) -> str:
+        # The entry our outermost trusted proxy appended, counted from the right; anything
+        # further left was sent by the client and can be forged
+        if self.trusted_proxies:
+            hops = [h.strip() for h in request.headers.get("X-Forwarded-For", "").split(",")]
+            if len(hops) >= self.trusted_proxies and hops[-self.trusted_proxies]:
+                return hops[-self.trusted_proxies]
+        return request.remote_addr or "-"
+
+    def check(self, budget: Budget, client: str):
+        # None when admitted (caller must call budget.done), else the rejection response;
+        # a rejection leaves this budget's buckets as they were
+        client_slot = self.table.slot(f"{budget.name}:{client}")
+        wait = self.table.take(client_slot, budget.client_rate, budget.client_burst)
+        if wait:
+            return self._count(budget, 429, "Rate limit exceeded", wait)
+        wait = self.table.take(self._global_slot[budget.name], budget.global_rate, budget.global_burst)
+        if wait:
+            self.table.take(client_slot, budget.client_rate, budget.client_burst, cost=-1.0)
+            return self._count(budget, 503, "Server busy", wait)
+        if not budget.admit():
+            self.refund(budget, client)
+            return self._count(budget, 503, "Server overloaded", 1.0)
+        return None
+
+    def refund(self, budget: Budget, client: str):
+        self.table.take(self.table.slot(f"{budget.name}:{client}"), budget.client_rate, budget.client_burst, cost=-1.0)
+        self.table.take(self._global_slot[budget.name], budget.global_rate, budget.global_burst, cost=-1.0)
+
+    def _count(self, budget: Budget, status: int, message: str, wait: float):
+        key = f"{budget.name}:{status}"
+        self.rejected[key] = self.rejected.get(key, 0) + 1
+        return _reject(status, message, wait)
+
+    def limit(self, *names: str, when: Optional[Callable[[], bool]] = None):
+        # when(): optional predicate; requests it rejects (e.g. cheap variants of a route) skip the budgets
+        budgets = [self.budgets[n] for n in names]
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if when is not None and not when():
+                    return view(*args, **kwargs)
+                client = self.client()
+                admitted = []
+                try:
+                    for b in budgets:
+                        rejection = self.check(b, client)
+                        if rejection is not None:
+                            for a in admitted:
+                                self.refund(a, client)
+                            return rejection
+                        admitted.append(b)
+                    start = time.perf_counter()
+                    return view(*args, **kwargs)
+                finally:
+                    # Latency only counts for requests that actually ran
+                    elapsed = time.perf_counter() - start if len(admitted) == len(budgets) else None
+                    for b in admitted:
+                        b.done(elapsed)
+            return wrapper
+        return decorator
+
+    def status(self) -> dict:
+        return {
+            "budgets": {n: {"inflight": b.inflight, "latency_ewma_s": round(b.ewma, 4)} for n, b in self.budgets.items()},
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,123 @@
+# Hot-reloadable reference data (carbon intensity, rates, tariffs, currencies, tips).
+#
+# data/reference.json is loaded into an immutable Snapshot (read-only mappings, tuples).
+# Readers take RefData.current, a plain attribute read with no lock; a watcher thread
+# notices when the file changes, builds a new snapshot off to the side and swaps the
+# attribute in one assignment. Anything holding the old snapshot keeps a consistent view
+# until it lets go. Derived structures (compiled tariffs, ...) are memoized on the
+# snapshot itself, so a swap invalidates them along with the data they came from. An
+# optional prepare(snapshot) hook builds them for every candidate before it is swapped in,
+# so a file that parses but does not compile (e.g. a malformed tariff) is rejected and the
+# old snapshot stays current.
+#
+# Tariff specs: "energy" is the base rate per kWh, "windows" are
+# [rate, start_hour, end_hour, "all" | "weekday" | "weekend"] TOU overrides, "slabs" are
+# monthly [upto_kwh, rate] blocks (last upto is null), "fixed" is per month and "demand"
+# per kW of monthly peak. Countries without a tariff bill flat at their electricity_rate.
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "reference.json")
+POLL_SECONDS = 5.0
+TABLES = ("carbon_intensity", "currency_symbol", "electricity_rate", "tariffs", "renewable_potential", "energy_tips")
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class Snapshot:
+    __slots__ = ("version", "loaded_at") + TABLES + ("_derived",)
+
+    def __init__(self, data: dict, digest: str):
+        missing = [t for t in TABLES if not isinstance(data.get(t), dict)]
+        if missing:
+            raise ValueError(f"reference data is missing {missing}")
+        for table in ("carbon_intensity", "electricity_rate"):
+            bad = [k for k, v in data[table].items() if not isinstance(v, (int, float)) or v < 0]
+            if bad:
+                raise ValueError(f"non-numeric {table} for {bad}")
+        self.version = f"{data.get('version', 0)}-{digest[:8]}"
+        self.loaded_at = time.time()
+        for table in TABLES:
+            setattr(self, table, freeze(data[table]))
+        self._derived = {}
+
+    def derived(self, name: str, build: Callable[["Snapshot"], object]):
+        # Per-snapshot memo: rebuilt on first use after each swap
+        value = self._derived.get(name)
+        if value is None:
+            value = self._derived.setdefault(name, build(self))
+        return value
+
+
+class RefData:
+    def __init__(self, path: str = DEFAULT_PATH, interval: float = POLL_SECONDS,
+                 prepare: Optional[Callable[[Snapshot], object]] = None):
+        self.path = path
+        self.interval = interval
+        self.prepare = prepare
+        self.last_error = None
+        self.swaps = 0
+        self._stamp = None
+        self._watcher = None
+        self._start_lock = threading.Lock()
+        self.current = self._load()  # fail loudly at startup; later bad files keep the old snapshot
+
+    def _load(self) -> Snapshot:
+        st = os.stat(self.path)
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        snap = Snapshot(json.loads(raw.decode("utf-8")), hashlib.sha256(raw).hexdigest())
+        self._stamp = (st.st_mtime_ns, st.st_size)
+        if self.prepare is not None:
+            try:
+                self.prepare(snap)
+            except Exception as e:
+                raise ValueError(f"reference data does not compile: {type(e).__name__}: {e}") from e
+        return snap
+
+    def reload(self) -> bool:
+        # True when a new snapshot was swapped in
+        try:
+            snap = self._load()
+        except (OSError, ValueError) as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        self.last_error = None
+        if snap.version == self.current.version:
+            return False
+        self.current = snap
+        self.swaps += 1
+        return True
+
+    def watch(self):
+        with self._start_lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch_loop, name="refdata-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                continue
+            if (st.st_mtime_ns, st.st_size) != self._stamp:
+                self.reload()
+
+    def status(self) -> dict:
+        snap = self.current
+        return {"version": snap.version, "loaded_at": snap.loaded_at, "swaps": self.swaps,
+                "path": self.path, "last_error": self.last_error}
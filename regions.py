@@ -0,0 +1,137 @@
+# Nearest grid-region lookup by coordinates.
+#
+# Grid buckets over lat/lon (CELL_DEG degrees). For each bucket we keep the regions that
+# can possibly be nearest to *some* point inside it: everything within D + 2h of the
+# bucket centre, where D is the centre's nearest-region distance and h the bucket's
+# half-diagonal. A lookup is then bucket arithmetic plus a distance check over a handful
+# of candidates, exact everywhere (poles and the antimeridian included). Candidate lists
+# are built lazily per bucket and shared by all requests.
+import csv
+import math
+import threading
+from typing import Iterable, Optional
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+CELL_DEG = 2.0
+
+
+class Region:
+    __slots__ = ("id", "name", "country", "lat", "lon", "carbon_intensity")
+
+    def __init__(self, id: str, name: str, country: str, lat: float, lon: float,
+                 carbon_intensity: Optional[float] = None):
+        self.id = id
+        self.name = name
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.carbon_intensity = carbon_intensity
+
+
+def _unit(lat, lon) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _arc_km(dot):
+    # Great-circle distance from the dot product of unit vectors
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip((1 - dot) / 2, 0, 1)))
+
+
+def _haversine_scalar(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+class RegionIndex:
+    def __init__(self, regions: Iterable[Region], cell_deg: float = CELL_DEG):
+        self.regions = list(regions)
+        if not self.regions:
+            raise ValueError("region index needs at least one region")
+        self.cell_deg = cell_deg
+        self.rows = int(math.ceil(180 / cell_deg))
+        self.cols = int(math.ceil(360 / cell_deg))
+        self.lats = np.array([r.lat for r in self.regions])
+        self.lons = np.array([r.lon for r in self.regions])
+        self.xyz = _unit(self.lats, self.lons)
+        self._lat_list = self.lats.tolist()
+        self._lon_list = self.lons.tolist()
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> int:
+        i = min(int((lat + 90) // self.cell_deg), self.rows - 1)
+        j = int(((lon + 180) % 360) // self.cell_deg) % self.cols
+        return i * self.cols + j
+
+    def _candidates(self, cell: int) -> tuple:
+        cand = self._cells.get(cell)
+        if cand is not None:
+            return cand
+        i, j = divmod(cell, self.cols)
+        lat0, lon0 = -90 + i * self.cell_deg, -180 + j * self.cell_deg
+        lat1, lon1 = min(lat0 + self.cell_deg, 90.0), lon0 + self.cell_deg
+        clat, clon = (lat0 + lat1) / 2, (lon0 + lon1) / 2
+        # Half-diagonal: farthest boundary point (corners and edge midpoints) from the centre
+        edge = [(lat0, lon0), (lat0, lon1), (lat1, lon0), (lat1, lon1),
+                (lat0, clon), (lat1, clon), (clat, lon0), (clat, lon1)]
+        h = max(_haversine_scalar(clat, clon, a, b) for a, b in edge) * 1.001
+        d = _arc_km(self.xyz @ _unit(clat, clon))
+        cand = tuple(np.flatnonzero(d <= d.min() + 2 * h).tolist())
+        with self._lock:
+            self._cells[cell] = cand
+        return cand
+
+    def nearest(self, lat: float, lon: float) -> tuple:
+        # (Region, distance_km)
+        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+            raise ValueError("coordinates out of range")
+        cand = self._candidates(self._cell(lat, lon))
+        best, best_d = cand[0], math.inf
+        for k in cand:
+            dk = _haversine_scalar(lat, lon, self._lat_list[k], self._lon_list[k])
+            if dk < best_d:
+                best, best_d = k, dk
+        return self.regions[best], best_d
+
+    def nearest_batch(self, lats, lons) -> tuple:
+        # (region indices, distances_km) for arrays of coordinates
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        if lats.shape != lons.shape or lats.ndim != 1:
+            raise ValueError("lat and lon must be equal-length 1-D arrays")
+        if not (np.all(np.abs(lats) <= 90) and np.all(np.abs(lons) <= 180)):
+            raise ValueError("coordinates out of range")
+        if not len(lats):
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+        rows = np.minimum(((lats + 90) // self.cell_deg).astype(int), self.rows - 1)
+        cols = (((lons + 180) % 360) // self.cell_deg).astype(int) % self.cols
+        cells = rows * self.cols + cols
+        uniq, inverse = np.unique(cells, return_inverse=True)
+        # Padded (bucket x candidate) table; padding repeats the first candidate
+        lists = [self._candidates(c) for c in uniq.tolist()]
+        width = max(len(c) for c in lists)
+        table = np.array([c + (c[0],) * (width - len(c)) for c in lists], dtype=np.intp)
+        cand = table[inverse]
+        dot = np.einsum('qkd,qd->qk', self.xyz[cand], _unit(lats, lons))
+        k = np.argmax(dot, axis=1)
+        rows_ = np.arange(len(lats))
+        return cand[rows_, k], _arc_km(dot[rows_, k])
+
+
+def from_countries(coords: dict, intensity: dict) -> list:
+    return [Region(code, code, code, lat, lon, intensity.get(code)) for code, (lat, lon) in coords.items()]
+
+
+def load_csv(path: str) -> list:
+    # Columns: id, name, country, lat, lon, carbon_intensity (optional)
+    out = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            ci = row.get("carbon_intensity")
+            out.append(Region(row["id"], row.get("name") or row["id"], row["country"],
+                              float(row["lat"]), float(row["lon"]), float(ci) if ci else None))
+    return out
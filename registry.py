@@ -0,0 +1,95 @@
+# Country registry: one compact record per country with every per-country value the
+# analysis needs, defaults already applied and derived values (compiled tariff, base
+# renewable advice) precomputed. Built once per reference-data snapshot.
+#
+# The same data is exposed as aligned NumPy columns for batch paths: indices(codes) maps
+# country codes to row numbers (unknown codes to the trailing default row) and
+# column(name)[idx] gathers values for a whole batch at once.
+from typing import Iterable
+
+import numpy as np
+
+import tariffs
+
+DEFAULT_CODE = "??"
+DEFAULT_CARBON_INTENSITY = 450
+DEFAULT_CURRENCY = "$"
+DEFAULT_TARIFF_SPEC = {"energy": 0.15}
+DEFAULT_POTENTIAL = {"solar": "moderate", "wind": "low"}
+
+SOLAR_ADVICE = {
+    "excellent": "☀️ Rooftop Solar: High potential. 5kW system can offset 90% usage.",
+    "good": "☀️ Solar: Good ROI. Consider a 3-4kW system.",
+}
+WIND_ADVICE = {
+    "excellent": "💨 Micro-Wind: Feasible if you have open land.",
+}
+
+NUMERIC_COLUMNS = ("carbon_intensity", "electricity_rate", "lat", "lon")
+
+
+class CountryRecord:
+    __slots__ = ("code", "index", "carbon_intensity", "currency", "electricity_rate", "tariff",
+                 "potential", "renewables", "lat", "lon")
+
+    def __init__(self, code: str, index: int, carbon_intensity: float, currency: str, electricity_rate: float,
+                 tariff: tariffs.Tariff, potential: dict, lat: float, lon: float):
+        self.code = code
+        self.index = index
+        self.carbon_intensity = carbon_intensity
+        self.currency = currency
+        self.electricity_rate = electricity_rate
+        self.tariff = tariff
+        self.potential = potential
+        self.renewables = tuple(a for a in (SOLAR_ADVICE.get(potential.get("solar")),
+                                            WIND_ADVICE.get(potential.get("wind"))) if a)
+        self.lat = lat
+        self.lon = lon
+
+
+class Registry:
+    def __init__(self, records: list, default: CountryRecord):
+        self.records = records
+        self.default = default
+        self.codes = tuple(r.code for r in records)
+        self._index = {r.code: r.index for r in records}
+        rows = records + [default]
+        self._columns = {name: np.array([getattr(r, name) for r in rows], dtype=float) for name in NUMERIC_COLUMNS}
+        for col in self._columns.values():
+            col.setflags(write=False)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, code: str) -> CountryRecord:
+        i = self._index.get(code)
+        return self.default if i is None else self.records[i]
+
+    def indices(self, codes: Iterable[str]) -> np.ndarray:
+        n = len(self.records)
+        return np.fromiter((self._index.get(c, n) for c in codes), dtype=np.intp)
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+
+def build(snap, coords: dict) -> Registry:
+    # snap: a refdata.Snapshot; coords: code -> (lat, lon)
+    default_tariff = tariffs.Tariff("default", DEFAULT_TARIFF_SPEC)
+    book = tariffs.compile_book(snap.tariffs, snap.electricity_rate)
+    codes = sorted(set(snap.carbon_intensity) | set(snap.currency_symbol) | set(snap.electricity_rate)
+                   | set(snap.tariffs) | set(snap.renewable_potential) | set(coords))
+    records = []
+    for i, code in enumerate(codes):
+        lat, lon = coords.get(code, (np.nan, np.nan))
+        records.append(CountryRecord(
+            code, i,
+            snap.carbon_intensity.get(code, DEFAULT_CARBON_INTENSITY),
+            snap.currency_symbol.get(code, DEFAULT_CURRENCY),
+            snap.electricity_rate.get(code, DEFAULT_TARIFF_SPEC["energy"]),
+            book.get(code, default_tariff),
+            snap.renewable_potential.get(code, DEFAULT_POTENTIAL),
+            lat, lon))
+    default = CountryRecord(DEFAULT_CODE, len(codes), DEFAULT_CARBON_INTENSITY, DEFAULT_CURRENCY,
+                            DEFAULT_TARIFF_SPEC["energy"], default_tariff, DEFAULT_POTENTIAL, np.nan, np.nan)
+    return Registry(records, default)
@@ -0,0 +1,261 @@
+# Roof-geometry panel layout: how many modules fit on a real roof.
+#
+# The roof polygon (metres, any vertex order) is rotated so its longest edge runs along
+# the x axis, then rasterised onto a fine grid with a vectorised scanline fill. Setbacks
+# erode the roof by the setback distance and obstacles (vents, skylights, chimneys) are
+# rasterised, grown by their clearance and cut out; both use box sums over a summed-area
+# table. A second summed-area table over the usable cells answers "does a panel fit with
+# its top-left corner here" for every cell at once.
+#
+# Panels are packed in rows one footprint high. Within a row, a run of consecutive fitting
+# positions of length L holds (L - 1) // w + 1 panels placed greedily left to right, so
+# every row's count comes from run lengths without a Python loop over cells; the row phase
+# with the most panels wins. Portrait, landscape and each of them followed by a fill pass
+# in the other orientation over the cells left free are tried, and the layout with the
+# most panels is returned (panel centres in the roof's own coordinates). The grid cell is
+# chosen so one footprint side is a whole number of cells, which keeps rounding waste low
+# at a coarse, fast resolution.
+import math
+from typing import Iterable, Optional
+
+import numpy as np
+
+PANEL_W = 1.134   # m, short side of a typical 400 W module
+PANEL_H = 1.722   # m
+PANEL_KW = 0.4
+GAP = 0.02        # m between modules
+SETBACK = 0.5     # m kept clear along the roof edge
+CLEARANCE = 0.3   # m kept clear around obstacles
+CELL = 0.1        # m target grid resolution (adjusted so footprints fit the grid closely)
+MAX_CELLS = 1_000_000  # larger roofs get a coarser grid
+MAX_VERTICES = 500     # per polygon; rasterising is ny x vertices
+MAX_OBSTACLES = 100
+FEET = 0.3048
+
+
+def _polygon(points, name: str) -> np.ndarray:
+    try:
+        p = np.asarray(points, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a list of [x, y] points")
+    if p.ndim != 2 or p.shape[1] != 2 or len(p) < 3 or not np.isfinite(p).all():
+        raise ValueError(f"{name} must be a list of at least 3 [x, y] points")
+    if len(p) > MAX_VERTICES:
+        raise ValueError(f"{name} has more than {MAX_VERTICES} points")
+    return p
+
+
+def polygon_area(p: np.ndarray) -> float:
+    x, y = p[:, 0], p[:, 1]
+    return abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))) / 2
+
+
+def rasterize(p: np.ndarray, ny: int, nx: int, cell: float) -> np.ndarray:
+    # Cells whose centre is inside the polygon (even-odd rule), one scanline per row
+    x1, y1 = p[:, 0], p[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    yc = (np.arange(ny) + 0.5) * cell
+    Y = yc[:, None]
+    crosses = ((y1 <= Y) & (Y < y2)) | ((y2 <= Y) & (Y < y1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xs = np.where(crosses, x1 + (Y - y1) * (x2 - x1) / (y2 - y1), np.inf)
+    xs.sort(axis=1)
+    # A closed polygon crosses each scanline an even number of times, so with an odd
+    # vertex count the last sorted column is always inf
+    pairs = xs.shape[1] // 2
+    starts, ends = xs[:, 0:2 * pairs:2], xs[:, 1:2 * pairs:2]
+    rows = np.broadcast_to(np.arange(ny)[:, None], starts.shape)
+    ok = np.isfinite(starts) & np.isfinite(ends)
+    c0 = np.clip(np.ceil(starts[ok] / cell - 0.5), 0, nx).astype(np.intp)
+    c1 = np.clip(np.ceil(ends[ok] / cell - 0.5), 0, nx).astype(np.intp)
+    diff = np.zeros((ny, nx + 1), dtype=np.int32)
+    np.add.at(diff, (rows[ok], c0), 1)
+    np.add.at(diff, (rows[ok], c1), -1)
+    return np.cumsum(diff[:, :nx], axis=1) > 0
+
+
+def summed_area(mask: np.ndarray) -> np.ndarray:
+    sat = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=sat[1:, 1:])
+    return sat
+
+
+def window_sums(sat: np.ndarray, h: int, w: int) -> np.ndarray:
+    # Sum over every h x w window, indexed by its top-left cell
+    return sat[h:, w:] - sat[:-h, w:] - sat[h:, :-w] + sat[:-h, :-w]
+
+
+def _centered_sums(mask: np.ndarray, r: int) -> np.ndarray:
+    # Sum over the (2r+1)^2 square around every cell; outside the grid counts as 0
+    padded = np.pad(mask, r)
+    return window_sums(summed_area(padded), 2 * r + 1, 2 * r + 1)
+
+
+def _row_counts(fit: np.ndarray, pw: int) -> tuple:
+    # Greedy panels per row from runs of fitting start positions: (counts, run rows, run starts, run lengths)
+    my, mx = fit.shape
+    edges = np.diff(np.pad(fit, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    lengths = ends[:, 1] - starts[:, 1]
+    per_run = (lengths - 1) // pw + 1
+    counts = np.bincount(starts[:, 0], weights=per_run, minlength=my).astype(np.int64)
+    return counts, starts[:, 0], starts[:, 1], lengths
+
+
+def _pack(usable: np.ndarray, ph: int, pw: int) -> Optional[tuple]:
+    # Best row phase for one orientation: (count, panel top-left rows, panel top-left cols)
+    if usable.shape[0] < ph or usable.shape[1] < pw:
+        return None
+    fit = window_sums(summed_area(usable), ph, pw) == ph * pw
+    counts, run_rows, run_starts, lengths = _row_counts(fit, pw)
+    totals = np.array([counts[o::ph].sum() for o in range(min(ph, len(counts)))])
+    if not len(totals) or totals.max() == 0:
+        return None
+    phase = int(totals.argmax())
+    keep = (run_rows >= phase) & ((run_rows - phase) % ph == 0)
+    rows, starts, lengths = run_rows[keep], run_starts[keep], lengths[keep]
+    n = (lengths - 1) // pw + 1
+    run = np.repeat(np.arange(len(n)), n)
+    k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    return int(totals[phase]), rows[run], starts[run] + k * pw
+
+
+def grid_cell(fw: float, fh: float, target: float) -> float:
+    # A cell size near target that divides one footprint side exactly and wastes the least
+    # of the other when it is rounded up to whole cells
+    best = None
+    for side, other in ((fw, fh), (fh, fw)):
+        for k in range(max(1, math.floor(side / target)), math.floor(side / (target * 0.75)) + 1):
+            cell = side / k
+            waste = math.ceil(other / cell - 1e-9) * cell - other
+            if best is None or waste < best[0]:
+                best = (waste, cell)
+    return best[1] if best else target
+
+
+def _footprints(shape: tuple, rows: np.ndarray, cols: np.ndarray, h: int, w: int) -> np.ndarray:
+    # Cells covered by h x w rectangles at the given top-left corners (2-D difference array)
+    diff = np.zeros((shape[0] + 1, shape[1] + 1), dtype=np.int32)
+    np.add.at(diff, (rows, cols), 1)
+    np.add.at(diff, (rows + h, cols), -1)
+    np.add.at(diff, (rows, cols + w), -1)
+    np.add.at(diff, (rows + h, cols + w), 1)
+    return np.cumsum(np.cumsum(diff, axis=0), axis=1)[:-1, :-1] > 0
+
+
+class Layout:
+    __slots__ = ("panels", "kw", "orientation", "roof_area_m2", "usable_area_m2", "angle_deg", "centers",
+                 "rotated", "panel_w", "panel_h")
+
+    def __init__(self, panels, kw, orientation, roof_area_m2, usable_area_m2, angle_deg, centers, rotated,
+                 panel_w, panel_h):
+        self.panels = panels
+        self.kw = kw
+        self.orientation = orientation
+        self.roof_area_m2 = roof_area_m2
+        self.usable_area_m2 = usable_area_m2
+        self.angle_deg = angle_deg
+        self.centers = centers    # (n, 2) panel centres in roof coordinates
+        self.rotated = rotated    # (n,) True where the panel is landscape
+        self.panel_w = panel_w
+        self.panel_h = panel_h
+
+    def as_dict(self, include_layout: bool = True) -> dict:
+        out = {"panels": self.panels, "system_kw": round(self.kw, 2), "orientation": self.orientation,
+               "roof_area_m2": round(self.roof_area_m2, 1), "usable_area_m2": round(self.usable_area_m2, 1)}
+        if include_layout:
+            out["layout"] = {
+                "angle_deg": round(self.angle_deg, 2), "panel_w_m": self.panel_w, "panel_h_m": self.panel_h,
+                "panels": [[round(x, 3), round(y, 3), "L" if r else "P"]
+                           for (x, y), r in zip(self.centers.tolist(), self.rotated.tolist())],
+            }
+        return out
+
+
+def layout(roof, obstacles: Iterable = (), setback: Optional[float] = None, clearance: Optional[float] = None,
+           panel_w: float = PANEL_W, panel_h: float = PANEL_H, panel_kw: float = PANEL_KW, gap: float = GAP,
+           cell: float = CELL, units: str = "m") -> Layout:
+    # units applies to the roof, obstacles, setback and clearance given; the SETBACK and
+    # CLEARANCE defaults (and panel sizes) are always metres
+    if units not in ("m", "ft"):
+        raise ValueError("units must be 'm' or 'ft'")
+    scale = FEET if units == "ft" else 1.0
+    roof = _polygon(roof, "roof") * scale
+    obstacles = list(obstacles or ())
+    if len(obstacles) > MAX_OBSTACLES:
+        raise ValueError(f"At most {MAX_OBSTACLES} obstacles")
+    obs = [_polygon(o, "obstacle") * scale for o in obstacles]
+    setback = SETBACK if setback is None else float(setback) * scale
+    clearance = CLEARANCE if clearance is None else float(clearance) * scale
+    if min(setback, clearance, gap) < 0 or min(panel_w, panel_h, panel_kw) <= 0:
+        raise ValueError("setback, clearance and gap must be >= 0 and panel sizes > 0")
+    roof_area = polygon_area(roof)
+    if roof_area <= 0:
+        raise ValueError("roof polygon has no area")
+
+    # Align the longest edge with the x axis, then move the roof's corner to the origin
+    edges = np.roll(roof, -1, axis=0) - roof
+    ex, ey = edges[np.argmax(np.hypot(edges[:, 0], edges[:, 1]))]
+    angle = math.atan2(ey, ex)
+    c, s = math.cos(angle), math.sin(angle)
+    unrotate = np.array([[c, s], [-s, c]])
+
+    def to_grid(p):
+        return p @ unrotate.T
+
+    r = to_grid(roof)
+    origin = r.min(axis=0)
+    r = r - origin
+    extent = r.max(axis=0)
+    fw, fh = panel_w + gap, panel_h + gap
+    cell = grid_cell(fw, fh, max(float(cell), math.sqrt(extent[0] * extent[1] / MAX_CELLS)))
+    nx, ny = int(math.ceil(extent[0] / cell)), int(math.ceil(extent[1] / cell))
+
+    inside = rasterize(r, ny, nx, cell)
+    k = int(math.ceil(setback / cell))
+    usable = _centered_sums(inside, k) == (2 * k + 1) ** 2 if k else inside
+    if obs:
+        blocked = np.zeros_like(inside)
+        for o in obs:
+            # Only the obstacle's bounding box, shifted by whole cells so centres line up
+            q = to_grid(o) - origin
+            r0, c0 = np.clip(np.floor(q.min(axis=0)[::-1] / cell).astype(int), 0, (ny, nx))
+            r1, c1 = np.clip(np.ceil(q.max(axis=0)[::-1] / cell).astype(int), 0, (ny, nx))
+            if r1 > r0 and c1 > c0:
+                blocked[r0:r1, c0:c1] |= rasterize(q - (c0 * cell, r0 * cell), r1 - r0, c1 - c0, cell)
+        k = int(math.ceil(clearance / cell))
+        usable &= ~(_centered_sums(blocked, k) > 0 if k else blocked)
+
+    # Footprints in cells, gap included: portrait is w x h, landscape h x w
+    pw, ph = math.ceil(fw / cell - 1e-9), math.ceil(fh / cell - 1e-9)
+    shapes = {"portrait": (ph, pw), "landscape": (pw, ph)}
+    best = None
+    for first, second in (("portrait", "landscape"), ("landscape", "portrait")):
+        # One orientation alone, then the same rows plus a fill pass in the other one
+        h, w = shapes[first]
+        packed = _pack(usable, h, w)
+        if packed is None:
+            count, placed, free = 0, [], usable
+        else:
+            count, placed = packed[0], [(first, packed[1], packed[2])]
+            free = usable & ~_footprints(usable.shape, packed[1], packed[2], h, w)
+        if best is None or count > best[0]:
+            best = (count, placed)
+        h, w = shapes[second]
+        fill = _pack(free, h, w)
+        if fill is not None and count + fill[0] > best[0]:
+            best = (count + fill[0], placed + [(second, fill[1], fill[2])])
+
+    count, placed = best
+    kinds = {name for name, rows, _ in placed if len(rows)}
+    centers, rotated = [np.empty((0, 2))], [np.empty(0, dtype=bool)]
+    for name, rows, cols in placed:
+        h, w = shapes[name]
+        # A panel sits in the top-left of its footprint; the gap is on its far sides
+        corner = np.column_stack([cols * cell, rows * cell])
+        centers.append((corner + np.array([w * cell - gap, h * cell - gap]) / 2 + origin) @ unrotate)
+        rotated.append(np.full(len(rows), name == "landscape"))
+    orientation = "mixed" if len(kinds) > 1 else (kinds.pop() if kinds else "none")
+    return Layout(count, count * panel_kw, orientation, roof_area, float(usable.sum()) * cell * cell, math.degrees(angle),
+                  np.vstack(centers), np.concatenate(rotated), panel_w, panel_h)
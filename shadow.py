@@ -0,0 +1,278 @@
+# Shadow traffic: run a candidate analysis engine next to the primary one on live requests.
+#
+# The primary engine answers the request as usual. For a sampled share of requests the
+# payload, the primary result and its latency are queued (bounded; overflow is dropped and
+# counted) for a single background worker, which runs the candidate engine and compares
+# the two results field by field. The report keeps, per field, how often both engines
+# produced it and agreed, plus the absolute and relative differences for numeric values
+# (currency strings like "$1,234" count as numbers), overlap for lists, and latency
+# percentiles for both engines with their delta. Optionally every comparison is appended
+# as a JSON line through an access_log.AccessLog writer for offline analysis. Neither the
+# report nor the log keeps request payloads: only their field names and a digest keyed
+# per Shadow instance, enough to spot repeats without exposing what users sent.
+#
+# An engine is any fn(payload: dict) -> dict. load_engine("000.py:run_analysis") loads one
+# from a file next to this module (file names need not be importable), and
+# load_engine("package.module:fn") imports it by module name.
+import atexit
+import copy
+import hashlib
+import importlib
+import importlib.util
+import json
+import math
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_SIZE = 256
+LATENCY_WINDOW = 2048
+EXAMPLES = 20
+NUMBER = re.compile(r"^\s*[^\d\s.+-]{0,3}\s*([+-]?[\d,]*\.?\d+)\s*$")
+
+_STOP = object()
+
+
+def load_engine(spec: str) -> Callable[[dict], dict]:
+    target, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"engine spec '{spec}' must be 'module:function' or 'file.py:function'")
+    if target.endswith(".py"):
+        path = target if os.path.isabs(target) else os.path.join(BASE_DIR, target)
+        name = "shadow_engine_" + re.sub(r"\W", "_", os.path.basename(target)[:-3])
+        mod_spec = importlib.util.spec_from_file_location(name, path)
+        if mod_spec is None:
+            raise ValueError(f"cannot load engine from {path}")
+        module = importlib.util.module_from_spec(mod_spec)
+        mod_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    fn = getattr(module, attr, None)
+    if not callable(fn):
+        raise ValueError(f"engine '{spec}' is not callable")
+    return fn
+
+
+def as_number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        m = NUMBER.match(value)
+        if m:
+            try:
+                return float(m.group(1).replace(",", ""))
+            except ValueError:
+                return None
+    return None
+
+
+def compare(primary: dict, candidate: dict) -> dict:
+    # field -> {"match": bool, and "abs"/"rel" for numbers or "overlap" for lists}; fields
+    # only one engine produced get {"missing": "primary" | "candidate"}
+    out = {}
+    for field in primary.keys() | candidate.keys():
+        if field not in candidate:
+            out[field] = {"missing": "candidate"}
+            continue
+        if field not in primary:
+            out[field] = {"missing": "primary"}
+            continue
+        a, b = primary[field], candidate[field]
+        entry = {"match": a == b}
+        na, nb = as_number(a), as_number(b)
+        if na is not None and nb is not None:
+            entry["abs"] = abs(nb - na)
+            entry["rel"] = abs(nb - na) / abs(na) if na else (0.0 if nb == 0 else math.inf)
+        elif isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+            sa, sb = set(map(str, a)), set(map(str, b))
+            entry["overlap"] = len(sa & sb) / len(sa | sb) if sa | sb else 1.0
+        out[field] = entry
+    return out
+
+
+class _FieldStats:
+    __slots__ = ("compared", "matched", "missing_primary", "missing_candidate", "numeric", "abs_sum", "abs_max",
+                 "rel_sum", "rel_max", "lists", "overlap_sum")
+
+    def __init__(self):
+        self.compared = self.matched = self.missing_primary = self.missing_candidate = 0
+        self.numeric = self.lists = 0
+        self.abs_sum = self.abs_max = self.rel_sum = self.rel_max = self.overlap_sum = 0.0
+
+    def add(self, entry: dict):
+        missing = entry.get("missing")
+        if missing == "primary":
+            self.missing_primary += 1
+            return
+        if missing == "candidate":
+            self.missing_candidate += 1
+            return
+        self.compared += 1
+        self.matched += entry["match"]
+        if "abs" in entry:
+            self.numeric += 1
+            self.abs_sum += entry["abs"]
+            self.abs_max = max(self.abs_max, entry["abs"])
+            if math.isfinite(entry["rel"]):
+                self.rel_sum += entry["rel"]
+            self.rel_max = max(self.rel_max, entry["rel"])
+        elif "overlap" in entry:
+            self.lists += 1
+            self.overlap_sum += entry["overlap"]
+
+    def summary(self) -> dict:
+        s = {"compared": self.compared, "match_rate": round(self.matched / self.compared, 4) if self.compared else None,
+             "missing_in_primary": self.missing_primary, "missing_in_candidate": self.missing_candidate}
+        if self.numeric:
+            s.update(mean_abs_diff=round(self.abs_sum / self.numeric, 4), max_abs_diff=round(self.abs_max, 4),
+                     mean_rel_diff=round(self.rel_sum / self.numeric, 4),
+                     max_rel_diff=self.rel_max if math.isinf(self.rel_max) else round(self.rel_max, 4))
+        if self.lists:
+            s["mean_overlap"] = round(self.overlap_sum / self.lists, 4)
+        return s
+
+
+class _Latencies:
+    __slots__ = ("values", "n")
+
+    def __init__(self, size: int):
+        self.values = np.zeros(size)
+        self.n = 0
+
+    def add(self, seconds: float):
+        self.values[self.n % len(self.values)] = seconds
+        self.n += 1
+
+    def window(self) -> np.ndarray:
+        return self.values[:min(self.n, len(self.values))]
+
+    @staticmethod
+    def summary(v: np.ndarray) -> Optional[dict]:
+        if not len(v):
+            return None
+        p50, p95, p99 = np.percentile(v, [50, 95, 99]) * 1000
+        return {"mean_ms": round(float(v.mean()) * 1000, 3), "p50_ms": round(p50, 3), "p95_ms": round(p95, 3),
+                "p99_ms": round(p99, 3)}
+
+
+class Shadow:
+    def __init__(self, candidate: Callable[[dict], dict], name: str = "candidate", sample_rate: float = 0.1,
+                 queue_size: int = QUEUE_SIZE, writer=None):
+        self.candidate = candidate
+        self.name = name
+        self.sample_rate = sample_rate
+        self.writer = writer  # optional access_log.AccessLog: one JSON line per comparison
+        self.sampled = self.completed = self.dropped = self.errors = 0
+        self.last_error = None
+        self._fields = {}
+        self._primary = _Latencies(LATENCY_WINDOW)
+        self._candidate = _Latencies(LATENCY_WINDOW)
+        self._examples = deque(maxlen=EXAMPLES)  # recent comparisons with mismatches
+        self._digest_key = os.urandom(16)
+        self._queue = queue.Queue(queue_size)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def observe(self, payload: dict, result: dict, seconds: float):
+        # Called on the request path after the primary engine answered: sample and enqueue only
+        if random.random() >= self.sample_rate:
+            return
+        if self._worker is None:
+            self._start()
+        try:
+            self._queue.put_nowait((copy.deepcopy(payload), result, seconds))
+            self.sampled += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._run, name="shadow", daemon=True)
+            self._worker.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            payload, primary, primary_s = item
+            t0 = time.perf_counter()
+            try:
+                candidate = self.candidate(payload)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                continue
+            candidate_s = time.perf_counter() - t0
+            if not isinstance(candidate, dict):
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = f"candidate returned {type(candidate).__name__}"
+                continue
+            self.record(payload, primary, primary_s, candidate, candidate_s)
+
+    def redact(self, payload: dict) -> dict:
+        raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return {"fields": sorted(map(str, payload)),
+                "digest": hashlib.blake2b(raw, digest_size=12, key=self._digest_key).hexdigest()}
+
+    def record(self, payload: dict, primary: dict, primary_s: float, candidate: dict, candidate_s: float) -> dict:
+        diff = compare(primary, candidate)
+        payload = self.redact(payload)
+        with self._lock:
+            self.completed += 1
+            for field, entry in diff.items():
+                self._fields.setdefault(field, _FieldStats()).add(entry)
+            self._primary.add(primary_s)
+            self._candidate.add(candidate_s)
+            mismatched = sorted(f for f, e in diff.items() if not e.get("match"))
+            if mismatched:
+                self._examples.append({"ts": round(time.time(), 3), "payload": payload, "mismatched": mismatched,
+                                       "primary_ms": round(primary_s * 1000, 3),
+                                       "candidate_ms": round(candidate_s * 1000, 3)})
+        if self.writer is not None:
+            self.writer.record({"ts": round(time.time(), 3), "engine": self.name, "payload": payload,
+                                "primary_ms": round(primary_s * 1000, 3), "candidate_ms": round(candidate_s * 1000, 3),
+                                "diff": diff})
+        return diff
+
+    def close(self, timeout: float = 5.0):
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        worker.join(timeout)
+
+    def report(self) -> dict:
+        with self._lock:
+            fields = {f: s.summary() for f, s in sorted(self._fields.items())}
+            primary, candidate = self._primary.window().copy(), self._candidate.window().copy()
+            examples = list(self._examples)
+        delta = candidate - primary
+        return {
+            "engine": self.name, "sample_rate": self.sample_rate,
+            "sampled": self.sampled, "completed": self.completed, "queued": self._queue.qsize(),
+            "dropped": self.dropped, "errors": self.errors, "last_error": self.last_error,
+            "latency": {"primary": _Latencies.summary(primary), "candidate": _Latencies.summary(candidate),
+                        "delta": _Latencies.summary(delta),
+                        "candidate_slower_rate": round(float((delta > 0).mean()), 4) if len(delta) else None},
+            "fields": fields,
+            "recent_mismatches": examples,
+        }
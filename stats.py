@@ -0,0 +1,247 @@
+# Streaming aggregates for live dashboards: count/mean/variance (Welford), approximate
+# quantiles (merging t-digest) and top habit tags per (dimension, key), e.g.
+# ("country", "IN"), ("state", "Karnataka") or ("town", "Aurad").
+#
+# Updates are O(1) amortized. Summaries are cached per aggregate and rebuilt only after
+# new observations, from a digest whose size is bounded by its compression, so serving
+# a key is constant work. A background thread snapshots everything to JSON periodically.
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Optional
+
+QUANTILES = (0.1, 0.5, 0.9, 0.99)
+TOP_TAGS = 5
+
+
+class TDigest:
+    __slots__ = ("delta", "means", "weights", "buf", "lo", "hi")
+
+    def __init__(self, delta: float = 100.0):
+        self.delta = delta
+        self.means = []
+        self.weights = []
+        self.buf = []
+        self.lo = math.inf
+        self.hi = -math.inf
+
+    def add(self, x: float):
+        self.buf.append(x)
+        if x < self.lo:
+            self.lo = x
+        if x > self.hi:
+            self.hi = x
+        if len(self.buf) >= 5 * self.delta:
+            self._compress()
+
+    def _k(self, q: float) -> float:
+        return self.delta / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self):
+        if not self.buf:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + [(x, 1.0) for x in self.buf])
+        self.buf = []
+        total = sum(w for _, w in points)
+        means, weights = [], []
+        cum = 0.0
+        m, w = points[0]
+        k_left = self._k(0.0)
+        for pm, pw in points[1:]:
+            if self._k((cum + w + pw) / total) - k_left <= 1.0:
+                m += (pm - m) * pw / (w + pw)
+                w += pw
+            else:
+                means.append(m)
+                weights.append(w)
+                cum += w
+                k_left = self._k(cum / total)
+                m, w = pm, pw
+        means.append(m)
+        weights.append(w)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._compress()
+        if not self.means:
+            return None
+        total = sum(self.weights)
+        target = q * total
+        cum = 0.0
+        for i, w in enumerate(self.weights):
+            mid = cum + w / 2
+            if target < mid:
+                if i == 0:
+                    # Below the first centroid's centre: interpolate from the observed minimum
+                    return self.lo + (target / mid) * (self.means[0] - self.lo) if mid > 0 else self.means[0]
+                prev_mid = cum - self.weights[i - 1] / 2
+                t = (target - prev_mid) / (mid - prev_mid)
+                return self.means[i - 1] + t * (self.means[i] - self.means[i - 1])
+            cum += w
+        last_mid = total - self.weights[-1] / 2
+        t = (target - last_mid) / (total - last_mid)
+        return self.means[-1] + t * (self.hi - self.means[-1])
+
+    def to_dict(self) -> dict:
+        self._compress()
+        return {"delta": self.delta, "means": self.means, "weights": self.weights, "lo": self.lo, "hi": self.hi}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TDigest":
+        td = cls(d.get("delta", 100.0))
+        td.means, td.weights = list(d["means"]), list(d["weights"])
+        td.lo, td.hi = d.get("lo", math.inf), d.get("hi", -math.inf)
+        return td
+
+
+class Metric:
+    __slots__ = ("count", "mean", "m2", "digest")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.digest = TDigest()
+
+    def add(self, x: float):
+        self.count += 1
+        d = x - self.mean
+        self.mean += d / self.count
+        self.m2 += d * (x - self.mean)
+        self.digest.add(x)
+
+    def summary(self) -> dict:
+        var = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        return {
+            "mean": round(self.mean, 3),
+            "variance": round(var, 3),
+            "stddev": round(math.sqrt(var), 3),
+            "quantiles": {f"p{int(q * 100)}": round(self.digest.quantile(q), 3) for q in QUANTILES} if self.count else {},
+        }
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "digest": self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Metric":
+        m = cls()
+        m.count, m.mean, m.m2 = d["count"], d["mean"], d["m2"]
+        m.digest = TDigest.from_dict(d["digest"])
+        return m
+
+
+class Aggregate:
+    __slots__ = ("count", "metrics", "tags", "updated", "_summary")
+
+    def __init__(self, metric_names: Iterable[str]):
+        self.count = 0
+        self.metrics = {n: Metric() for n in metric_names}
+        self.tags = Counter()
+        self.updated = 0.0
+        self._summary = None
+
+    def observe(self, values: dict, tags: Iterable[str]):
+        self.count += 1
+        for name, metric in self.metrics.items():
+            if values.get(name) is not None:
+                metric.add(float(values[name]))
+        self.tags.update(tags)
+        self.updated = time.time()
+        self._summary = None
+
+    def summary(self) -> dict:
+        s = self._summary
+        if s is None:
+            s = self._summary = {
+                "count": self.count,
+                "updated": self.updated,
+                "metrics": {n: m.summary() for n, m in self.metrics.items()},
+                "top_tags": [{"tag": t, "count": c} for t, c in self.tags.most_common(TOP_TAGS)],
+            }
+        return s
+
+
+class StatsBook:
+    def __init__(self, metric_names: Iterable[str], snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 60.0):
+        self.metric_names = tuple(metric_names)
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._aggs = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._snapshotter = None
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.restore(snapshot_path)
+
+    def observe(self, keys: Iterable[tuple], values: dict, tags: Iterable[str]):
+        tags = list(tags)
+        with self._lock:
+            for key in keys:
+                agg = self._aggs.get(key)
+                if agg is None:
+                    agg = self._aggs[key] = Aggregate(self.metric_names)
+                agg.observe(values, tags)
+            self._dirty = True
+        if self.snapshot_path and self._snapshotter is None:
+            self._start_snapshots()
+
+    def get(self, dimension: str, key: str) -> Optional[dict]:
+        agg = self._aggs.get((dimension, key))
+        if agg is None:
+            return None
+        with self._lock:
+            return agg.summary()
+
+    def keys(self, dimension: str) -> list:
+        return sorted(k for d, k in list(self._aggs) if d == dimension)
+
+    # --- snapshots ---
+
+    def snapshot(self, path: Optional[str] = None):
+        path = path or self.snapshot_path
+        with self._lock:
+            data = {f"{d}\t{k}": {
+                "count": a.count, "updated": a.updated, "tags": dict(a.tags),
+                "metrics": {n: m.to_dict() for n, m in a.metrics.items()},
+            } for (d, k), a in self._aggs.items()}
+            self._dirty = False
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def restore(self, path: str):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for key, d in data.items():
+                dim, _, k = key.partition("\t")
+                agg = Aggregate(self.metric_names)
+                agg.count, agg.updated, agg.tags = d["count"], d["updated"], Counter(d["tags"])
+                for n, md in d["metrics"].items():
+                    if n in agg.metrics:
+                        agg.metrics[n] = Metric.from_dict(md)
+                self._aggs[(dim, k)] = agg
+
+    def _start_snapshots(self):
+        with self._lock:
+            if self._snapshotter is not None:
+                return
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, name="stats-snapshot", daemon=True)
+        self._snapshotter.start()
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            if self._dirty:
+                try:
+                    self.snapshot()
+                except OSError:
+                    pass
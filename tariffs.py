@@ -0,0 +1,154 @@
+# Tariff engine: time-of-use windows, monthly consumption slabs, demand and fixed charges.
+#
+# Specs are plain dicts ("tariffs" in data/reference.json) compiled once into small arrays.
+# Billing works on a flat array of interval kWh starting 1 January; the interval calendar and
+# each tariff's per-interval rate vector are cached (a few series shapes each, least
+# recently used dropped), so a bill is a handful of reduceat calls.
+from functools import lru_cache
+
+import numpy as np
+
+MONTH_START_DAYS = np.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334])
+YEAR_START_WEEKDAY = 2  # 1 January falls on a Wednesday (0 = Monday)
+MAX_INTERVALS = 4 * 366 * 96  # four years of 15-minute readings
+RATE_CACHE_SIZE = 8           # (length, interval) shapes kept per tariff
+
+
+def _slabs(slabs) -> list:
+    # [[upto_kwh, rate], ..., [None, rate]] with strictly increasing positive edges
+    if not isinstance(slabs, (list, tuple)):
+        raise ValueError("tariff slabs must be a list of [upto_kwh, rate]")
+    out = []
+    for i, slab in enumerate(slabs):
+        if not isinstance(slab, (list, tuple)) or len(slab) != 2:
+            raise ValueError(f"tariff slab {slab!r} must be [upto_kwh, rate]")
+        upto, rate = slab
+        last = i == len(slabs) - 1
+        if last != (upto is None):
+            raise ValueError("only the last tariff slab has upto_kwh null, and it must be null")
+        upto = None if last else float(upto)
+        if upto is not None and not (upto > (out[-1][0] if out else 0.0) and upto < float("inf")):
+            raise ValueError("tariff slab upto_kwh must be positive and strictly increasing")
+        out.append((upto, float(rate)))
+    return out
+
+
+def _window(window) -> tuple:
+    # (rate, start hour, end hour, days) from a [rate, start, end, days] spec entry
+    if not isinstance(window, (list, tuple)) or len(window) != 4:
+        raise ValueError(f"tariff window {window!r} must be [rate, start_hour, end_hour, days]")
+    rate, start, end, days = window
+    rate, start, end = float(rate), int(start), int(end)
+    if end <= start:
+        end += 24  # wraps past midnight, e.g. 22 -> 6 (the same as 22 -> 30)
+    if not (0 <= start < 24 and end - start <= 24):
+        raise ValueError(f"tariff window hours must start at 0-23 and span at most 24 hours, got {window[1]}-{window[2]}")
+    if days not in ("all", "weekday", "weekend"):
+        raise ValueError(f"tariff window days must be 'all', 'weekday' or 'weekend', got {days!r}")
+    return rate, start, end, days
+
+
+class Tariff:
+    __slots__ = ("name", "fixed", "demand", "hour_rates", "slab_edges", "slab_rates", "slab_base", "_rate_cache")
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.fixed = float(spec.get("fixed", 0.0))
+        self.demand = float(spec.get("demand", 0.0))
+
+        # (weekday, weekend) x 24 energy rates; later windows override earlier ones
+        rates = np.full((2, 24), float(spec.get("energy", 0.0)))
+        for window in spec.get("windows", []):
+            rate, start, end, days = _window(window)
+            hours = np.arange(start, end) % 24
+            if days in ("all", "weekday"):
+                rates[0, hours] = rate
+            if days in ("all", "weekend"):
+                rates[1, hours] = rate
+        self.hour_rates = rates
+
+        # Slabs: [[upto_kwh, rate], ..., [None, rate]] on monthly consumption. Edges and the
+        # cumulative cost at each edge are precomputed so billing is searchsorted + multiply-add.
+        slabs = _slabs(spec.get("slabs", []))
+        self.slab_rates = np.array([r for _, r in slabs], dtype=float)
+        self.slab_edges = np.array([0.0] + [u for u, _ in slabs[:-1]], dtype=float)
+        widths = np.diff(self.slab_edges)
+        self.slab_base = np.concatenate(([0.0], np.cumsum(widths * self.slab_rates[:-1]))) if slabs else np.zeros(0)
+        self._rate_cache = {}
+
+    def interval_rates(self, n: int, minutes: int) -> np.ndarray:
+        key = (n, minutes)
+        rates = self._rate_cache.pop(key, None)
+        if rates is None:
+            cal = calendar(n, minutes)
+            rates = self.hour_rates[cal["weekend"], cal["hour"]]
+            rates.setflags(write=False)
+            if len(self._rate_cache) >= RATE_CACHE_SIZE:
+                del self._rate_cache[next(iter(self._rate_cache))]  # least recently used
+        self._rate_cache[key] = rates  # (re)inserted last = most recently used
+        return rates
+
+    def slab_cost(self, monthly_kwh: np.ndarray) -> np.ndarray:
+        if not len(self.slab_rates):
+            return np.zeros_like(monthly_kwh)
+        if np.any(monthly_kwh < 0):
+            raise ValueError("slab tariffs need non-negative monthly consumption")
+        i = np.searchsorted(self.slab_edges, monthly_kwh, side="right") - 1
+        return self.slab_base[i] + (monthly_kwh - self.slab_edges[i]) * self.slab_rates[i]
+
+    def hourly_marginal(self) -> np.ndarray:
+        # Weekday price signal for schedulers; slabs shift every hour equally
+        return self.hour_rates[0] + (self.slab_rates.mean() if len(self.slab_rates) else 0.0)
+
+
+@lru_cache(maxsize=32)
+def calendar(n: int, minutes: int) -> dict:
+    per_day = 1440 // minutes
+    i = np.arange(n)
+    day = i // per_day
+    doy = day % 365
+    month = np.searchsorted(MONTH_START_DAYS, doy, side="right") - 1
+    # Month index keeps increasing across years so multi-year series bill per calendar month
+    month = month + 12 * (day // 365)
+    starts = np.flatnonzero(np.diff(month, prepend=-1))
+    cal = {
+        "hour": ((i % per_day) * minutes) // 60,
+        "weekend": ((day + YEAR_START_WEEKDAY) % 7 >= 5).astype(np.intp),
+        "starts": starts,
+        "months": month[starts] % 12,
+    }
+    for arr in cal.values():
+        arr.setflags(write=False)
+    return cal
+
+
+def bill(tariff: Tariff, kwh, minutes: int = 60) -> dict:
+    kwh = np.asarray(kwh, dtype=float)
+    if kwh.ndim != 1 or not len(kwh):
+        raise ValueError("consumption must be a non-empty 1-D series")
+    if len(kwh) > MAX_INTERVALS:
+        raise ValueError(f"consumption is limited to {MAX_INTERVALS} intervals")
+    if minutes <= 0 or 1440 % minutes:
+        raise ValueError("interval must divide a day evenly")
+    cal = calendar(len(kwh), minutes)
+    starts = cal["starts"]
+
+    monthly_kwh = np.add.reduceat(kwh, starts)
+    energy = np.add.reduceat(kwh * tariff.interval_rates(len(kwh), minutes), starts) + tariff.slab_cost(monthly_kwh)
+    demand = np.maximum.reduceat(kwh, starts) * (60 / minutes) * tariff.demand
+    fixed = np.full(len(starts), tariff.fixed)
+    return {
+        "month": cal["months"],
+        "kwh": monthly_kwh,
+        "energy": energy,
+        "demand": demand,
+        "fixed": fixed,
+        "total": energy + demand + fixed,
+    }
+
+
+def compile_book(specs: dict, flat_rates: dict) -> dict:
+    # Explicit specs where we have them, flat energy-only tariffs from the rate table otherwise
+    book = {loc: Tariff(loc, {"energy": rate}) for loc, rate in flat_rates.items()}
+    book.update({loc: Tariff(loc, spec) for loc, spec in specs.items()})
+    return book
@@ -0,0 +1,167 @@
+# Map-tile proxy with a size-bounded on-disk LRU cache.
+#
+# Tiles are stored as <dir>/<z>/<x>/<y><r>.png. The LRU order lives in memory (rebuilt
+# from file mtimes on first use); hits move a tile to the back, and when the cache goes
+# over max_bytes the least recently used files are deleted. Concurrent misses for the
+# same tile share one upstream fetch.
+#
+#   python tile_cache.py serve [port]
+#
+# runs a local tile stand-in (solid-colour PNGs) to point ECO_TILE_UPSTREAM at in tests.
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import tracing
+
+DEFAULT_UPSTREAM = "https://a.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png"
+MAX_ZOOM = 20
+MAX_BYTES = 256 * 1024 * 1024
+
+
+class TileError(Exception):
+    pass
+
+
+class TileCache:
+    def __init__(self, directory: str, upstream: str = DEFAULT_UPSTREAM, max_bytes: int = MAX_BYTES,
+                 timeout: float = 5.0):
+        self.directory = directory
+        self.upstream = upstream
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.hits = self.misses = self.evictions = 0
+        self.size = 0
+        self._lru = None   # relative path -> bytes, oldest first
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._session = None  # created with the first upstream fetch
+
+    @staticmethod
+    def key(z: int, x: int, y: int, retina: bool = False) -> str:
+        if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError("tile out of range")
+        return f"{z}/{x}/{y}{'@2x' if retina else ''}.png"
+
+    def _index(self):
+        # Rebuild the LRU order from what is on disk, oldest mtime first
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for f in files:
+                if f.endswith(".png"):
+                    st = os.stat(os.path.join(root, f))
+                    entries.append((st.st_mtime, os.path.relpath(os.path.join(root, f), self.directory), st.st_size))
+        entries.sort()
+        self._lru = OrderedDict((rel.replace(os.sep, "/"), size) for _, rel, size in entries)
+        self.size = sum(self._lru.values())
+
+    def get(self, z: int, x: int, y: int, retina: bool = False) -> tuple:
+        # (png bytes, "HIT" | "MISS")
+        key = self.key(z, x, y, retina)
+        path = os.path.join(self.directory, key)
+        with self._lock:
+            if self._lru is None:
+                self._index()
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                hit = False
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    waiter = self._inflight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+        if hit:
+            try:
+                with open(path, "rb") as f:
+                    return f.read(), "HIT"
+            except OSError:
+                with self._lock:
+                    self.size -= self._lru.pop(key, 0)
+                return self.get(z, x, y, retina)
+        if not owner:
+            waiter.wait(self.timeout * 2)
+            return self.get(z, x, y, retina)
+        try:
+            body = self._fetch(z, x, y, retina)
+            self._store(key, path, body)
+            return body, "MISS"
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _fetch(self, z: int, x: int, y: int, retina: bool) -> bytes:
+        import requests
+        self.misses += 1
+        if self._session is None:
+            self._session = requests.Session()
+        url = self.upstream.format(z=z, x=x, y=y, r="@2x" if retina else "")
+        try:
+            r = self._session.get(url, headers=tracing.headers(), timeout=self.timeout)
+        except requests.RequestException as e:
+            raise TileError(f"tile upstream unreachable: {e}")
+        if r.status_code != 200 or not r.content:
+            raise TileError(f"tile upstream returned {r.status_code}")
+        return r.content
+
+    def _store(self, key: str, path: str, body: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        with self._lock:
+            self.size += len(body) - self._lru.pop(key, 0)
+            self._lru[key] = len(body)
+            while self.size > self.max_bytes and len(self._lru) > 1:
+                old, size = self._lru.popitem(last=False)
+                self.size -= size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError:
+                    pass
+
+    def status(self) -> dict:
+        return {"tiles": len(self._lru or ()), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def solid_png(rgb: tuple, size: int = 256) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    raw = (b"\x00" + bytes(rgb) * size) * size
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b""))
+
+
+if __name__ == "__main__":
+    # Local tile stand-in: python tile_cache.py serve [port]
+    import sys
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    if len(sys.argv) < 2 or sys.argv[1] != "serve":
+        sys.exit("usage: python tile_cache.py serve [port]")
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8086
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # /{z}/{x}/{y}.png -> a tile coloured by its coordinates
+            try:
+                z, x, y = (int(p.split("@")[0].split(".")[0]) for p in self.path.strip("/").split("/")[-3:])
+            except ValueError:
+                self.send_error(404)
+                return
+            body = solid_png(((x * 37) % 256, (y * 59) % 256, (z * 17) % 256), 256 if "@2x" not in self.path else 512)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
@@ -0,0 +1,224 @@
+# Lightweight request tracing: nested timed spans collected per request.
+#
+# Tracer.start() opens a root span for an incoming request, continuing the caller's trace
+# when it sends a W3C traceparent header (and honouring its sampled flag), otherwise
+# sampling a new trace at sample_rate. The current span lives in a contextvar, so
+# span(name) anywhere below - pipeline stages, helpers, outbound HTTP - nests under it
+# without being passed around; work handed to a thread pool keeps its parent when
+# submitted through contextvars.copy_context().run. Outbound requests send headers() so
+# upstream services that understand traceparent join the same trace. Unsampled requests get a shared no-op
+# span, so instrumented code costs one contextvar read.
+#
+# When the root span ends the whole trace is exported: always into an in-memory ring
+# (recent traces for the admin endpoint) and optionally as JSON lines through a queued
+# access_log.AccessLog writer.
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+RING_SIZE = 200
+MAX_SPANS = 256
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current = contextvars.ContextVar("eco_span", default=None)
+
+
+class _Trace:
+    __slots__ = ("trace_id", "spans", "dropped")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans = []
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "_t0", "duration", "error", "_token")
+
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[str], attrs: dict):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self._token = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(f"{exc_type.__name__}: {exc}" if exc_type else None)
+        return False
+
+    def end(self, error: Optional[str] = None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._t0
+        self.error = error
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:  # ended from another context; nothing to restore there
+                pass
+            self._token = None
+        spans = self.trace.spans
+        if len(spans) < MAX_SPANS:
+            spans.append(self)
+        else:
+            self.trace.dropped += 1
+
+    def as_dict(self, origin: float) -> dict:
+        return {"span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+                "start_ms": round((self.start - origin) * 1000, 3),
+                "duration_ms": round((self.duration or 0.0) * 1000, 3),
+                "attrs": self.attrs, "error": self.error}
+
+
+class _NoopSpan:
+    __slots__ = ()
+    trace_id = None
+
+    def set(self, **attrs):
+        pass
+
+    def end(self, error: Optional[str] = None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP = _NoopSpan()
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def span(name: str, **attrs):
+    # Child of the current span; a no-op outside a sampled trace
+    parent = _current.get()
+    if parent is None:
+        return NOOP
+    return Span(parent.trace, name, parent.span_id, attrs)
+
+
+def headers() -> dict:
+    # traceparent for an outbound request, so the callee can continue the current trace
+    parent = current()
+    return {"traceparent": parent.traceparent()} if parent is not None else {}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    # (trace id, parent span id, sampled) from a W3C traceparent header, or None
+    m = TRACEPARENT.match((header or "").strip().lower())
+    if m is None or m.group(1) == "0" * 32 or m.group(2) == "0" * 16:
+        return None
+    return m.group(1), m.group(2), bool(int(m.group(3), 16) & 1)
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.05, ring_size: int = RING_SIZE, writer=None):
+        self.sample_rate = sample_rate
+        self.writer = writer  # optional access_log.AccessLog used as a JSON-lines exporter
+        self.started = self.exported = 0
+        self._ring = OrderedDict()  # trace id -> exported trace, oldest first
+        self._ring_size = ring_size
+        self._lock = threading.Lock()
+
+    def start(self, name: str, traceparent: Optional[str] = None, **attrs):
+        # Root span for one request; call end() (or use as a context manager) to export it
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = None, None, random.random() < self.sample_rate
+        if not sampled:
+            return NOOP
+        self.started += 1
+        root = _RootSpan(self, _Trace(trace_id or os.urandom(16).hex()), name, parent_id, attrs)
+        root._token = _current.set(root)
+        return root
+
+    def export(self, root: "_RootSpan"):
+        spans = sorted(root.trace.spans, key=lambda s: s.start)
+        record = {"trace_id": root.trace_id, "span_id": root.span_id, "name": root.name, "start": round(root.start, 6),
+                  "duration_ms": round(root.duration * 1000, 3), "parent_id": root.parent_id,
+                  "error": root.error, "attrs": root.attrs, "dropped_spans": root.trace.dropped,
+                  "spans": [s.as_dict(root.start) for s in spans]}
+        with self._lock:
+            self._ring[root.trace_id] = record
+            self._ring.move_to_end(root.trace_id)
+            while len(self._ring) > self._ring_size:
+                self._ring.popitem(last=False)
+            self.exported += 1
+        if self.writer is not None:
+            self.writer.record(record)
+
+    def recent(self, limit: int = 50, min_ms: float = 0.0, name: Optional[str] = None) -> list:
+        # Newest first, summaries only
+        with self._lock:
+            traces = list(reversed(self._ring.values()))
+        out = []
+        for t in traces:
+            if t["duration_ms"] < min_ms or (name and t["name"] != name):
+                continue
+            out.append({k: t[k] for k in ("trace_id", "name", "start", "duration_ms", "error")} | {"spans": len(t["spans"])})
+            if len(out) >= limit:
+                break
+        return out
+
+    def get(self, trace_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._ring.get(trace_id)
+
+    def status(self) -> dict:
+        return {"sample_rate": self.sample_rate, "started": self.started, "exported": self.exported,
+                "buffered": len(self._ring), "writer": self.writer.status() if self.writer else None}
+
+
+class _RootSpan(Span):
+    __slots__ = ("tracer",)
+
+    def __init__(self, tracer: Tracer, trace: _Trace, name: str, parent_id: Optional[str], attrs: dict):
+        super().__init__(trace, name, parent_id, attrs)
+        self.tracer = tracer
+
+    def __enter__(self):
+        return self  # already current since Tracer.start()
+
+    def end(self, error: Optional[str] = None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._t0
+        self.error = error
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                pass
+            self._token = None
+        self.tracer.export(self)
@@ -0,0 +1,130 @@
+# Vendored front-end assets: content-hashed local copies of the page's CDN files.
+#
+#   python vendor_assets.py [out_dir]
+#
+# downloads each asset (and every url(...) a stylesheet references: fonts, images),
+# writes it as <name>.<hash>.<ext> next to a pre-compressed .gz copy, rewrites stylesheet
+# references to the hashed names, and records logical name -> hashed file in
+# manifest.json. Hashed names never change content, so they are served with immutable
+# cache headers; until the script has been run, asset URLs fall back to the CDN.
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import Callable, Optional
+from urllib.parse import urljoin, urlsplit
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "vendor")
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = (".js", ".css", ".svg", ".json", ".ttf", ".eot")
+# Google Fonts serves woff2 only to browsers that identify as supporting it
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+ASSETS = {
+    "tailwind.js": "https://cdn.tailwindcss.com",
+    "leaflet.css": "https://unpkg.com/leaflet@1.9.4/dist/leaflet.css",
+    "leaflet.js": "https://unpkg.com/leaflet@1.9.4/dist/leaflet.js",
+    "gsap.js": "https://unpkg.com/gsap@3.12.5/dist/gsap.min.js",
+    "fontawesome.css": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/css/all.min.css",
+    "inter.css": "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;800&display=swap",
+}
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def hashed_name(name: str, body: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}"
+
+
+def write_asset(out_dir: str, name: str, body: bytes) -> str:
+    fname = hashed_name(name, body)
+    path = os.path.join(out_dir, fname)
+    if not os.path.exists(path):
+        with open(path + ".tmp", "wb") as f:
+            f.write(body)
+        os.replace(path + ".tmp", path)
+        if fname.endswith(COMPRESSIBLE):
+            with open(path + ".gz.tmp", "wb") as f:
+                f.write(gzip.compress(body, 9, mtime=0))
+            os.replace(path + ".gz.tmp", path + ".gz")
+    return fname
+
+
+def build(out_dir: str = VENDOR_DIR, assets: dict = ASSETS, fetch: Optional[Callable[[str], bytes]] = None) -> dict:
+    if fetch is None:
+        import requests
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+
+        def fetch(url: str) -> bytes:
+            r = session.get(url, timeout=30)
+            r.raise_for_status()
+            return r.content
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for name, url in assets.items():
+        body = fetch(url)
+        if name.endswith(".css"):
+            body = _vendor_css(out_dir, url, body, fetch)
+        manifest[name] = write_asset(out_dir, name, body)
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def _vendor_css(out_dir: str, base_url: str, body: bytes, fetch: Callable) -> bytes:
+    # Fetch every url(...) the stylesheet references and point it at the hashed copy
+    css = body.decode("utf-8")
+    done = {}
+
+    def replace(m):
+        ref = m.group(2).strip()
+        if ref.startswith(("data:", "#")):
+            return m.group(0)
+        url = urljoin(base_url, ref)
+        if url not in done:
+            name = os.path.basename(urlsplit(url).path) or "asset"
+            done[url] = write_asset(out_dir, name, fetch(url))
+        return f"url({done[url]})"
+
+    return CSS_URL.sub(replace, css).encode("utf-8")
+
+
+class AssetManifest:
+    # Logical name -> URL for templates: hashed local file when vendored, else the CDN
+    def __init__(self, directory: str = VENDOR_DIR, prefix: str = "/assets/", fallback: dict = ASSETS):
+        self.directory = directory
+        self.prefix = prefix
+        self.fallback = fallback
+        try:
+            with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+                self.files = json.load(f)
+        except (OSError, ValueError):
+            self.files = {}
+
+    def url(self, name: str) -> str:
+        fname = self.files.get(name)
+        return self.prefix + fname if fname else self.fallback[name]
+
+    def path(self, fname: str, accept_encoding: str = "") -> Optional[tuple]:
+        # (file name on disk, content encoding) for a hashed asset, preferring the .gz copy
+        if fname != os.path.basename(fname) or fname.endswith((".tmp", ".gz")) or fname == MANIFEST:
+            return None
+        if not os.path.isfile(os.path.join(self.directory, fname)):
+            return None
+        if "gzip" in accept_encoding and os.path.isfile(os.path.join(self.directory, fname + ".gz")):
+            return fname + ".gz", "gzip"
+        return fname, None
+
+
+if __name__ == "__main__":
+    out = sys.argv[1] if len(sys.argv) > 1 else VENDOR_DIR
+    for name, fname in build(out).items():
+        print(f"{name:18} {fname}")